@@ -0,0 +1,69 @@
+"""
+Compares the approximate 'spline' decomposition of `get_eda_features` with cvxEDA on the bundled Empatica recording,
+both for the components of single windows and for the features of the whole recording.
+
+Usage: python benchmarks/eda_benchmark.py (from the repository root)
+"""
+import time
+import warnings
+
+import numpy as np
+
+import flirt
+import flirt.reader.empatica
+from flirt.eda import feature_calculation
+
+
+def __time(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def __compare(name, expected, actual):
+    expected, actual = np.ravel(expected), np.ravel(actual)
+    valid = np.isfinite(expected) & np.isfinite(actual)
+    print('%24s %12.3g %12.3g %12.4f' % (name, np.mean(np.abs(expected[valid] - actual[valid])),
+                                         np.max(np.abs(expected[valid] - actual[valid])),
+                                         np.corrcoef(expected[valid], actual[valid])[0, 1]))
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    eda = flirt.reader.empatica.read_eda_file_into_df('test/wearable-data/empatica/EDA.csv')['eda']
+    data_frequency = 4
+    y = eda.to_numpy(dtype=np.float64)
+
+    # components of non-overlapping 60 s windows
+    n = 60 * data_frequency
+    cvx_time, approximate_time = 0, 0
+    cvx_components, approximate_components = [], []
+    for start in range(0, len(y) - n + 1, n):
+        elapsed, (r, t) = __time(feature_calculation.__cvx_eda, y[start:start + n], 1 / data_frequency)
+        cvx_time += elapsed
+        cvx_components.append((np.ravel(r), np.ravel(t)))
+        elapsed, components = __time(feature_calculation.__approximate_eda, y[start:start + n], 1 / data_frequency)
+        approximate_time += elapsed
+        approximate_components.append(components)
+
+    print('%d windows of %d samples: cvxEDA %.3f s, spline %.3f s' % (len(cvx_components), n, cvx_time,
+                                                                       approximate_time))
+    print('%24s %12s %12s %12s' % ('component', 'mean error', 'max error', 'correlation'))
+    __compare('phasic', [r for r, _ in cvx_components], [r for r, _ in approximate_components])
+    __compare('tonic', [t for _, t in cvx_components], [t for _, t in approximate_components])
+
+    # features of the whole recording
+    features = ['mean', 'std', 'min', 'max']
+    print()
+    results = {}
+    for name, kwargs in [('cvxeda window', {}), ('cvxeda signal', {'decomposition': 'signal'}),
+                         ('spline', {'method': 'spline'})]:
+        flirt.get_eda_features(eda.iloc[:1200], num_cores=1, features=features, **kwargs)  # compile
+        elapsed, results[name] = __time(flirt.get_eda_features, eda, num_cores=1, features=features, **kwargs)
+        print('%16s %8.2f s' % (name, elapsed))
+
+    print()
+    print('%24s %12s %12s %12s' % ('feature (vs. window)', 'mean error', 'max error', 'correlation'))
+    for column in results['cvxeda window'].columns:
+        for name in ['cvxeda signal', 'spline']:
+            __compare(name + ' ' + column, results['cvxeda window'][column], results[name][column])
@@ -0,0 +1,55 @@
+"""
+Compares the sorted neighbour search of `app_entropy` and `sample_entropy` with a naive reference that compares all
+pairs of embedded vectors.
+
+Usage: python benchmarks/entropy_benchmark.py
+"""
+import timeit
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from flirt.lib.entropy import app_entropy, sample_entropy
+
+
+def naive_app_entropy(x, order=2):
+    x = np.asarray(x, dtype=np.float64)
+    r = 0.2 * np.std(x)
+    phi = [np.mean(np.log(np.mean(__distances(x, m) <= r, axis=1))) for m in [order, order + 1]]
+    return phi[0] - phi[1]
+
+
+def naive_sample_entropy(x, order=2):
+    x = np.asarray(x, dtype=np.float64)
+    r = 0.2 * np.std(x)
+    n = len(x) - order
+    # pairs of distinct vectors, only the first n vectors of length order can be extended
+    b = np.sum(__distances(x, order)[:n, :n] < r) - n
+    a = np.sum(__distances(x, order + 1) < r) - n
+    return -np.log(a / b)
+
+
+def __distances(x, order):
+    vectors = sliding_window_view(x, order)
+    return np.max(np.abs(vectors[:, None, :] - vectors[None, :, :]), axis=2)
+
+
+def __time(function, x, repeat):
+    return min(timeit.repeat(lambda: function(x), number=1, repeat=repeat))
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    app_entropy(rng.normal(size=100))  # compile
+    sample_entropy(rng.normal(size=100))
+
+    print('%6s %16s %10s %10s %10s' % ('n', 'entropy', 'naive [s]', 'fast [s]', 'abs. diff'))
+    for n in [200, 1000, 4000]:
+        # an IBI-like signal: a slowly varying mean with noise, quantized to 1/64 s
+        x = 800 + 50 * np.sin(np.arange(n) / 20) + rng.normal(0, 20, n)
+        x = np.round(x / 15.625) * 15.625
+        for name, fast, naive in [('app_entropy', app_entropy, naive_app_entropy),
+                                  ('sample_entropy', sample_entropy, naive_sample_entropy)]:
+            repeat = 5 if n <= 1000 else 1
+            print('%6d %16s %10.4f %10.4f %10.2g' % (n, name, __time(naive, x, repeat), __time(fast, x, 5),
+                                                      abs(naive(x) - fast(x))))
@@ -1,17 +1,19 @@
 import multiprocessing
-from datetime import timedelta
+from typing import List
 
 import numpy as np
 import pandas as pd
 from joblib import Parallel, delayed
-from tqdm.autonotebook import trange
-from ..util import processing
+from tqdm.autonotebook import tqdm
+from ..util import processing, selection, windowing
 
-from ..stats.common import get_stats
+from ..stats import sliding
+from ..stats.common import FEATURES, OPTIONAL_FEATURES
 
 
 def get_acc_features(data: pd.DataFrame, window_length: int = 60, window_step_size: float = 1,
-                     data_frequency: int = 32, num_cores: int = 0):
+                     data_frequency: int = 32, num_cores: int = 0, chunk_size: int = 0,
+                     method: str = 'window', features: List[str] = None, exclude: List[str] = None):
     """
     Computes statistical ACC features based on the l2-norm of the x-, y-, and z- acceleration.
 
@@ -27,6 +29,19 @@ def get_acc_features(data: pd.DataFrame, window_length: int = 60, window_step_si
         the frequency of the input signal
     num_cores : int, optional
         number of cores to use for parallel processing, by default use all available
+    chunk_size : int, optional
+        number of consecutive windows processed per task, by default chosen based on the number of windows and cores
+    method : str, optional
+        'window' evaluates every window independently, 'rolling' updates the moment-based features, min/max/ptp, \
+        lineintegral, n_sign_changes and the percentiles incrementally while the window slides, 'strided' \
+        evaluates all windows of regularly sampled signals as vectorized NumPy reductions, 'numba' evaluates every \
+        window in a compiled kernel and processes the chunks in threads instead of processes, by default 'window'
+    features : List[str], optional
+        names of the features to compute for each axis and the l2-norm (e.g. ['mean', 'std', 'energy']), \
+        by default all except the optional fractal dimensions ('petrosian_fd', 'katz_fd', 'higuchi_fd', 'dfa') and \
+        entropies ('app_entropy', 'sample_entropy')
+    exclude : List[str], optional
+        names of features not to compute (e.g. ['peaks', 'perm_entropy']), by default none
 
     Returns
     -------
@@ -51,43 +66,49 @@ def get_acc_features(data: pd.DataFrame, window_length: int = 60, window_step_si
     if not num_cores >= 1:
         num_cores = multiprocessing.cpu_count()
 
+    if method not in sliding.METHODS:
+        raise ValueError("invalid method: " + method)
+
+    features = selection.select_features(FEATURES, features, exclude, OPTIONAL_FEATURES)
+
     input_data = data.copy()
     input_data['l2'] = np.linalg.norm(data.to_numpy(), axis=1)
 
     # ensure we have a DatetimeIndex, needed for calculation
     if not isinstance(input_data.index, pd.DatetimeIndex):
         input_data.index = pd.DatetimeIndex(input_data.index)
+    if not input_data.index.is_monotonic_increasing:
+        input_data.sort_index(inplace=True)
+
+    # advance by window_step_size * data_frequency
+    windows = windowing.get_sample_windows(input_data.index, window_length, window_step_size, data_frequency)
+    inputs = tqdm(windowing.get_chunks(windows, num_cores, chunk_size), desc="ACC features")
+
+    def process(memmap_data, backend=None) -> list:
+        with Parallel(n_jobs=num_cores, max_nbytes=None, backend=backend) as parallel:
+            return parallel(delayed(__get_l2_stats)(memmap_data, windows=chunk, method=method, features=features)
+                            for chunk in inputs)
+    if method == 'numba':
+        # the kernels release the GIL, threads share the data and the compiled code without memory mapping
+        results = process(input_data, backend='threading')
+    else:
+        results = processing.memmap_auto(input_data, process)
 
-    inputs = trange(0, len(input_data) - 1,
-                    window_step_size * data_frequency, desc="ACC features")  # advance by window_step_size * data_frequency
-
-    def process(memmap_data) -> dict:
-        with Parallel(n_jobs=num_cores, max_nbytes=None) as parallel:
-            return parallel(delayed(__get_l2_stats)(memmap_data, window_length=window_length, i=k) for k in inputs)
-    results = processing.memmap_auto(input_data, process)
-
-    results = pd.DataFrame(list(filter(None, results)))
-    results.set_index('datetime', inplace=True)
+    results = pd.concat(results) if results else pd.DataFrame()
     results.sort_index(inplace=True)
 
     return results
 
 
-def __get_l2_stats(data: pd.DataFrame, window_length: int, i: int):
-    if pd.Timedelta(data.index[i + 1] - data.index[i]).total_seconds() <= window_length:
-        min_timestamp = data.index[i]
-        max_timestamp = min_timestamp + timedelta(seconds=window_length)
-        results = {
-            'datetime': max_timestamp,
-        }
-
-        relevant_data = data.loc[(data.index >= min_timestamp) & (data.index < max_timestamp)]
+def __get_l2_stats(data: pd.DataFrame, windows: windowing.Windows, method: str = 'window',
+                   features: List[str] = None) -> pd.DataFrame:
+    offset = windows.start[0]
+    relevant_data = data.iloc[offset:windows.stop[-1]]
 
-        for column in relevant_data.columns:
-            column_results = get_stats(relevant_data[column], column)
-            results.update(column_results)
+    results = {}
+    for column in relevant_data.columns:
+        column_results = sliding.get_sliding_stats(relevant_data[column], windows.start - offset,
+                                                   windows.stop - offset, column, method=method, features=features)
+        results.update(column_results)
 
-        return results
-
-    else:
-        return None
+    return pd.DataFrame(results, index=windows.datetime.rename('datetime'))
@@ -0,0 +1,329 @@
+from collections import namedtuple
+
+import numpy as np
+from numba import jit
+
+BandedModel = namedtuple("BandedModel", ["ar", "ma", "border", "regularization", "border_hessian", "border_product",
+                                         "support"])
+
+
+def get_banded_model(ar: np.ndarray, ma: np.ndarray, border: np.ndarray, regularization: np.ndarray) -> BandedModel:
+    """
+    Prepares the structure of the quadratic program solved by `solve_banded_qp`
+
+        minimize    .5 * |M q + J b|^2 + .5 * b' diag(regularization) b + c' [q; b]
+        subject to  A q >= 0
+
+    where `A` and `M` are the n x n lower triangular Toeplitz matrices with the coefficients `ar` and `ma` on \
+    their main and first two subdiagonals in all but the first two rows (which are zero), and `J` is a dense \
+    n x k `border` of few columns. This is the form of the cvxEDA problem with the SMNA driver as `A q`, the \
+    phasic component as `M q` and the spline and trend coefficients as `b`.
+
+    Parameters
+    ----------
+    ar : np.ndarray
+        the three coefficients of `A`
+    ma : np.ndarray
+        the three coefficients of `M`
+    border : np.ndarray
+        the n x k matrix `J`
+    regularization : np.ndarray
+        the k penalties of the squared border coefficients
+
+    Returns
+    -------
+    BandedModel
+        the coefficients plus the blocks `J' J + diag(regularization)` and `(M' J)'` of the Hessian and the first \
+        and last nonzero row of each column of `M' J`
+    """
+
+    ar = np.asarray(ar, dtype=np.float64)
+    ma = np.asarray(ma, dtype=np.float64)
+    border = np.ascontiguousarray(border, dtype=np.float64)
+    regularization = np.asarray(regularization, dtype=np.float64)
+    border_hessian = border.T @ border + np.diag(regularization)
+    # M'J, transposed so that its columns are contiguous
+    border_product = np.empty((border.shape[1], border.shape[0]))
+    for j in range(border.shape[1]):
+        border_product[j] = _toeplitz_tdot(ma, border[:, j])
+
+    # the columns of the spline basis are local, only their support enters the Schur complement
+    support = np.zeros((border.shape[1], 2), dtype=np.int64)
+    for j in range(border.shape[1]):
+        rows = np.flatnonzero(border_product[j])
+        support[j] = (rows[0], rows[-1] + 1) if len(rows) > 0 else (0, 0)
+    return BandedModel(ar, ma, border, regularization, border_hessian, border_product, support)
+
+
+def solve_banded_qp(model: BandedModel, c: np.ndarray, initvals: dict = None, reltol: float = 1e-6,
+                    abstol: float = 1e-7, feastol: float = 1e-7, maxiters: int = 100) -> dict:
+    """
+    Solves the quadratic program described by `model` (see `get_banded_model`) with a primal-dual interior-point \
+    method (Mehrotra predictor-corrector). The Newton systems are reduced to the n x n pentadiagonal block of the \
+    driver, factorized by a banded Cholesky decomposition, and a Schur complement of the size of the border, so \
+    that every iteration costs O(n * k) instead of a general sparse factorization.
+
+    Parameters
+    ----------
+    model : BandedModel
+        the structure of the problem
+    c : np.ndarray
+        the linear term, of size n + k
+    initvals : dict, optional
+        starting point with the keys 'x', 's' and 'z' (as returned by this function or `cvxopt.solvers.qp`), \
+        the slacks and multipliers of the rows 2 to n - 1 must be positive, by default a cold start
+    reltol, abstol, feastol : float, optional
+        the relative and absolute tolerance of the duality gap and the tolerance of the residuals, with the \
+        meaning of the corresponding options of `cvxopt.solvers.qp`
+    maxiters : int, optional
+        the maximum number of iterations
+
+    Returns
+    -------
+    dict
+        'x', 's' and 'z' (the solution, the slacks `A q` and the multipliers of the constraints, the latter two with \
+        zeros in the first two rows), 'status' ('optimal' or 'unknown'), 'iterations' and 'primal objective', as \
+        `cvxopt.solvers.qp`
+    """
+
+    n = model.border.shape[0]
+    c = np.ravel(np.asarray(c, dtype=np.float64))
+    if initvals is None:
+        x0, s0, z0 = np.zeros(len(c)), np.zeros(n), np.zeros(n)
+        cold = True
+    else:
+        x0 = np.ravel(np.asarray(initvals['x'], dtype=np.float64)).copy()
+        s0 = np.ravel(np.asarray(initvals['s'], dtype=np.float64)).copy()
+        z0 = np.ravel(np.asarray(initvals['z'], dtype=np.float64)).copy()
+        if np.any(s0[2:] <= 0) or np.any(z0[2:] <= 0):
+            raise ValueError("initial s and z must be positive")
+        cold = False
+
+    x, s, z, iterations, converged, pcost = _solve(model.ar, model.ma, model.border, model.regularization,
+                                                   model.border_hessian, model.border_product, model.support, c, x0,
+                                                   s0, z0, cold, reltol, abstol, feastol, maxiters)
+    return {'x': x, 's': s, 'z': z, 'status': 'optimal' if converged else 'unknown', 'iterations': iterations,
+            'primal objective': pcost}
+
+
+@jit(nopython=True, cache=True)
+def _toeplitz_dot(coefficients, v):
+    # rows 2 to n - 1 of the banded lower triangular Toeplitz matrix times v, the first two rows are zero
+    out = np.zeros(len(v))
+    for i in range(2, len(v)):
+        out[i] = coefficients[0] * v[i] + coefficients[1] * v[i - 1] + coefficients[2] * v[i - 2]
+    return out
+
+
+@jit(nopython=True, cache=True)
+def _toeplitz_tdot(coefficients, w):
+    # transpose of _toeplitz_dot, the first two entries of w are ignored
+    out = np.zeros(len(w))
+    for i in range(2, len(w)):
+        out[i] += coefficients[0] * w[i]
+        out[i - 1] += coefficients[1] * w[i]
+        out[i - 2] += coefficients[2] * w[i]
+    return out
+
+
+@jit(nopython=True, cache=True)
+def _factor(ar, ma, weight, border_hessian, border_product, support):
+    """
+    Factorizes the reduced Newton matrix [M'M + A' diag(weight) A, M'J; J'M, J'J + diag(regularization)]: the \
+    pentadiagonal block by a banded Cholesky decomposition (diagonal and two subdiagonals of L), the Schur \
+    complement of the border by a dense one.
+    """
+
+    n = len(weight)
+    diagonal = np.zeros(n)
+    # first[i] = K[i, i - 1], second[i] = K[i, i - 2], padded with zeros for the back substitution
+    first = np.zeros(n + 2)
+    second = np.zeros(n + 2)
+    for i in range(2, n):
+        for coefficients, w in ((ma, 1.0), (ar, weight[i])):
+            c0, c1, c2 = coefficients[0], coefficients[1], coefficients[2]
+            diagonal[i] += w * c0 * c0
+            diagonal[i - 1] += w * c1 * c1
+            diagonal[i - 2] += w * c2 * c2
+            first[i] += w * c0 * c1
+            first[i - 1] += w * c1 * c2
+            second[i] += w * c0 * c2
+
+    for i in range(n):
+        if i >= 2:
+            second[i] = second[i] / diagonal[i - 2]
+        if i >= 1:
+            first[i] = (first[i] - (second[i] * first[i - 1] if i >= 2 else 0.0)) / diagonal[i - 1]
+        d = diagonal[i] - first[i] ** 2 - second[i] ** 2
+        if not d > 0:
+            raise ArithmeticError("singular KKT matrix")
+        diagonal[i] = np.sqrt(d)
+
+    factor = (1.0 / diagonal, first, second)
+    k = len(border_product)
+    solved_border = np.empty((k, n))  # K^-1 M'J, transposed
+    for j in range(k):
+        solved_border[j] = _banded_solve(factor, border_product[j], support[j, 0])
+    schur = border_hessian.copy()
+    for i in range(k):
+        for j in range(i + 1):
+            value = 0.0
+            for r in range(support[i, 0], support[i, 1]):
+                value += border_product[i, r] * solved_border[j, r]
+            schur[i, j] -= value
+            if j < i:
+                schur[j, i] = schur[i, j]
+    return factor, solved_border, np.linalg.cholesky(schur)
+
+
+@jit(nopython=True, cache=True)
+def _banded_solve(factor, b, offset=0):
+    # solves L L' y = b for the banded Cholesky factor L, b is zero before `offset`
+    inverse, first, second = factor
+    n = len(b)
+    y = np.zeros(n)
+    y1 = y2 = 0.0  # y[i - 1], y[i - 2]
+    for i in range(offset, n):
+        v = (b[i] - first[i] * y1 - second[i] * y2) * inverse[i]
+        y[i] = v
+        y1, y2 = v, y1
+    y1 = y2 = 0.0  # y[i + 1], y[i + 2]
+    for i in range(n - 1, -1, -1):
+        v = (y[i] - first[i + 1] * y1 - second[i + 2] * y2) * inverse[i]
+        y[i] = v
+        y1, y2 = v, y1
+    return y
+
+
+@jit(nopython=True, cache=True)
+def _cholesky_solve(lower, b):
+    k = len(b)
+    y = np.empty(k)
+    for i in range(k):
+        v = b[i]
+        for j in range(i):
+            v -= lower[i, j] * y[j]
+        y[i] = v / lower[i, i]
+    for i in range(k - 1, -1, -1):
+        v = y[i]
+        for j in range(i + 1, k):
+            v -= lower[j, i] * y[j]
+        y[i] = v / lower[i, i]
+    return y
+
+
+@jit(nopython=True, cache=True)
+def _solve_newton(factor, solved_border, schur, border_product, support, rhs_q, rhs_b):
+    u = _banded_solve(factor, rhs_q)
+    reduced = rhs_b.copy()
+    for i in range(len(reduced)):
+        for r in range(support[i, 0], support[i, 1]):
+            reduced[i] -= border_product[i, r] * u[r]
+    db = _cholesky_solve(schur, reduced)
+    for j in range(len(db)):
+        u -= db[j] * solved_border[j]
+    return u, db
+
+
+@jit(nopython=True, cache=True)
+def _max_step(s, ds, z, dz):
+    # largest step in (0, 1 / 0.99] that keeps the slacks and multipliers of the rows 2 to n - 1 nonnegative
+    step = 1.0 / 0.99
+    for i in range(2, len(s)):
+        if ds[i] < 0:
+            step = min(step, -s[i] / ds[i])
+        if dz[i] < 0:
+            step = min(step, -z[i] / dz[i])
+    return step
+
+
+@jit(nopython=True, cache=True)
+def _solve(ar, ma, border, regularization, border_hessian, border_product, support, c, x, s, z, cold, reltol,
+           abstol, feastol, maxiters):
+    n, k = border.shape
+    m = n - 2
+    c_q, c_b = c[:n], c[n:]
+    q, b = x[:n], x[n:]
+
+    if cold:
+        # as cvxopt, start from the solution of the equality constrained problem with unit scaling, with the slacks
+        # and multipliers shifted into the interior of the cone
+        factor, solved_border, schur = _factor(ar, ma, np.ones(n), border_hessian, border_product, support)
+        q[:], b[:] = _solve_newton(factor, solved_border, schur, border_product, support, -c_q, -c_b)
+        s[:] = _toeplitz_dot(ar, q)
+        z[:] = -s
+        for v in (s, z):
+            shift = -np.min(v[2:])
+            if shift >= -1e-8 * max(np.sqrt(np.sum(v[2:] ** 2)), 1.0):
+                v[2:] += 1.0 + shift
+    s[:2] = 0.0
+    z[:2] = 0.0
+
+    norm_c = max(1.0, np.sqrt(np.sum(c ** 2)))
+    converged = False
+    pcost = 0.0
+    iterations = 0
+    for iterations in range(maxiters + 1):
+        residual = _toeplitz_dot(ma, q) + border @ b
+        hessian_q = _toeplitz_tdot(ma, residual)
+        hessian_b = border.T @ residual + regularization * b
+        pcost = 0.5 * (q @ hessian_q + b @ hessian_b) + c_q @ q + c_b @ b
+
+        # residuals of stationarity and of the constraints A q - s = 0
+        r_q = hessian_q + c_q - _toeplitz_tdot(ar, z)
+        r_b = hessian_b + c_b
+        r_p = s - _toeplitz_dot(ar, q)
+        r_p[:2] = 0.0
+        gap = s @ z
+        dcost = pcost + z @ r_p - gap
+        pres = np.sqrt(np.sum(r_p ** 2))
+        dres = np.sqrt(np.sum(r_q ** 2) + np.sum(r_b ** 2)) / norm_c
+        if pcost < 0:
+            relgap = gap / -pcost
+        elif dcost > 0:
+            relgap = gap / dcost
+        else:
+            relgap = np.inf
+        if pres <= feastol and dres <= feastol and (gap <= abstol or relgap <= reltol):
+            converged = True
+            break
+        if iterations == maxiters:
+            break
+
+        weight = np.zeros(n)
+        weight[2:] = z[2:] / s[2:]
+        factor, solved_border, schur = _factor(ar, ma, weight, border_hessian, border_product, support)
+        mu = gap / m
+
+        # predictor (affine scaling) and corrector step with the same factorization
+        ds = np.zeros(n)
+        dz = np.zeros(n)
+        r_c = s * z
+        sigma = 0.0
+        for corrector in range(2):
+            w = np.zeros(n)
+            w[2:] = weight[2:] * r_p[2:] - r_c[2:] / s[2:]
+            dq, db = _solve_newton(factor, solved_border, schur, border_product, support,
+                                   -r_q + _toeplitz_tdot(ar, w), -r_b)
+            ds_new = _toeplitz_dot(ar, dq) - r_p
+            dz_new = np.zeros(n)
+            dz_new[2:] = (-r_c[2:] - z[2:] * ds_new[2:]) / s[2:]
+            ds_new[:2] = 0.0
+            if corrector == 0:
+                step = min(1.0, _max_step(s, ds_new, z, dz_new))
+                mu_affine = (s + step * ds_new) @ (z + step * dz_new) / m
+                sigma = min(1.0, (mu_affine / mu) ** 3)
+                r_c = s * z + ds_new * dz_new - sigma * mu
+            else:
+                ds, dz = ds_new, dz_new
+                step = min(1.0, 0.99 * _max_step(s, ds, z, dz))
+                q += step * dq
+                b += step * db
+
+        s += step * ds
+        z += step * dz
+
+    x = np.empty(n + k)
+    x[:n] = q
+    x[n:] = b
+    return x, s, z, iterations, converged, pcost
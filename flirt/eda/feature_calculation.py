@@ -1,22 +1,77 @@
 import multiprocessing
+import time
 import warnings
-from datetime import timedelta
+from collections import namedtuple
+from functools import lru_cache
+from typing import List
 
 import cvxopt as cvx
 import numpy as np
 import pandas as pd
 from joblib import Parallel, delayed
-from tqdm.autonotebook import trange
-from ..util import processing
+from scipy import interpolate
+from tqdm.autonotebook import tqdm
+from ..util import processing, selection, windowing
 
-from ..stats.common import get_stats
+from . import banded_qp
+from ..stats import sliding
+from ..stats.common import FEATURES, OPTIONAL_FEATURES, get_stats
+
+# 'cvxeda' solves the cvxEDA problem, 'spline' approximates its decomposition in linear time, see __approximate_eda
+METHODS = ['cvxeda', 'spline']
+
+# weight of the samples above the tonic spline of the 'spline' method (those below get 1 - APPROXIMATE_ASYMMETRY)
+# and the maximum number of reweighted fits
+APPROXIMATE_ASYMMETRY = 0.3
+APPROXIMATE_ITERATIONS = 5
+
+# windows whose skin conductance stays below the lower bound (e.g. a sensor off the wrist), above the upper bound
+# (a saturated sensor) or whose standard deviation is below FLAT_STD (a flat line), all in μS, as well as windows with
+# missing values carry no usable signal and are skipped without decomposing them
+EDA_RANGE = (0.01, 100.)
+FLAT_STD = 1e-4
+
+# 'window' decomposes every window on its own, 'signal' decomposes the whole signal once
+DECOMPOSITIONS = ['window', 'signal']
+
+# length of the blocks in which the 'signal' decomposition solves cvxEDA and the overlap (halo) added on each side
+# of a block, both in seconds. The halo is discarded after solving, it keeps the border effects of the spline and the
+# Bateman filter out of the stitched signal
+BLOCK_LENGTH = 600
+BLOCK_HALO = 60
+
+# solvers of the cvxEDA problem, see __cvx_eda
+SOLVERS = [None, 'conelp', 'banded']
+
+# options of the cvxopt solvers, see __cvx_eda
+CVX_EDA_OPTIONS = {'reltol': 1e-9, 'show_progress': False}
+
+# default iteration limit of the cvxopt solvers and the banded solver
+MAX_ITERATIONS = 100
+
+# components of windows that cannot be decomposed or exceed the solver limits: None for NaN, 'spline' for the
+# approximate decomposition
+FALLBACKS = [None, 'spline']
+
+# number of cvxEDA models (the structural matrices of one window size and set of parameters) each process keeps
+MODEL_CACHE_SIZE = 8
+
+# distance of a warm start from the boundary of the feasible region, relative to the root mean complementarity
+WARM_START_CENTERING = 10
+
+CvxEdaModel = namedtuple("CvxEdaModel", ["A", "M", "B", "C", "Mt", "Ct", "Bt", "H", "G", "penalty", "ar", "ma"])
 
 
 def get_eda_features(data: pd.Series, window_length: int = 60, window_step_size: int = 1, data_frequency: int = 4,
-                     num_cores: int = 0):
+                     num_cores: int = 0, chunk_size: int = 0, features: List[str] = None, exclude: List[str] = None,
+                     decomposition: str = 'window', warm_start: bool = False, solver: str = None,
+                     method: str = 'cvxeda', max_iterations: int = None, time_limit: float = None,
+                     fallback: str = None, diagnostics: bool = False):
     """
     Computes statistical EDA features based on the signal decompositon into phasic/tonic components of the skin \
-    conductivity.
+    conductivity. Windows without a usable signal, i.e. flat, out of `EDA_RANGE` (such as a sensor off the wrist) \
+    or with missing values, are not decomposed and their features are NaN, as are those of windows that cannot be \
+    decomposed. The number of such windows is reported as a warning.
 
     Parameters
     ----------
@@ -30,11 +85,66 @@ def get_eda_features(data: pd.Series, window_length: int = 60, window_step_size:
         the frequency of the input signal
     num_cores : int, optional
         number of cores to use for parallel processing, by default use all available
+    chunk_size : int, optional
+        number of consecutive windows processed per task, by default chosen based on the number of windows and cores
+    features : List[str], optional
+        names of the features to compute for the tonic and the phasic component (e.g. ['mean', 'std', 'peaks']), \
+        by default all except the optional fractal dimensions ('petrosian_fd', 'katz_fd', 'higuchi_fd', 'dfa') and \
+        entropies ('app_entropy', 'sample_entropy')
+    exclude : List[str], optional
+        names of features not to compute (e.g. ['perm_entropy', 'svd_entropy']), by default none
+    decomposition : str, optional
+        'window' decomposes every window into its phasic and tonic component on its own, 'signal' decomposes each \
+        contiguous segment of the signal only once, in blocks of `BLOCK_LENGTH` seconds that overlap by \
+        `BLOCK_HALO` seconds and are trimmed and stitched after solving, and computes the features of all windows \
+        from the stitched components. As every sample is decomposed about once instead of once per window, this is \
+        more than an order of magnitude faster. The components then do not depend on where a window starts, so \
+        they differ from the 'window' decomposition mostly close to the window borders, by default 'window'
+    warm_start : bool, optional
+        whether the 'window' decomposition starts the solver of each window from the solution of the previous \
+        window of the same chunk, shifted by the window step, instead of from scratch. The saving depends on how \
+        much consecutive windows overlap: for 60 second windows of the bundled 4 Hz recording, it saves about 50% \
+        of the solver iterations at a step of 1 second and about 30% at a step of 10 seconds. The components agree \
+        with those of a cold start within the tolerance of the solver, by default False
+    solver : str, optional
+        the solver of the cvxEDA problem, None for the sparse QP solver of cvxopt, 'conelp' for cvxopt's cone \
+        program solver or 'banded' for an interior-point method that exploits the band structure of the problem \
+        (see `flirt.eda.banded_qp`), which is several times faster for the usual window lengths and agrees with \
+        cvxopt within the tolerance of the solvers, by default None
+    method : str, optional
+        'cvxeda' decomposes the signal by solving the cvxEDA problem, 'spline' approximates the decomposition in \
+        linear time: the tonic component is a cubic spline with knots every 10 seconds fitted to each contiguous \
+        segment of the signal by asymmetric least squares and the phasic component is the residual. The 'spline' \
+        method always decomposes the whole signal and ignores `decomposition`, `warm_start` and `solver`. It is \
+        orders of magnitude faster but only approximates the cvxEDA components (see `benchmarks/eda_benchmark.py`), \
+        by default 'cvxeda'
+    max_iterations : int, optional
+        maximum number of solver iterations per window (or block of the 'signal' decomposition), by default the \
+        limit of the solver (`MAX_ITERATIONS`)
+    time_limit : float, optional
+        time budget in seconds for solving a window (or block). The solver first runs a single iteration to \
+        estimate the time per iteration, then restarts for as many iterations as fit into the remaining budget and \
+        resumes from its last iterate while time is left. Solves within the budget cost one extra iteration and \
+        give the same components as without a limit. The 'conelp' solver cannot resume and is only checked after \
+        solving, by default unlimited
+    fallback : str, optional
+        the components of windows (or blocks) that cannot be decomposed or that exceed `max_iterations` or \
+        `time_limit` before converging, None for NaN or 'spline' for the approximate decomposition of the 'spline' \
+        method, by default None
+    diagnostics : bool, optional
+        whether to also return the solve time in seconds, the number of solver iterations and the status of each \
+        window, or of each block of the 'signal' decomposition, by default False
 
     Returns
     -------
     EDA Features: pd.DataFrame
         A DataFrame containing statistical aggregation features of the tonic/phasic EDA components.
+    Diagnostics: pd.DataFrame
+        Only if `diagnostics` is set, the columns 'solve_time', 'iterations' and 'status' of each window indexed \
+        like the features, or of each block indexed by the end of the samples it contributes. The status is \
+        'optimal', the status of the solver if it stopped otherwise (e.g. 'unknown'), 'limit' if it exceeded \
+        `max_iterations` or `time_limit`, 'failed' if it raised an error or 'skipped' for windows without a usable \
+        signal. The frame is empty for the 'spline' method.
 
     Examples
     --------
@@ -48,23 +158,81 @@ def get_eda_features(data: pd.Series, window_length: int = 60, window_step_size:
     # ensure we have a DatetimeIndex, needed for calculation
     if not isinstance(input_data.index, pd.DatetimeIndex):
         input_data.index = pd.DatetimeIndex(input_data.index)
-
-    # use only every nth value
-    inputs = trange(0, len(input_data) - 1, window_step_size * data_frequency, desc="EDA features")
+    if not input_data.index.is_monotonic_increasing:
+        input_data.sort_index(inplace=True)
 
     if not num_cores >= 1:
         num_cores = multiprocessing.cpu_count()
 
-    def process(memmap_data) -> dict:
-        with Parallel(n_jobs=num_cores, max_nbytes=None) as parallel:
-            return parallel(delayed(__get_scr_scl)
-                            (memmap_data, window_length=window_length, data_frequency=data_frequency, i=k) for k in
-                            inputs)
+    if method not in METHODS:
+        raise ValueError("invalid method: " + method)
+    if decomposition not in DECOMPOSITIONS:
+        raise ValueError("invalid decomposition: " + decomposition)
+    if solver not in SOLVERS:
+        raise ValueError("invalid solver: " + str(solver))
+    if fallback not in FALLBACKS:
+        raise ValueError("invalid fallback: " + str(fallback))
+
+    features = selection.select_features(FEATURES, features, exclude, OPTIONAL_FEATURES)
 
-    results = processing.memmap_auto(input_data, process)
+    # use only every nth value
+    windows = windowing.get_sample_windows(input_data.index, window_length, window_step_size, data_frequency)
+    num_windows = len(windows.start)
+
+    usable = __get_usable_windows(input_data.to_numpy(dtype=np.float64), windows)
+    skipped = windows.datetime[~usable].rename('datetime')
+    windows = windowing.Windows(*(x[usable] for x in windows))
 
-    results = pd.DataFrame(list(filter(None, results)))
-    results.set_index('datetime', inplace=True)
+    if method == 'spline' or decomposition == 'signal':
+        inputs = tqdm(windowing.get_chunks(windows, num_cores, chunk_size), desc="EDA features")
+
+        # the blocks and the chunks of windows are processed by the same workers
+        with Parallel(n_jobs=num_cores, max_nbytes=None) as parallel:
+            if method == 'spline':
+                phasic, tonic = __approximate_signal(input_data, data_frequency)
+                solves = pd.DataFrame(columns=['solve_time', 'iterations', 'status'])
+            else:
+                phasic, tonic, solves = __decompose_signal(input_data, data_frequency, parallel, solver,
+                                                           max_iterations, time_limit, fallback)
+            components = pd.DataFrame({'tonic': tonic, 'phasic': phasic}, index=input_data.index)
+            results = processing.memmap_auto(components, lambda memmap_data: parallel(
+                delayed(__get_component_stats)(memmap_data, windows=chunk, features=features) for chunk in inputs))
+
+        unit = 'blocks'
+        # windows that overlap samples which could not be decomposed, __get_component_stats leaves them NaN
+        missing = np.r_[0, np.cumsum(~(np.isfinite(tonic) & np.isfinite(phasic)))]
+        failed = np.count_nonzero(missing[windows.stop] > missing[windows.start])
+        if failed > 0:
+            warnings.warn(f'{failed} of {num_windows} windows overlap samples that could not be decomposed, their '
+                          f'features are NaN', stacklevel=3)
+    else:
+        inputs = tqdm(windowing.get_chunks(windows, num_cores, chunk_size), desc="EDA features")
+
+        def process(memmap_data) -> list:
+            with Parallel(n_jobs=num_cores, max_nbytes=None) as parallel:
+                return parallel(delayed(__get_scr_scl)(memmap_data, windows=chunk, data_frequency=data_frequency,
+                                                       features=features, warm_start=warm_start, solver=solver,
+                                                       max_iterations=max_iterations, time_limit=time_limit,
+                                                       fallback=fallback)
+                                for chunk in inputs)
+
+        results = processing.memmap_auto(input_data, process)
+        solves = pd.concat([chunk_solves for _, chunk_solves in results] + [pd.DataFrame(
+            {'solve_time': 0., 'iterations': 0, 'status': 'skipped'}, index=skipped)])
+        results = [chunk_results for chunk_results, _ in results]
+        unit = 'windows'
+
+    if len(skipped) > 0:
+        warnings.warn(f'{len(skipped)} of {num_windows} windows contain no usable EDA signal (flat, out of range or '
+                      f'missing values) and were skipped, their features are NaN', stacklevel=3)
+    for status, reason in [('failed', 'could not be decomposed'), ('limit', 'exceeded the solver limits')]:
+        count = np.count_nonzero(solves['status'] == status)
+        if count > 0:
+            consequence = 'NaN' if fallback is None else 'approximated by the ' + fallback + ' decomposition'
+            warnings.warn(f'{count} of {len(solves)} {unit} {reason}, their components are {consequence}',
+                          stacklevel=3)
+
+    results = pd.concat(results + [pd.DataFrame(index=skipped)]) if results or len(skipped) > 0 else pd.DataFrame()
     results.sort_index(inplace=True)
 
     for column in results.columns:
@@ -73,35 +241,231 @@ def get_eda_features(data: pd.Series, window_length: int = 60, window_step_size:
         if proportion > 0.05:
             warnings.warn(str(column) + " contains more than 5% (actual: " + str((proportion * 100).round(2))
                           + "%) nan, inf, or -inf values. We recommend to delete this feature column.", stacklevel=3)
-    return results
 
+    if diagnostics:
+        return results, solves.sort_index()
+    return results
 
-def __get_scr_scl(data: pd.Series, window_length: int, data_frequency: int, i: int):
-    if pd.Timedelta(data.index[i + 1] - data.index[i]).total_seconds() <= window_length:
-        min_timestamp = data.index[i]
-        max_timestamp = min_timestamp + timedelta(seconds=window_length)
 
-        results = {
-            'datetime': max_timestamp,
-        }
+def __get_scr_scl(data: pd.Series, windows: windowing.Windows, data_frequency: int,
+                  features: List[str] = None, warm_start: bool = False, solver: str = None, max_iterations: int = None,
+                  time_limit: float = None, fallback: str = None) -> (pd.DataFrame, pd.DataFrame):
+    results = []
+    solves = []
+    previous = None  # start, number of samples and solver result of the previous window
+    for start, stop in zip(windows.start, windows.stop):
+        relevant_data = data.iloc[start:stop]
 
-        relevant_data = data.loc[(data.index >= min_timestamp) & (data.index < max_timestamp)]
+        initvals = None
+        if warm_start and previous is not None and previous[1] == stop - start \
+                and 0 < start - previous[0] < stop - start:
+            initvals = __shift_solution(previous[2], stop - start, start - previous[0])
 
+        window_results = {}
+        previous = None
+        start_time = time.perf_counter()
         try:
-            r, t = __cvx_eda(relevant_data.values, 1 / data_frequency)
-            results.update(get_stats(np.ravel(t), 'tonic'))
-            results.update(get_stats(np.ravel(r), 'phasic'))
+            r, t, solution = __solve_cvx_eda(relevant_data.values, 1 / data_frequency, solver=solver,
+                                             initvals=initvals, max_iterations=max_iterations, time_limit=time_limit)
+            iterations, status = solution['iterations'], solution['status']
         except Exception:
-            pass
+            r, t, iterations, status = None, None, np.nan, 'failed'
+        solves.append({'solve_time': time.perf_counter() - start_time, 'iterations': iterations, 'status': status})
 
-        return results
+        if status == 'optimal':
+            previous = (start, stop - start, solution)
+        elif status in ['limit', 'failed']:
+            r, t = __approximate_eda(relevant_data.values, 1 / data_frequency) if fallback == 'spline' else (None, None)
+        if r is not None:
+            window_results.update(get_stats(np.ravel(t), 'tonic', features=features))
+            window_results.update(get_stats(np.ravel(r), 'phasic', features=features))
+        results.append(window_results)
 
-    else:
-        return None
+    index = windows.datetime.rename('datetime')
+    return pd.DataFrame(results, index=index), pd.DataFrame(solves, index=index)
+
+
+def __get_usable_windows(values: np.ndarray, windows: windowing.Windows) -> np.ndarray:
+    """
+    Flags the windows with a usable EDA signal, i.e. without missing values, with a standard deviation of at least \
+    `FLAT_STD` and not entirely below or above `EDA_RANGE`. The sliding moments, minima and maxima of all windows \
+    are computed in a single pass over the signal.
+    """
+
+    finite = np.isfinite(values)
+    missing = np.r_[0, np.cumsum(~finite)]
+    values = np.where(finite, values, 0.)
+
+    _, _, m2, _, _, _ = sliding._rolling_moments(values, windows.start, windows.stop)
+    low, high = sliding._rolling_min_max(values, windows.start, windows.stop)
+    # empty windows have NaN moments and are not usable either
+    with np.errstate(invalid='ignore'):
+        return (missing[windows.stop] == missing[windows.start]) & (np.sqrt(m2) >= FLAT_STD) \
+               & (high >= EDA_RANGE[0]) & (low <= EDA_RANGE[1])
+
+
+def __shift_solution(solution: dict, n: int, shift: int) -> dict:
+    """
+    Turns the QP solution of a window into the starting point of the window `shift` samples later. The driver \
+    samples, their slacks and their multipliers are shifted and the new samples repeat the last ones, the \
+    spline and trend coefficients are kept. The slacks and multipliers are moved back into the interior of the \
+    feasible region by a multiple of the square root of their mean complementarity, as interior-point iterations \
+    stall if they start right at its boundary.
+    """
+
+    def shifted(values):
+        values = np.ravel(np.array(values))
+        return np.r_[values[shift:], np.repeat(values[-1], shift)]
+
+    x = np.ravel(np.array(solution['x']))
+    s = np.maximum(shifted(solution['s']), 0)
+    z = np.maximum(shifted(solution['z']), 0)
+    centering = WARM_START_CENTERING * np.sqrt(max(np.dot(s, z) / n, np.finfo(float).tiny))
+    return {'x': cvx.matrix(np.r_[shifted(x[:n]), x[n:]]), 's': cvx.matrix(s + centering),
+            'z': cvx.matrix(z + centering)}
+
+
+def __decompose_signal(data: pd.Series, data_frequency: int, parallel: Parallel, solver: str = None,
+                       max_iterations: int = None, time_limit: float = None,
+                       fallback: str = None) -> (np.ndarray, np.ndarray, pd.DataFrame):
+    """
+    Decomposes the whole signal into its phasic and tonic component, solving cvxEDA once per block of each finite \
+    contiguous segment. Samples of blocks that cannot be solved within the limits are NaN or approximated, \
+    depending on the fallback. Also returns the solve time, number of iterations and status of each block.
+    """
+
+    values = data.to_numpy(dtype=np.float64)
+    block_length = int(BLOCK_LENGTH * data_frequency)
+    halo = int(BLOCK_HALO * data_frequency)
+
+    blocks = []
+    # non-finite samples are not decomposed, so that they do not spoil the whole block around them
+    for segment_start, segment_stop in zip(*windowing.get_segments(data.index, data_frequency, values)):
+        # split the segment into blocks of about the block length, the last one absorbs the remainder
+        num_blocks = max(1, int(round((segment_stop - segment_start) / block_length)))
+        bounds = np.round(np.linspace(segment_start, segment_stop, num_blocks + 1)).astype(np.int64)
+        for core_start, core_stop in zip(bounds[:-1], bounds[1:]):
+            blocks.append((core_start, core_stop, max(segment_start, core_start - halo),
+                           min(segment_stop, core_stop + halo)))
+
+    solved = parallel(delayed(__decompose_block)(values[start:stop], data_frequency, solver, max_iterations,
+                                                 time_limit, fallback)
+                      for _, _, start, stop in blocks)
+
+    phasic = np.full(len(values), np.nan)
+    tonic = np.full(len(values), np.nan)
+    for (core_start, core_stop, start, _), (r, t, _) in zip(blocks, solved):
+        phasic[core_start:core_stop] = r[core_start - start:core_stop - start]
+        tonic[core_start:core_stop] = t[core_start - start:core_stop - start]
+
+    index = pd.DatetimeIndex([data.index[core_stop - 1] for _, core_stop, _, _ in blocks], name='datetime')
+    solves = pd.DataFrame([block_solve for _, _, block_solve in solved], index=index + pd.Timedelta(
+        seconds=1 / data_frequency), columns=['solve_time', 'iterations', 'status'])
+    return phasic, tonic, solves
+
+
+def __decompose_block(y: np.ndarray, data_frequency: int, solver: str = None, max_iterations: int = None,
+                      time_limit: float = None, fallback: str = None) -> (np.ndarray, np.ndarray, dict):
+    start_time = time.perf_counter()
+    try:
+        r, t, solution = __solve_cvx_eda(y, 1 / data_frequency, solver=solver, max_iterations=max_iterations,
+                                         time_limit=time_limit)
+        r, t, iterations, status = np.ravel(r), np.ravel(t), solution['iterations'], solution['status']
+    except Exception:
+        iterations, status = np.nan, 'failed'
+    solve = {'solve_time': time.perf_counter() - start_time, 'iterations': iterations, 'status': status}
+
+    if status in ['limit', 'failed']:
+        if fallback == 'spline':
+            r, t = __approximate_eda(y, 1 / data_frequency)
+        else:
+            r, t = np.full(len(y), np.nan), np.full(len(y), np.nan)
+    return r, t, solve
+
+
+def __approximate_signal(data: pd.Series, data_frequency: int) -> (np.ndarray, np.ndarray):
+    """
+    Approximates the phasic and tonic component of the whole signal with `__approximate_eda`, one contiguous \
+    segment of finite samples at a time.
+    """
+
+    values = data.to_numpy(dtype=np.float64)
+    phasic = np.full(len(values), np.nan)
+    tonic = np.full(len(values), np.nan)
+    for start, stop in zip(*windowing.get_segments(data.index, data_frequency, values)):
+        phasic[start:stop], tonic[start:stop] = __approximate_eda(values[start:stop], 1 / data_frequency)
+    return phasic, tonic
+
+
+def __solve_cvx_eda(y: np.ndarray, delta: float, solver: str = None, initvals: dict = None,
+                    max_iterations: int = None, time_limit: float = None):
+    """
+    Solves cvxEDA within at most `max_iterations` solver iterations and about `time_limit` seconds. For the time \
+    limit, the solver first runs a single iteration, which estimates the time per iteration, then restarts for as \
+    many iterations as fit into the remaining time and resumes from its last iterate until it converges or exceeds \
+    a limit. The 'conelp' solver cannot resume and is only checked after solving. Returns the components and the \
+    result of the solver with the total number of iterations, its status is 'limit' if a limit stopped the solver \
+    before it converged.
+    """
+
+    start_time = time.perf_counter()
+    iterations = 0
+    iteration_time = None
+    while True:
+        options = dict(CVX_EDA_OPTIONS)
+        if max_iterations is not None:
+            options['maxiters'] = max_iterations - iterations
+        if time_limit is not None and solver != 'conelp':
+            remaining = time_limit - (time.perf_counter() - start_time)
+            budget = 1 if iteration_time is None else int(remaining / iteration_time)
+            if budget < 1:
+                solution['status'] = 'limit'
+                return r, t, solution
+            options['maxiters'] = min(options.get('maxiters', MAX_ITERATIONS - iterations), budget)
+
+        round_start = time.perf_counter()
+        r, t, solution = __cvx_eda(y, delta, solver=solver, options=options, initvals=initvals, full_output=True)
+        round_iterations = solution['iterations']
+        iteration_time = (time.perf_counter() - round_start) / max(round_iterations, 1)
+        iterations += round_iterations
+        solution['iterations'] = iterations
+        if solution['status'] == 'optimal':
+            return r, t, solution
+
+        if (max_iterations is not None and iterations >= max_iterations) \
+                or (time_limit is not None and time.perf_counter() - start_time >= time_limit):
+            solution['status'] = 'limit'
+            return r, t, solution
+        if 'maxiters' not in options or round_iterations < options['maxiters'] \
+                or (max_iterations is None and iterations >= MAX_ITERATIONS):
+            # the solver stopped for another reason than the limits, or at its own iteration limit
+            return r, t, solution
+        # the first iteration only estimates the time per iteration, the solver restarts from where it started
+        if iterations > round_iterations:
+            initvals = __shift_solution(solution, len(y), 0)
+
+
+def __get_component_stats(data: pd.DataFrame, windows: windowing.Windows, features: List[str] = None) -> pd.DataFrame:
+    offset = windows.start[0]
+    relevant_data = data.iloc[offset:windows.stop[-1]]
+    start, stop = windows.start - offset, windows.stop - offset
+
+    # as in the 'window' decomposition, windows with samples that could not be decomposed have NaN features
+    non_finite = ~np.isfinite(relevant_data[['tonic', 'phasic']].to_numpy())
+    missing = np.r_[0, np.cumsum(non_finite.any(axis=1))]
+    decomposed = missing[stop] == missing[start]
+
+    results = {}
+    for column in ['tonic', 'phasic']:
+        results.update(sliding.get_sliding_stats(relevant_data[column].to_numpy(), start[decomposed],
+                                                 stop[decomposed], column, method='numba', features=features))
+
+    index = windows.datetime.rename('datetime')
+    return pd.DataFrame(results, index=index[decomposed]).reindex(index)
 
 
 def __cvx_eda(y, delta, tau0=2., tau1=0.7, delta_knot=10., alpha=8e-4, gamma=1e-2, solver=None,
-              options={'reltol': 1e-9, 'show_progress': False}):
+              options=CVX_EDA_OPTIONS, initvals=None, full_output=False):
     """
     CVXEDA Convex optimization approach to electrodermal activity processing
     This function implements the cvxEDA algorithm described in "cvxEDA: a
@@ -123,8 +487,11 @@ def __cvx_eda(y, delta, tau0=2., tau1=0.7, delta_knot=10., alpha=8e-4, gamma=1e-
        delta_knot: time between knots of the tonic spline function
        alpha: penalization for the sparse SMNA driver
        gamma: penalization for the tonic spline coefficients
-       solver: sparse QP solver to be used, see cvxopt.solvers.qp
+       solver: sparse QP solver to be used, see cvxopt.solvers.qp, 'conelp' to solve the problem as a cone program,
+          or 'banded' to use the structure-exploiting interior-point method of flirt.eda.banded_qp
        options: solver options, see: http://cvxopt.org/userguide/coneprog.html#algorithm-parameters
+       initvals: starting point of the qp solver (keys 'x', 's', 'z'), see cvxopt.solvers.qp, by default a cold start
+       full_output: whether to also return the result of the solver
     Returns (see paper for details):
        r: phasic component
        p: sparse SMNA driver of phasic component
@@ -133,38 +500,14 @@ def __cvx_eda(y, delta, tau0=2., tau1=0.7, delta_knot=10., alpha=8e-4, gamma=1e-
        d: offset and slope of the linear drift term
        e: model residuals
        obj: value of objective function being minimized (eq 15 of paper)
+       res: result of the solver, only if full_output is set
     """
 
     n = len(y)
     y = cvx.matrix(y)
-
-    # bateman ARMA model
-    a1 = 1. / min(tau1, tau0)  # a1 > a0
-    a0 = 1. / max(tau1, tau0)
-    ar = np.array([(a1 * delta + 2.) * (a0 * delta + 2.), 2. * a1 * a0 * delta ** 2 - 8.,
-                   (a1 * delta - 2.) * (a0 * delta - 2.)]) / ((a1 - a0) * delta ** 2)
-    ma = np.array([1., 2., 1.])
-
-    # matrices for ARMA model
-    i = np.arange(2, n)
-    A = cvx.spmatrix(np.tile(ar, (n - 2, 1)), np.c_[i, i, i], np.c_[i, i - 1, i - 2], (n, n))
-    M = cvx.spmatrix(np.tile(ma, (n - 2, 1)), np.c_[i, i, i], np.c_[i, i - 1, i - 2], (n, n))
-
-    # spline
-    delta_knot_s = int(round(delta_knot / delta))
-    spl = np.r_[np.arange(1., delta_knot_s), np.arange(delta_knot_s, 0., -1.)]  # order 1
-    spl = np.convolve(spl, spl, 'full')
-    spl /= max(spl)
-    # matrix of spline regressors
-    i = np.c_[np.arange(-(len(spl) // 2), (len(spl) + 1) // 2)] + np.r_[np.arange(0, n, delta_knot_s)]
-    nB = i.shape[1]
-    j = np.tile(np.arange(nB), (len(spl), 1))
-    p = np.tile(spl, (nB, 1)).T
-    valid = (i >= 0) & (i < n)
-    B = cvx.spmatrix(p[valid], i[valid], j[valid])
-
-    # trend
-    C = cvx.matrix(np.c_[np.ones(n), np.arange(1., n + 1.) / n])
+    A, M, B, C, Mt, Ct, Bt, H, G, penalty, _, _ = __get_cvx_eda_model(n, delta, tau0, tau1, delta_knot, alpha,
+                                                                      gamma)
+    nB = B.size[1]
     nC = C.size[1]
 
     # Solve the problem:
@@ -181,17 +524,21 @@ def __cvx_eda(y, delta, tau0=2., tau1=0.7, delta_knot=10., alpha=8e-4, gamma=1e-
                         [z(n, 1), -1, 1, z(n + nB + 2, 1)], [z(2 * n + 2, 1), -1, 1, z(nB, 1)],
                         [z(n + 2, nB), B, z(2, nB), cvx.spmatrix(1.0, range(nB), range(nB))]])
         h = cvx.matrix([z(n, 1), .5, .5, y, .5, .5, z(nB, 1)])
-        c = cvx.matrix([(cvx.matrix(alpha, (1, n)) * A).T, z(nC, 1), 1, gamma, z(nB, 1)])
+        c = cvx.matrix([penalty, z(nC, 1), 1, gamma, z(nB, 1)])
         res = cvx.solvers.conelp(c, G, h, dims={'l': n, 'q': [n + 2, nB + 2], 's': []})
         obj = res['primal objective']
+    elif solver == 'banded':
+        # same QP, solved by an interior-point method exploiting the band structure of A and M
+        f = cvx.matrix([penalty - Mt * y, -(Ct * y), -(Bt * y)])
+        tolerances = {key: options[key] for key in ['reltol', 'abstol', 'feastol', 'maxiters'] if key in options}
+        banded = __get_banded_model(n, delta, tau0, tau1, delta_knot, alpha, gamma)
+        res = banded_qp.solve_banded_qp(banded, np.array(f), initvals=initvals, **tolerances)
+        res.update({key: cvx.matrix(res[key]) for key in ['x', 's', 'z']})
+        obj = res['primal objective'] + .5 * (y.T * y)
     else:
-        # Use qp
-        Mt, Ct, Bt = M.T, C.T, B.T
-        H = cvx.sparse([[Mt * M, Ct * M, Bt * M], [Mt * C, Ct * C, Bt * C],
-                        [Mt * B, Ct * B, Bt * B + gamma * cvx.spmatrix(1.0, range(nB), range(nB))]])
-        f = cvx.matrix([(cvx.matrix(alpha, (1, n)) * A).T - Mt * y, -(Ct * y), -(Bt * y)])
-        res = cvx.solvers.qp(H, f, cvx.spmatrix(-A.V, A.I, A.J, (n, len(f))),
-                             cvx.matrix(0., (n, 1)), solver=solver)
+        # Use qp, only the linear term depends on the signal
+        f = cvx.matrix([penalty - Mt * y, -(Ct * y), -(Bt * y)])
+        res = cvx.solvers.qp(H, f, G, cvx.matrix(0., (n, 1)), solver=solver, initvals=initvals)
         obj = res['primal objective'] + .5 * (y.T * y)
     # cvx.solvers.options.clear()
     # cvx.solvers.options.update(old_options)
@@ -204,5 +551,105 @@ def __cvx_eda(y, delta, tau0=2., tau1=0.7, delta_knot=10., alpha=8e-4, gamma=1e-
     r = M * q
     e = y - r - t
 
+    if full_output:
+        return r, t, res
     return r, t
     # return r, p, t, l, d, e, obj
+
+
+def __approximate_eda(y: np.ndarray, delta: float, delta_knot: float = 10., asymmetry: float = APPROXIMATE_ASYMMETRY,
+                      iterations: int = APPROXIMATE_ITERATIONS) -> (np.ndarray, np.ndarray):
+    """
+    Approximates the decomposition of cvxEDA in linear time. The tonic component is a cubic B-spline with knots \
+    every `delta_knot` seconds, the same basis as the tonic spline of cvxEDA, fitted by asymmetric least squares: \
+    the fit is repeated with a weight of `asymmetry` for the samples above the spline and `1 - asymmetry` for those \
+    below, so that the spline follows the base level rather than the mean of the non-negative phasic responses. \
+    Each fit solves a banded least squares problem. The phasic component is the residual. Signals with fewer than \
+    four samples or non-finite values cannot be decomposed, their components are NaN.
+
+    Returns:
+       r: phasic component
+       t: tonic component
+    """
+
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n < 4 or not np.all(np.isfinite(y)):
+        return np.full(n, np.nan), np.full(n, np.nan)
+
+    # cubic spline with boundary knots at the first and last sample, the last interval spans at least half a knot
+    x = np.arange(n) * delta
+    knots = np.r_[np.repeat(x[0], 4), np.arange(delta_knot, x[-1] - delta_knot / 2, delta_knot), np.repeat(x[-1], 4)]
+
+    weights = np.ones(n)
+    for _ in range(iterations):
+        t = interpolate.make_lsq_spline(x, y, knots, k=3, w=weights)(x)
+        updated = np.where(y > t, asymmetry, 1 - asymmetry)
+        if np.array_equal(updated, weights):
+            break
+        weights = updated
+
+    return y - t, t
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def __get_cvx_eda_model(n: int, delta: float, tau0: float, tau1: float, delta_knot: float, alpha: float,
+                        gamma: float) -> CvxEdaModel:
+    """
+    Builds the matrices of the cvxEDA model that only depend on the number of samples and the parameters, i.e. \
+    the ARMA matrices `A` and `M`, the spline basis `B`, the trend `C`, the Hessian `H` and the constraints `G` \
+    of the QP, the penalty of the SMNA driver and the coefficients `ar` and `ma` of the Bateman ARMA model. \
+    These are identical for all windows of the same size and are cached per process.
+    """
+
+    # bateman ARMA model
+    a1 = 1. / min(tau1, tau0)  # a1 > a0
+    a0 = 1. / max(tau1, tau0)
+    ar = np.array([(a1 * delta + 2.) * (a0 * delta + 2.), 2. * a1 * a0 * delta ** 2 - 8.,
+                   (a1 * delta - 2.) * (a0 * delta - 2.)]) / ((a1 - a0) * delta ** 2)
+    ma = np.array([1., 2., 1.])
+
+    # matrices for ARMA model
+    i = np.arange(2, n)
+    A = cvx.spmatrix(np.tile(ar, (n - 2, 1)), np.c_[i, i, i], np.c_[i, i - 1, i - 2], (n, n))
+    M = cvx.spmatrix(np.tile(ma, (n - 2, 1)), np.c_[i, i, i], np.c_[i, i - 1, i - 2], (n, n))
+
+    # spline
+    delta_knot_s = int(round(delta_knot / delta))
+    spl = np.r_[np.arange(1., delta_knot_s), np.arange(delta_knot_s, 0., -1.)]  # order 1
+    spl = np.convolve(spl, spl, 'full')
+    spl /= max(spl)
+    # matrix of spline regressors
+    i = np.c_[np.arange(-(len(spl) // 2), (len(spl) + 1) // 2)] + np.r_[np.arange(0, n, delta_knot_s)]
+    nB = i.shape[1]
+    j = np.tile(np.arange(nB), (len(spl), 1))
+    p = np.tile(spl, (nB, 1)).T
+    valid = (i >= 0) & (i < n)
+    B = cvx.spmatrix(p[valid], i[valid], j[valid])
+
+    # trend
+    C = cvx.matrix(np.c_[np.ones(n), np.arange(1., n + 1.) / n])
+
+    Mt, Ct, Bt = M.T, C.T, B.T
+    H = cvx.sparse([[Mt * M, Ct * M, Bt * M], [Mt * C, Ct * C, Bt * C],
+                    [Mt * B, Ct * B, Bt * B + gamma * cvx.spmatrix(1.0, range(nB), range(nB))]])
+    G = cvx.spmatrix(-A.V, A.I, A.J, (n, n + C.size[1] + nB))
+    penalty = (cvx.matrix(alpha, (1, n)) * A).T
+
+    return CvxEdaModel(A, M, B, C, Mt, Ct, Bt, H, G, penalty, ar, ma)
+
+
+@lru_cache(maxsize=MODEL_CACHE_SIZE)
+def __get_banded_model(n: int, delta: float, tau0: float, tau1: float, delta_knot: float, alpha: float,
+                       gamma: float) -> banded_qp.BandedModel:
+    """
+    Builds the structure of the cvxEDA QP for the 'banded' solver from the cached model, only once this solver is \
+    used, and caches it per process like the model.
+    """
+
+    model = __get_cvx_eda_model(n, delta, tau0, tau1, delta_knot, alpha, gamma)
+    nB = model.B.size[1]
+    nC = model.C.size[1]
+    return banded_qp.get_banded_model(model.ar, model.ma,
+                                      np.c_[np.array(model.C), np.array(cvx.matrix(model.B, (n, nB)))],
+                                      np.r_[np.zeros(nC), np.full(nB, gamma)])
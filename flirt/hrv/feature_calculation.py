@@ -1,6 +1,6 @@
 import datetime
 import multiprocessing
-from typing import List
+from typing import List, Union
 import warnings
 
 import numpy as np
@@ -8,12 +8,15 @@ import pandas as pd
 from joblib import Parallel, delayed
 from tqdm import tqdm
 
-from .features.data_utils import DomainFeatures
-from .features.fd_features import FdFeatures
+from .features.data_utils import DomainFeatures, FusedFeatures, MOMENT_PERCENTILES, WindowMoments, \
+    get_window_moments
+from .features.fd_features import BATCH_METHODS, FdFeatures
 from .features.nl_features import NonLinearFeatures
 from .features.td_features import TdFeatures
-from ..stats.common import get_stats
-from ..util import processing
+from ..stats.common import OPTIONAL_FEATURES, get_feature_names, get_stats
+from ..stats.sliding import ROLLING_FUNCTIONS, ROLLING_PERCENTILES, get_difference_stats, get_moment_stats, \
+    get_sliding_stats
+from ..util import processing, selection, windowing
 
 # disable astropy warnings
 try:
@@ -24,11 +27,38 @@ except:
 
 
 class StatFeatures(DomainFeatures):
+    def __init__(self, features: List[str] = None):
+        self.features = features
+
     def __get_type__(self) -> str:
         return "Statistical"
 
+    def __get_features__(self) -> List[str]:
+        return get_feature_names(features=self.features)
+
+    def __get_optional_features__(self) -> List[str]:
+        return OPTIONAL_FEATURES
+
     def __generate__(self, data: np.array) -> dict:
-        return get_stats(data, 'hrv')
+        return get_stats(data, 'hrv', features=self.features)
+
+    def __generate_batch__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray) -> dict:
+        return self.__generate_from_moments__(data, start, stop, get_window_moments(data, start, stop))
+
+    def __generate_from_moments__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray,
+                                  moments: WindowMoments) -> dict:
+        keys = self.__get_features__()
+        values = np.asarray(data, dtype=np.float64)
+        percentiles = moments.percentiles[[list(MOMENT_PERCENTILES).index(p) for p in ROLLING_PERCENTILES]]
+        results = get_moment_stats(moments.length, moments.mean, moments.var, moments.m3, moments.m4,
+                                   moments.energy, moments.minimum, moments.maximum, percentiles)
+        results.update(get_difference_stats(values, start, stop))
+
+        # peaks, the counts around the mean and the entropies need the samples of each window
+        other_keys = [key for key in keys if key not in ROLLING_FUNCTIONS]
+        if other_keys:
+            results.update(get_sliding_stats(values, start, stop, method='numba', features=other_keys))
+        return {'hrv_' + key: results[key] for key in keys}
 
 
 FEATURE_FUNCTIONS = {
@@ -39,9 +69,10 @@ FEATURE_FUNCTIONS = {
 }
 
 
-def get_hrv_features(data: pd.Series, window_length: int = 180, window_step_size: int = 1,
+def get_hrv_features(data: pd.Series, window_length: Union[int, List[int]] = 180, window_step_size: int = 1,
                      domains: List[str] = ['td', 'fd', 'stat'], threshold: float = 0.2,
-                     clean_data: bool = True, num_cores: int = 0):
+                     clean_data: bool = True, num_cores: int = 0, chunk_size: int = 0, features: List[str] = None,
+                     exclude: List[str] = None, fd_method: str = 'lomb'):
     """
     Computes HRV features for different domains (time-domain, frequency-domain, non-linear, statistical).
 
@@ -49,8 +80,10 @@ def get_hrv_features(data: pd.Series, window_length: int = 180, window_step_size
     ----------
     data : pd.Series
         input IBIs in milliseconds
-    window_length : int
-        the epoch width (aka window size) in seconds to consider
+    window_length : int or List[int]
+        the epoch width (aka window size) in seconds to consider. Given a list, the features of all window lengths \
+        are computed in one pass, sharing the cleaned IBIs, the window starts and the worker processes, and are \
+        returned in one DataFrame with the window length as column suffix (e.g. hrv_rmssd_60, hrv_rmssd_300)
     window_step_size : int
         the step size for the sliding window in seconds
     domains : List[str]
@@ -62,6 +95,25 @@ def get_hrv_features(data: pd.Series, window_length: int = 180, window_step_size
         whether obviously invalid IBIs should be removed before processing, by default True
     num_cores : int, optional
         number of cores to use for parallel processing, by default use all available
+    chunk_size : int, optional
+        number of consecutive windows processed per task, by default chosen based on the number of windows and cores
+    features : List[str], optional
+        names of the features to compute from the chosen domains, without the 'hrv_' prefix \
+        (e.g. ['rmssd', 'sdnn', 'lf', 'hf']), by default all except the optional statistical features \
+        'petrosian_fd', 'katz_fd', 'higuchi_fd', 'dfa', 'app_entropy' and 'sample_entropy' and the optional \
+        non-linear DFA exponents 'dfa_alpha1' (4 to 16 beats) and 'dfa_alpha2' (16 to 64 beats). Domains without any \
+        selected feature are skipped
+    exclude : List[str], optional
+        names of features not to compute (e.g. ['peaks', 'perm_entropy']), by default none
+    fd_method : str, optional
+        how the frequency-domain features are computed, by default 'lomb': 'lomb' computes a Lomb-Scargle \
+        periodogram per window with astropy, on a frequency grid that follows the span of the window's IBIs. \
+        'lomb_grid' evaluates the exact periodograms of all windows of a chunk on one fixed grid in a single \
+        compiled call, much faster than 'lomb'. 'lomb_sliding' computes the same periodograms incrementally, only \
+        adding and removing the IBIs that enter and leave the window, which is fastest for small step sizes. \
+        'lomb_nfft' approximates these periodograms with FFTs, which is \
+        faster for long windows (see `flirt.hrv.features.lomb_scargle.batch_lomb_scargle` for the error bounds). \
+        'welch' uses Welch's method on the interpolated IBIs
 
     Returns
     -------
@@ -94,6 +146,18 @@ def get_hrv_features(data: pd.Series, window_length: int = 180, window_step_size
     if not num_cores >= 1:
         num_cores = multiprocessing.cpu_count()
 
+    for domain in domains:
+        if domain not in FEATURE_FUNCTIONS.keys():
+            raise ValueError("invalid feature domain: " + domain)
+    if fd_method not in ['lomb', 'welch'] + list(BATCH_METHODS):
+        raise ValueError("invalid fd method: " + fd_method)
+
+    window_lengths = list(window_length) if isinstance(window_length, (list, tuple)) else [window_length]
+    registry = [name for domain in domains for name in __get_registry(FEATURE_FUNCTIONS[domain])]
+    optional = [name for domain in domains for name in FEATURE_FUNCTIONS[domain].__get_optional_features__()]
+    selected_features = selection.select_features(registry, features, exclude, optional)
+    columns = ['hrv_' + name for name in selected_features]
+
     if clean_data:
         # print("Cleaning data...")
         clean_data = __clean_artifacts(data.copy())
@@ -106,6 +170,8 @@ def get_hrv_features(data: pd.Series, window_length: int = 180, window_step_size
         clean_data.index = pd.DatetimeIndex(clean_data.index)
 
     clean_data = clean_data[~clean_data.index.duplicated()]
+    if not clean_data.index.is_monotonic_increasing:
+        clean_data.sort_index(inplace=True)
 
     # before starting calculations, make sure that there actually is some data left
     if clean_data.empty:
@@ -113,32 +179,84 @@ def get_hrv_features(data: pd.Series, window_length: int = 180, window_step_size
                       stacklevel=3)
         return pd.DataFrame.empty
 
-    window_length_timedelta = pd.to_timedelta(window_length, unit='s')
     window_step_size_timedelta = pd.to_timedelta(window_step_size, unit='s')
 
+    # the window starts of every window length are a prefix of the starts of the shortest windows
     first_index = clean_data.index[0].floor('s')
     last_index = clean_data.index[-1].ceil('s')
     target_index = pd.date_range(start=first_index,
-                                 end=max(first_index, last_index - window_length_timedelta),
+                                 end=max(first_index, last_index - pd.to_timedelta(min(window_lengths), unit='s')),
                                  freq=window_step_size_timedelta)
+    values = clean_data.to_numpy()
+    sums = np.concatenate([[0.], np.cumsum(values)])
 
-    def process(memmap_data) -> pd.DataFrame:
-        with Parallel(n_jobs=num_cores, max_nbytes=None) as parallel:
-            for domain in domains:
-                if domain not in FEATURE_FUNCTIONS.keys():
-                    raise ValueError("invalid feature domain: " + domain)
-
-            return __generate_features_for_domain(memmap_data, target_index, window_length_timedelta, threshold,
-                                                  feature_functions=[FEATURE_FUNCTIONS.get(x) for x in domains],
-                                                  parallel=parallel)
+    tasks = []
+    for length in window_lengths:
+        length_timedelta = pd.to_timedelta(length, unit='s')
+        window_starts = target_index[target_index <= max(first_index, last_index - length_timedelta)]
+        windows = windowing.get_time_windows(clean_data.index, window_starts, length)
 
-    features = processing.memmap_auto(clean_data, process)
+        # windows with too few IBIs are not dispatched, they only report their number of IBIs
+        valid = __get_valid_windows(values, sums, windows, length_timedelta, threshold)
+        chunks = windowing.get_chunks(windowing.Windows(*(x[valid] for x in windows)), num_cores, chunk_size)
+        tasks.append((length, windows, valid, chunks))
 
-    # only interpolate if there are overlapping time windows
-    if window_length_timedelta > window_step_size_timedelta:
-        limit = max(1, int((1 - threshold) * (window_length / window_step_size)))
-        features.interpolate(method='time', limit=limit, inplace=True)
-    return features
+    def process(memmap_data) -> List[pd.DataFrame]:
+        with Parallel(n_jobs=num_cores, max_nbytes=None) as parallel:
+            return [__generate_features_for_domain(memmap_data, chunks,
+                                                   feature_functions=__get_feature_functions(
+                                                       domains, selected_features, fd_method, length),
+                                                   columns=columns, parallel=parallel)
+                    for length, _, _, chunks in tasks]
+
+    results = processing.memmap_auto(clean_data, process)
+
+    frames = []
+    for (length, windows, valid, _), features in zip(tasks, results):
+        rejected = pd.DataFrame({'num_ibis': windows.stop[~valid] - windows.start[~valid]},
+                                index=windows.datetime[~valid].rename('datetime'))
+        if not rejected.empty:
+            features = pd.concat([features, rejected]).sort_index() if not features.empty else rejected
+            features.index = windows.datetime.rename('datetime')
+
+        # only interpolate if there are overlapping time windows
+        if pd.to_timedelta(length, unit='s') > window_step_size_timedelta:
+            limit = max(1, int((1 - threshold) * (length / window_step_size)))
+            features.interpolate(method='time', limit=limit, inplace=True)
+        frames.append(features)
+
+    if not isinstance(window_length, (list, tuple)):
+        return frames[0]
+    return pd.concat([frame.add_suffix('_' + str(length)) for length, frame in zip(window_lengths, frames)],
+                     axis=1).sort_index()
+
+
+def __get_feature_functions(domains: List[str], features: List[str], fd_method: str,
+                            window_length: int) -> List[DomainFeatures]:
+    feature_functions = []
+    for domain in domains:
+        domain_features = [name for name in __get_registry(FEATURE_FUNCTIONS[domain]) if name in features]
+        if domain == 'stat' and domain_features:
+            # statistical features are only computed as selected, notably skipping find_peaks and the entropies
+            feature_functions.append(StatFeatures(domain_features))
+        elif domain == 'fd' and domain_features:
+            feature_functions.append(FdFeatures(sampling_frequency=1, method=fd_method, window_length=window_length))
+        elif domain == 'nl' and domain_features:
+            feature_functions.append(NonLinearFeatures(features=domain_features))
+        elif domain_features:
+            feature_functions.append(FEATURE_FUNCTIONS[domain])
+
+    # domains derived from the moments of the IBIs share them instead of computing them on their own
+    fused = [f for f in feature_functions if isinstance(f, (TdFeatures, NonLinearFeatures, StatFeatures))]
+    if len(fused) > 1:
+        feature_functions = [f for f in feature_functions if f not in fused] + [FusedFeatures(fused)]
+    return feature_functions
+
+
+def __get_registry(feature_function: DomainFeatures) -> List[str]:
+    # all features a domain offers, including those only computed if they are explicitly selected
+    names = feature_function.__get_features__()
+    return names + [name for name in feature_function.__get_optional_features__() if name not in names]
 
 
 def __clean_artifacts(data: pd.Series, threshold=0.2) -> pd.Series:
@@ -170,35 +288,57 @@ def __clean_artifacts(data: pd.Series, threshold=0.2) -> pd.Series:
     return data
 
 
-def __generate_features_for_domain(clean_data: pd.Series, target_index: pd.DatetimeIndex,
-                                   window_length: datetime.timedelta, threshold: float,
-                                   feature_functions: List[DomainFeatures], parallel: Parallel) -> pd.DataFrame:
-    inputs = tqdm(target_index, desc="HRV features")
+def __get_valid_windows(values: np.ndarray, sums: np.ndarray, windows: windowing.Windows,
+                        window_length: datetime.timedelta, threshold: float) -> np.ndarray:
+    """
+    Checks for all windows at once whether they hold at least the relative portion `threshold` of the IBIs \
+    expected for their mean IBI, `sums` are the prefix sums of the IBIs (starting with 0).
+
+    Returns
+    -------
+    np.ndarray
+        boolean mask of the windows to process
+    """
+
+    num_ibis = windows.stop - windows.start
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = (sums[windows.stop] - sums[windows.start]) / num_ibis
+        threshold_length = window_length.total_seconds() / (mean / 1000) * threshold
+    valid = (num_ibis > 0) & (num_ibis >= threshold_length)
+
+    # differences of cumulative sums round differently than the mean of the window, recheck borderline windows
+    borderline = (num_ibis > 0) & np.isclose(num_ibis, threshold_length, rtol=1e-9, atol=0)
+    for i in np.flatnonzero(borderline):
+        expected_length = window_length.total_seconds() / (values[windows.start[i]:windows.stop[i]].mean() / 1000)
+        valid[i] = num_ibis[i] >= (expected_length * threshold)
+
+    return valid
+
+
+def __generate_features_for_domain(clean_data: pd.Series, chunks: List[windowing.Windows],
+                                   feature_functions: List[DomainFeatures], columns: List[str],
+                                   parallel: Parallel) -> pd.DataFrame:
+    inputs = tqdm(chunks, desc="HRV features")
 
     features = parallel(delayed(__calculate_hrv_features)
-                        (clean_data, start_datetime=k, window_length=window_length,
-                         threshold=threshold,
-                         feature_functions=feature_functions)
-                        for k in inputs)
-    features = pd.DataFrame(list(filter(None, features)))
+                        (clean_data, windows=chunk, feature_functions=feature_functions, columns=columns)
+                        for chunk in inputs)
+    features = pd.concat(features) if features else pd.DataFrame()
     if not features.empty:
-        features.set_index('datetime', inplace=True)
         features.sort_index(inplace=True)
     return features
 
 
-def __calculate_hrv_features(data: pd.Series, window_length: datetime.timedelta, start_datetime: datetime.datetime,
-                             threshold: float, feature_functions: List[DomainFeatures]):
-    relevant_data = data.loc[(data.index >= start_datetime) & (data.index < start_datetime + window_length)]
-
-    return_val = {'datetime': start_datetime + window_length, "num_ibis": len(relevant_data)}
-    # first check if there is at least one IBI in the epoch
-    if len(relevant_data) > 0:
-        expected_length = (window_length.total_seconds() / (relevant_data.mean() / 1000))
-        actual_length = len(relevant_data)
+def __calculate_hrv_features(data: pd.Series, windows: windowing.Windows, feature_functions: List[DomainFeatures],
+                             columns: List[str]) -> pd.DataFrame:
+    # only windows that passed the threshold are dispatched, each chunk only processes the IBIs its windows span
+    offset = windows.start[0]
+    values = np.asarray(data)[offset:windows.stop[-1]]
+    results = {}
+    for feature_function in feature_functions:
+        results.update(feature_function.__generate_batch__(values, windows.start - offset, windows.stop - offset))
 
-        if actual_length >= (expected_length * threshold):
-            for feature_function in feature_functions:
-                return_val.update(feature_function.__generate__(relevant_data))
+    features = {"num_ibis": windows.stop - windows.start}
+    features.update({key: results[key] for key in columns if key in results})
 
-    return return_val
+    return pd.DataFrame(features, index=windows.datetime.rename('datetime'))
@@ -1,12 +1,138 @@
 from abc import abstractmethod
+from collections import namedtuple
+from typing import List
 
 import numpy as np
 
+from flirt.stats.sliding import _rolling_min_max, _rolling_moments, _rolling_percentiles
+
+# percentiles of the IBIs held by WindowMoments
+MOMENT_PERCENTILES = np.array([5., 25., 50., 75., 95.])
+
+WindowMoments = namedtuple("WindowMoments", ["length", "mean", "var", "m3", "m4", "energy", "minimum", "maximum",
+                                             "percentiles", "diff_mean", "diff_var"])
+
 
 class DomainFeatures(object):
     def __get_type__(self) -> str:
         return type(self)
 
+    @abstractmethod
+    def __get_features__(self) -> List[str]:
+        raise NotImplementedError
+
+    def __get_optional_features__(self) -> List[str]:
+        """
+        Names of the features this domain only computes if they are explicitly selected, by default none.
+        """
+        return []
+
     @abstractmethod
     def __generate__(self, data: np.array) -> dict:
         raise NotImplementedError
+
+    def __generate_batch__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray) -> dict:
+        """
+        Computes the features for many windows `[start, stop)` of the same IBI series at once, `start` and `stop` \
+        must be non-decreasing.
+
+        By default, every window is passed to `__generate__`. Domains override this with an implementation that \
+        shares work between overlapping windows.
+
+        Returns
+        -------
+        dict
+            one array per feature, holding the value for each window
+        """
+        rows = [self.__generate__(data[i:j]) for i, j in zip(start, stop)]
+        if not rows:
+            return {}
+        return {key: np.array([row[key] for row in rows]) for key in rows[0].keys()}
+
+    def __generate_from_moments__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray,
+                                  moments: WindowMoments) -> dict:
+        """
+        Computes the features for many windows like `__generate_batch__`, reusing the `moments` of the windows \
+        computed by `get_window_moments`. By default, the moments are not used.
+        """
+        return self.__generate_batch__(data, start, stop)
+
+
+class FusedFeatures(DomainFeatures):
+    """
+    Evaluates several domains on the same windows in one pass, the moments of the windows are computed once and \
+    shared by all domains.
+    """
+
+    def __init__(self, domains: List[DomainFeatures]):
+        self.domains = domains
+
+    def __get_type__(self) -> str:
+        return ", ".join(str(domain.__get_type__()) for domain in self.domains)
+
+    def __get_features__(self) -> List[str]:
+        return [name for domain in self.domains for name in domain.__get_features__()]
+
+    def __generate__(self, data: np.array) -> dict:
+        results = {}
+        for domain in self.domains:
+            results.update(domain.__generate__(data))
+        return results
+
+    def __generate_batch__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray) -> dict:
+        return self.__generate_from_moments__(data, start, stop, get_window_moments(data, start, stop))
+
+    def __generate_from_moments__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray,
+                                  moments: WindowMoments) -> dict:
+        results = {}
+        for domain in self.domains:
+            results.update(domain.__generate_from_moments__(data, start, stop, moments))
+        return results
+
+
+def get_window_moments(data: np.ndarray, start: np.ndarray, stop: np.ndarray) -> WindowMoments:
+    """
+    Computes the moments, extremes and percentiles (see `MOMENT_PERCENTILES`) of the IBIs and the moments of their \
+    successive differences for many windows `[start, stop)` at once, such that several domains can share them.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        input IBIs in milliseconds
+    start : np.ndarray
+        start position (inclusive) of each window, must be non-decreasing
+    stop : np.ndarray
+        stop position (exclusive) of each window, must be non-decreasing
+
+    Returns
+    -------
+    WindowMoments
+        one array per moment, holding the value for each window. `var`, `m3` and `m4` are central moments, i.e. \
+        normalized by the window length, `percentiles` holds one row per percentile
+    """
+
+    nn_intervals = np.asarray(data, dtype=np.float64)
+    start = np.asarray(start, dtype=np.int64)
+    stop = np.asarray(stop, dtype=np.int64)
+    if len(start) > 0:
+        # the kernels only need the IBIs the windows span
+        offset = start[0]
+        nn_intervals = nn_intervals[offset:stop[-1]]
+        start, stop = start - offset, stop - offset
+
+    length, mean, var, m3, m4, energy = _rolling_moments(nn_intervals, start, stop)
+    minimum, maximum = _rolling_min_max(nn_intervals, start, stop)
+    percentiles = _rolling_percentiles(nn_intervals, start, stop, MOMENT_PERCENTILES)
+    # successive differences of the window [start, stop)
+    _, diff_mean, diff_var, _, _, _ = _rolling_moments(np.diff(nn_intervals), start, np.maximum(stop - 1, start))
+
+    # the running sums are not exact, constant windows have no variability by definition
+    constant = minimum == maximum
+    var[constant] = 0
+    m3[constant] = 0
+    m4[constant] = 0
+    diff_var[(constant & (length > 1)) | (length == 2)] = 0
+    diff_mean[constant & (length > 1)] = 0
+
+    return WindowMoments(length.astype(np.int64), mean, var, m3, m4, energy, minimum, maximum, percentiles,
+                         diff_mean, diff_var)
@@ -7,28 +7,44 @@ from scipy import interpolate
 from scipy import signal
 
 from flirt.hrv.features.data_utils import DomainFeatures
+from flirt.hrv.features.lomb_scargle import batch_lomb_scargle, get_frequency_grid
 
 VlfBand = namedtuple("Vlf_band", ["low", "high"])
 LfBand = namedtuple("Lf_band", ["low", "high"])
 HfBand = namedtuple("Hf_band", ["low", "high"])
 
 
+# Lomb-Scargle methods evaluated by the batched engine, mapped to the method of `batch_lomb_scargle`
+BATCH_METHODS = {'lomb_grid': 'exact', 'lomb_sliding': 'sliding', 'lomb_nfft': 'nfft'}
+
+
 class FdFeatures(DomainFeatures):
-    def __init__(self, sampling_frequency: int = 1, method: str = 'lomb'):
+    def __init__(self, sampling_frequency: int = 1, method: str = 'lomb', window_length: float = None):
         self.sampling_frequency = sampling_frequency
         self.method = method
+        self.window_length = window_length
 
     def __get_type__(self) -> str:
         return "Frequency Domain"
 
+    def __get_features__(self) -> List[str]:
+        return ['total_power', 'vlf', 'lf', 'hf', 'lf_hf_ratio', 'lfnu', 'hfnu']
+
     def __generate__(self, data: np.array) -> dict:
-        return get_fd_features(data, method=self.method, sampling_frequency=self.sampling_frequency)
+        return get_fd_features(data, method=self.method, sampling_frequency=self.sampling_frequency,
+                               window_length=self.window_length)
+
+    def __generate_batch__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray) -> dict:
+        if self.method not in BATCH_METHODS or self.window_length is None:
+            return super().__generate_batch__(data, start, stop)
+
+        return get_batch_fd_features(data, start, stop, self.window_length, method=self.method)
 
 
 def get_fd_features(data, method: str = "lomb", sampling_frequency: int = 4, interpolation_method: str = "linear",
                     vlf_band: namedtuple = VlfBand(0.003, 0.04),
                     lf_band: namedtuple = LfBand(0.04, 0.15),
-                    hf_band: namedtuple = HfBand(0.15, 0.40)):
+                    hf_band: namedtuple = HfBand(0.15, 0.40), window_length: float = None):
     data_np = np.asarray(data)
 
     results = {
@@ -43,14 +59,65 @@ def get_fd_features(data, method: str = "lomb", sampling_frequency: int = 4, int
 
     results.update(__frequency_domain(nn_intervals=data_np, method=method, sampling_frequency=sampling_frequency,
                                       interpolation_method=interpolation_method, vlf_band=vlf_band, lf_band=lf_band,
-                                      hf_band=hf_band))
+                                      hf_band=hf_band, window_length=window_length))
 
     return results
 
 
-def __frequency_domain(nn_intervals, method, sampling_frequency, interpolation_method, vlf_band, lf_band, hf_band):
+def get_batch_fd_features(data, start, stop, window_length: float, method: str = "lomb_grid",
+                          vlf_band: namedtuple = VlfBand(0.003, 0.04),
+                          lf_band: namedtuple = LfBand(0.04, 0.15),
+                          hf_band: namedtuple = HfBand(0.15, 0.40)):
+    """
+    Computes the frequency-domain features of many windows `[start, stop)` of the same IBI series at once. The \
+    Lomb-Scargle periodograms of all windows are evaluated on one fixed frequency grid for windows of \
+    `window_length` seconds and the bands are integrated for all windows together.
+
+    Parameters
+    ----------
+    data : array_like
+        input IBIs in milliseconds
+    start : np.ndarray
+        start position (inclusive) of each window
+    stop : np.ndarray
+        stop position (exclusive) of each window
+    window_length : float
+        the window length in seconds, determines the frequency grid
+    method : str, optional
+        'lomb_grid' for the exact periodogram, 'lomb_sliding' for the exact periodogram updated incrementally \
+        between overlapping windows, 'lomb_nfft' for the fast approximation, see `batch_lomb_scargle`, by default \
+        'lomb_grid'
+
+    Returns
+    -------
+    dict
+        one array per feature, holding the value for each window
+    """
+
+    if method not in BATCH_METHODS:
+        raise ValueError("invalid method: " + method)
+
+    # the periodogram does not depend on the time origin, so all windows share one time axis over the IBIs they span
+    data_np = np.asarray(data, dtype=np.float64)
+    start = np.asarray(start, dtype=np.int64)
+    stop = np.asarray(stop, dtype=np.int64)
+    if len(start) > 0:
+        offset = start.min()
+        data_np = data_np[offset:stop.max()]
+        start, stop = start - offset, stop - offset
+    timestamps = np.cumsum(data_np) / 1000
+    freq = get_frequency_grid(window_length, vlf_band[0], hf_band[1])
+    psd = batch_lomb_scargle(timestamps, data_np, start, stop, freq, method=BATCH_METHODS[method])
+
+    results = __get_features_from_psd(freq=freq, psd=psd, vlf_band=vlf_band, lf_band=lf_band, hf_band=hf_band)
+    return {key: results[key] for key in ['hrv_total_power', 'hrv_vlf', 'hrv_lf', 'hrv_hf', 'hrv_lf_hf_ratio',
+                                          'hrv_lfnu', 'hrv_hfnu']}
+
+
+def __frequency_domain(nn_intervals, method, sampling_frequency, interpolation_method, vlf_band, lf_band, hf_band,
+                       window_length):
     freq, psd = __get_freq_psd_from_nn_intervals(nn_intervals, method, sampling_frequency, interpolation_method,
-                                                 vlf_band, hf_band)
+                                                 vlf_band, hf_band, window_length)
 
     frequency_domain_features = __get_features_from_psd(freq=freq, psd=psd, vlf_band=vlf_band, lf_band=lf_band,
                                                         hf_band=hf_band)
@@ -58,7 +125,8 @@ def __frequency_domain(nn_intervals, method, sampling_frequency, interpolation_m
     return frequency_domain_features
 
 
-def __get_freq_psd_from_nn_intervals(nn_intervals, method, sampling_frequency, interpolation_method, vlf_band, hf_band):
+def __get_freq_psd_from_nn_intervals(nn_intervals, method, sampling_frequency, interpolation_method, vlf_band, hf_band,
+                                     window_length=None):
     timestamp_list = __create_timestamp_list(nn_intervals)
 
     if method == "welch":
@@ -73,8 +141,16 @@ def __get_freq_psd_from_nn_intervals(nn_intervals, method, sampling_frequency, i
             minimum_frequency=vlf_band[0],
             maximum_frequency=hf_band[1])
 
+    elif method in BATCH_METHODS:
+        # without a window length, the grid follows the span of the IBIs as for 'lomb'
+        baseline = window_length if window_length is not None else timestamp_list[-1] - timestamp_list[0]
+        freq = get_frequency_grid(baseline, vlf_band[0], hf_band[1])
+        psd = batch_lomb_scargle(timestamp_list, nn_intervals, [0], [len(nn_intervals)], freq,
+                                 method=BATCH_METHODS[method])[0]
+
     else:
-        raise ValueError("Not a valid method. Choose between 'lomb' and 'welch'")
+        raise ValueError("Not a valid method. Choose between 'lomb', 'lomb_grid', 'lomb_sliding', 'lomb_nfft' "
+                         "and 'welch'")
 
     return freq, psd
 
@@ -91,29 +167,26 @@ def __create_interpolated_timestamp_list(nn_intervals: List[float], sampling_fre
 
 
 def __get_features_from_psd(freq: List[float], psd: List[float], vlf_band, lf_band, hf_band):
+    # psd is either one periodogram or a (windows x frequencies) array of periodograms on the same grid
     vlf_indexes = np.logical_and(freq >= vlf_band[0], freq < vlf_band[1])
     lf_indexes = np.logical_and(freq >= lf_band[0], freq < lf_band[1])
     hf_indexes = np.logical_and(freq >= hf_band[0], freq < hf_band[1])
 
     # Integrate using the composite trapezoidal rule
-    lf = np.trapz(y=psd[lf_indexes], x=freq[lf_indexes])
-    hf = np.trapz(y=psd[hf_indexes], x=freq[hf_indexes])
+    lf = np.trapz(y=psd[..., lf_indexes], x=freq[lf_indexes], axis=-1)
+    hf = np.trapz(y=psd[..., hf_indexes], x=freq[hf_indexes], axis=-1)
 
     # total power & vlf : Feature often used for  "long term recordings" analysis
-    vlf = np.trapz(y=psd[vlf_indexes], x=freq[vlf_indexes])
+    vlf = np.trapz(y=psd[..., vlf_indexes], x=freq[vlf_indexes], axis=-1)
     total_power = vlf + lf + hf
 
-    if lf > 0 and hf > 0:
-        lf_hf_ratio = lf / hf
-    else:
-        lf_hf_ratio = np.nan
-
-    if lf > 0 and hf > 0:
-        lfnu = (lf / (lf + hf)) * 100
-        hfnu = (hf / (lf + hf)) * 100
-    else:
-        lfnu = np.nan
-        hfnu = np.nan
+    positive = (lf > 0) & (hf > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lf_hf_ratio = np.where(positive, lf / hf, np.nan)
+        lfnu = np.where(positive, (lf / (lf + hf)) * 100, np.nan)
+        hfnu = np.where(positive, (hf / (lf + hf)) * 100, np.nan)
+    # [()] turns the results of a single periodogram back into scalars
+    lf_hf_ratio, lfnu, hfnu = lf_hf_ratio[()], lfnu[()], hfnu[()]
 
     freqency_domain_features = {
         'hrv_lf': lf,
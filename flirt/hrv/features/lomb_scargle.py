@@ -0,0 +1,288 @@
+import numpy as np
+from numba import jit
+
+# maximum number of (windows x FFT size) grid cells the 'nfft' method transforms at once
+NFFT_BATCH_SIZE = 2 ** 22
+
+
+def get_frequency_grid(baseline: float, minimum_frequency: float, maximum_frequency: float,
+                       samples_per_peak: int = 5) -> np.ndarray:
+    """
+    Computes a regular frequency grid `minimum_frequency + df * arange(num_freq)`, chosen as astropy's \
+    `LombScargle.autofrequency` does for a signal spanning `baseline` seconds.
+
+    Parameters
+    ----------
+    baseline : float
+        time span of the signal in seconds
+    minimum_frequency : float
+        the lowest frequency in Hz
+    maximum_frequency : float
+        the highest frequency in Hz
+    samples_per_peak : int, optional
+        the frequency resolution relative to the width of a peak (1 / baseline), by default 5
+
+    Returns
+    -------
+    np.ndarray
+        the regular frequency grid
+    """
+
+    df = 1.0 / baseline / samples_per_peak
+    num_freq = 1 + int(np.round((maximum_frequency - minimum_frequency) / df))
+    return minimum_frequency + df * np.arange(num_freq)
+
+
+def batch_lomb_scargle(t: np.ndarray, y: np.ndarray, start: np.ndarray, stop: np.ndarray, frequency: np.ndarray,
+                       method: str = 'exact', oversampling: int = 5, order: int = 4) -> np.ndarray:
+    """
+    Computes the floating-mean Lomb-Scargle periodogram (psd normalization, as astropy's `LombScargle(t, y, \
+    normalization='psd')`) of many windows `[start, stop)` of the same signal on one regular frequency grid.
+
+    Parameters
+    ----------
+    t : np.ndarray
+        sample times in seconds
+    y : np.ndarray
+        sample values
+    start : np.ndarray
+        start position (inclusive) of each window
+    stop : np.ndarray
+        stop position (exclusive) of each window
+    frequency : np.ndarray
+        regular frequency grid in Hz, see `get_frequency_grid`
+    method : str, optional
+        'exact' evaluates the trigonometric sums directly in a compiled kernel, using angle-addition recurrences \
+        along the frequency grid instead of evaluating sin/cos for every frequency, 'nfft' approximates the sums \
+        with the method of Press & Rybicki (1989): every sample is extirpolated onto `order` points of a regular \
+        time grid, the sums of all windows of a batch are then obtained from one batched FFT. The cost of 'nfft' \
+        does not grow with the number of samples times frequencies, it pays off for long windows (e.g. 600 s). \
+        The defaults (`oversampling=5`, `order=4`) are those of astropy's 'fast' method, which astropy picks \
+        automatically for more than 200 frequencies. On 180 s HRV windows, the VLF/LF/HF band powers then deviate \
+        from the exact ones by up to 2% of the total power (median 1e-4). With `oversampling=10` and `order=6` the \
+        deviation stays below 1e-4 (median 1e-8). 'sliding' computes the exact periodograms incrementally: the \
+        trigonometric sums are kept over the absolute sample times and only the samples that enter or leave the \
+        window are added or removed, so heavily overlapping windows cost O(frequencies x changed samples) each. \
+        It requires non-decreasing `start` and `stop`. By default 'exact'
+    oversampling : int, optional
+        size of the FFT relative to the number of frequencies ('nfft' only), by default 5
+    order : int, optional
+        number of grid points each sample is extirpolated onto ('nfft' only), by default 4
+
+    Returns
+    -------
+    np.ndarray
+        (windows x frequencies) power spectral densities, NaN for windows with fewer than two samples
+    """
+
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    start = np.asarray(start, dtype=np.int64)
+    stop = np.asarray(stop, dtype=np.int64)
+    frequency = np.asarray(frequency, dtype=np.float64)
+
+    f0 = frequency[0]
+    df = frequency[1] - frequency[0] if len(frequency) > 1 else 1.0
+
+    if method == 'exact':
+        return _lomb_scargle(t, y, start, stop, f0, df, len(frequency))
+    elif method == 'sliding':
+        # centering on the overall mean keeps the sums of the values small compared to their variations
+        return _sliding_lomb_scargle(t, y - np.mean(y), start, stop, f0, df, len(frequency))
+    elif method == 'nfft':
+        psd = np.full((len(start), len(frequency)), np.nan)
+        num_fft = 1 << int(np.ceil(np.log2(len(frequency) * oversampling)))
+        batch_size = max(1, NFFT_BATCH_SIZE // (2 * num_fft))
+        for i in range(0, len(start), batch_size):
+            psd[i:i + batch_size] = __nfft_lomb_scargle(t, y, start[i:i + batch_size], stop[i:i + batch_size], f0, df,
+                                                        len(frequency), num_fft, order)
+        return psd
+    else:
+        raise ValueError("invalid method: " + method)
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _lomb_scargle(t, y, start, stop, f0, df, num_freq):
+    psd = np.full((len(start), num_freq), np.nan)
+    S = np.empty(num_freq)
+    C = np.empty(num_freq)
+    S2 = np.empty(num_freq)
+    C2 = np.empty(num_freq)
+    Sh = np.empty(num_freq)
+    Ch = np.empty(num_freq)
+    for w in range(len(start)):
+        n = stop[w] - start[w]
+        if n < 2:
+            continue
+
+        mean = 0.
+        for j in range(start[w], stop[w]):
+            mean += y[j]
+        mean /= n
+
+        S[:] = 0.
+        C[:] = 0.
+        S2[:] = 0.
+        C2[:] = 0.
+        Sh[:] = 0.
+        Ch[:] = 0.
+        t0 = t[start[w]]
+        for j in range(start[w], stop[w]):
+            tj = t[j] - t0
+            h = y[j] - mean
+            # e^(i 2 pi f t) along the grid by repeated rotation with e^(i 2 pi df t)
+            cos_ft = np.cos(2 * np.pi * f0 * tj)
+            sin_ft = np.sin(2 * np.pi * f0 * tj)
+            cos_dt = np.cos(2 * np.pi * df * tj)
+            sin_dt = np.sin(2 * np.pi * df * tj)
+            for k in range(num_freq):
+                S[k] += sin_ft
+                C[k] += cos_ft
+                S2[k] += 2 * sin_ft * cos_ft
+                C2[k] += cos_ft * cos_ft - sin_ft * sin_ft
+                Sh[k] += h * sin_ft
+                Ch[k] += h * cos_ft
+                cos_ft, sin_ft = cos_ft * cos_dt - sin_ft * sin_dt, sin_ft * cos_dt + cos_ft * sin_dt
+
+        for k in range(num_freq):
+            psd[w, k] = _power(S[k] / n, C[k] / n, S2[k] / n, C2[k] / n, Sh[k] / n, Ch[k] / n, n)
+    return psd
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _sliding_lomb_scargle(t, y, start, stop, f0, df, num_freq):
+    psd = np.full((len(start), num_freq), np.nan)
+    sums = np.zeros((6, num_freq))  # S, C, S2, C2, Sy, Cy
+    sum_y = 0.
+    lo = 0
+    hi = 0
+    removed = 0
+    for w in range(len(start)):
+        # start from scratch for disjoint windows and after every full turnover, to bound the rounding drift
+        if start[w] >= hi or removed >= stop[w] - start[w]:
+            sums[:] = 0.
+            sum_y = 0.
+            lo = start[w]
+            hi = start[w]
+            removed = 0
+        while hi < stop[w]:
+            _accumulate(sums, t[hi], y[hi], 1., f0, df)
+            sum_y += y[hi]
+            hi += 1
+        while lo < start[w]:
+            _accumulate(sums, t[lo], y[lo], -1., f0, df)
+            sum_y -= y[lo]
+            lo += 1
+            removed += 1
+
+        n = stop[w] - start[w]
+        if n < 2:
+            continue
+        mean = sum_y / n
+        for k in range(num_freq):
+            S = sums[0, k] / n
+            C = sums[1, k] / n
+            psd[w, k] = _power(S, C, sums[2, k] / n, sums[3, k] / n, sums[4, k] / n - mean * S,
+                               sums[5, k] / n - mean * C, n)
+    return psd
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _accumulate(sums, tj, yj, sign, f0, df):
+    # adds (sign 1) or removes (sign -1) the terms of one sample at all frequencies of the grid
+    cos_ft = np.cos(2 * np.pi * f0 * tj)
+    sin_ft = np.sin(2 * np.pi * f0 * tj)
+    cos_dt = np.cos(2 * np.pi * df * tj)
+    sin_dt = np.sin(2 * np.pi * df * tj)
+    for k in range(sums.shape[1]):
+        sums[0, k] += sign * sin_ft
+        sums[1, k] += sign * cos_ft
+        sums[2, k] += sign * 2 * sin_ft * cos_ft
+        sums[3, k] += sign * (cos_ft * cos_ft - sin_ft * sin_ft)
+        sums[4, k] += sign * yj * sin_ft
+        sums[5, k] += sign * yj * cos_ft
+        cos_ft, sin_ft = cos_ft * cos_dt - sin_ft * sin_dt, sin_ft * cos_dt + cos_ft * sin_dt
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _power(S, C, S2, C2, Sh, Ch, n):
+    # floating-mean periodogram from the (weight-normalized) trigonometric sums, as astropy's lombscargle_fast
+    two_omega_tau = np.arctan2(S2 - 2 * S * C, C2 - (C * C - S * S))
+    C2w = np.cos(two_omega_tau)
+    S2w = np.sin(two_omega_tau)
+    Cw = np.cos(0.5 * two_omega_tau)
+    Sw = np.sin(0.5 * two_omega_tau)
+
+    YC = Ch * Cw + Sh * Sw
+    YS = Sh * Cw - Ch * Sw
+    CC = 0.5 * (1 + C2 * C2w + S2 * S2w) - (C * Cw + S * Sw) ** 2
+    SS = 0.5 * (1 - C2 * C2w - S2 * S2w) - (S * Cw - C * Sw) ** 2
+    return (YC * YC / CC + YS * YS / SS) * 0.5 * n
+
+
+def __nfft_lomb_scargle(t: np.ndarray, y: np.ndarray, start: np.ndarray, stop: np.ndarray, f0: float, df: float,
+                        num_freq: int, num_fft: int, order: int) -> np.ndarray:
+    # (windows x samples) arrays, padded with zero weights
+    length = stop - start
+    max_length = max(1, length.max()) if len(length) > 0 else 1
+    position = start[:, None] + np.arange(max_length)
+    valid = position < stop[:, None]
+    position = np.where(valid, position, start[:, None])
+    position = np.minimum(position, len(t) - 1)
+    weight = valid / np.maximum(length, 1)[:, None]
+
+    window_t = t[position] - t[np.minimum(start, len(t) - 1)][:, None]
+    window_y = y[position]
+    mean = np.sum(weight * window_y, axis=1, keepdims=True)
+    h = weight * (window_y - mean)
+
+    Sh, Ch = __trig_sums(window_t, h, f0, df, num_freq, num_fft, order)
+    S2, C2 = __trig_sums(window_t, weight, 2 * f0, 2 * df, num_freq, num_fft, order)
+    S, C = __trig_sums(window_t, weight, f0, df, num_freq, num_fft, order)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        psd = _power(S, C, S2, C2, Sh, Ch, length[:, None].astype(np.float64))
+    psd[length < 2] = np.nan
+    return psd
+
+
+def __trig_sums(t: np.ndarray, h: np.ndarray, f0: float, df: float, num_freq: int, num_fft: int,
+                order: int) -> tuple:
+    """
+    Approximates `sum(h * sin(2 pi f t))` and `sum(h * cos(2 pi f t))` per row for `f = f0 + df * arange(num_freq)`.
+    """
+    h = h * np.exp(2j * np.pi * f0 * t)
+    x = (t * num_fft * df) % num_fft
+
+    grid = _extirpolate(x, h, num_fft, order)
+    sums = np.fft.ifft(grid, axis=1)[:, :num_freq] * num_fft
+    return sums.imag, sums.real
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _extirpolate(x, y, num_fft, order):
+    """
+    Spreads the values `y` at the positions `x` of each row onto the integer grid `range(num_fft)` with Lagrange \
+    weights on the `order` nearest points, such that sums of smooth functions over the grid approximate the sums \
+    over `x` (Numerical Recipes, p. 583).
+    """
+    grid = np.zeros((x.shape[0], num_fft), dtype=np.complex128)
+    for r in range(x.shape[0]):
+        for j in range(x.shape[1]):
+            xj = x[r, j]
+            if xj % 1 == 0:
+                grid[r, int(xj)] += y[r, j]
+                continue
+            ilo = min(max(int(xj - order // 2), 0), num_fft - order)
+            numerator = y[r, j]
+            for m in range(order):
+                numerator *= xj - ilo - m
+            denominator = 1.
+            for m in range(1, order):
+                denominator *= m
+            for m in range(order):
+                if m > 0:
+                    denominator *= m / (m - order)
+                index = ilo + (order - 1 - m)
+                grid[r, index] += numerator / (denominator * (xj - index))
+    return grid
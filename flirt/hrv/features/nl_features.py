@@ -1,15 +1,35 @@
+from typing import List
+
 import numpy as np
 
-from flirt.hrv.features.data_utils import DomainFeatures
+from flirt.hrv.features.data_utils import DomainFeatures, WindowMoments, get_window_moments
+from flirt.lib.entropy import sliding_dfa_alpha
+
+# short-term (alpha 1) and long-term (alpha 2) DFA exponents of the IBIs with their range of box sizes in beats,
+# these are only computed if they are explicitly selected
+DFA_ALPHAS = {
+    'dfa_alpha1': (4, 16),
+    'dfa_alpha2': (16, 64),
+}
 
 
 class NonLinearFeatures(DomainFeatures):
-    def __init__(self, emb_dim: int = 2):
+    def __init__(self, emb_dim: int = 2, features: List[str] = None):
         self.emb_dim = emb_dim
+        self.features = features
 
     def __get_type__(self) -> str:
         return "Non-Linear"
 
+    def __get_features__(self) -> List[str]:
+        return ['SD1', 'SD2', 'SD2SD1', 'CSI', 'CVI', 'CSI_Modified'] + self.__get_alphas()
+
+    def __get_optional_features__(self) -> List[str]:
+        return list(DFA_ALPHAS.keys())
+
+    def __get_alphas(self) -> List[str]:
+        return [name for name in DFA_ALPHAS.keys() if self.features is not None and name in self.features]
+
     def __generate__(self, data: np.array) -> dict:
         data_np = np.asarray(data)
 
@@ -25,10 +45,46 @@ class NonLinearFeatures(DomainFeatures):
         if len(data_np) > self.emb_dim:
             results.update(_nonlinear(data_np))
 
-        # TODO: Raise one error in case DFA features are not possible to compute not everytime the function is called...
+        start, stop = np.array([0]), np.array([len(data_np)])
+        for name, value in self.__get_dfa_alphas(data_np, start, stop).items():
+            results[name] = value[0]
 
         return results
 
+    def __generate_batch__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray) -> dict:
+        return self.__generate_from_moments__(data, start, stop, get_window_moments(data, start, stop))
+
+    def __generate_from_moments__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray,
+                                  moments: WindowMoments) -> dict:
+        # the Poincaré plot only depends on the variances of the IBIs and their successive differences
+        length = moments.length
+        valid = length > self.emb_dim
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sd_rri = moments.var * length / (length - 1)
+            sd_heart_period = moments.diff_var * (length - 1) / (length - 2)
+            sd1 = np.where(valid, np.sqrt(sd_heart_period * 0.5), np.nan)
+            sd2 = np.where(valid, np.sqrt(2 * sd_rri - 0.5 * sd_heart_period), np.nan)
+
+            # CSI / CVI
+            T = 4 * sd1
+            L = 4 * sd2
+            results = {
+                'hrv_SD1': sd1,
+                'hrv_SD2': sd2,
+                'hrv_SD2SD1': sd2 / sd1,
+                'hrv_CSI': L / T,
+                'hrv_CVI': np.log10(L * T),
+                'hrv_CSI_Modified': L ** 2 / T,
+            }
+
+        # the DFA exponents need the samples of each window, all windows are evaluated in one compiled loop
+        results.update(self.__get_dfa_alphas(data, start, stop))
+        return results
+
+    def __get_dfa_alphas(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray) -> dict:
+        return {'hrv_' + name: sliding_dfa_alpha(data, start, stop, *DFA_ALPHAS[name])
+                for name in self.__get_alphas()}
+
 
 def _nonlinear(rri):
     diff_rri = np.diff(rri)
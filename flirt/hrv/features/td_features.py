@@ -1,12 +1,19 @@
+from typing import List
+
 import numpy as np
 
-from flirt.hrv.features.data_utils import DomainFeatures
+from flirt.hrv.features.data_utils import DomainFeatures, MOMENT_PERCENTILES, WindowMoments, get_window_moments
+from flirt.stats.sliding import _rolling_moments
 
 
 class TdFeatures(DomainFeatures):
     def __get_type__(self) -> str:
         return "Time Domain"
 
+    def __get_features__(self) -> List[str]:
+        return ['mean_nni', 'median_nni', 'range_nni', 'sdsd', 'rmssd', 'nni_50', 'pnni_50', 'nni_20', 'pnni_20',
+                'cvsd', 'sdnn', 'cvnni', 'mean_hr', 'min_hr', 'max_hr', 'std_hr']
+
     def __generate__(self, data: np.array) -> dict:
         nn_intervals = np.asarray(data)
 
@@ -41,3 +48,62 @@ class TdFeatures(DomainFeatures):
         out['hrv_std_hr'] = np.std(hr)
 
         return out
+
+    def __generate_batch__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray) -> dict:
+        return self.__generate_from_moments__(data, start, stop, get_window_moments(data, start, stop))
+
+    def __generate_from_moments__(self, data: np.ndarray, start: np.ndarray, stop: np.ndarray,
+                                  moments: WindowMoments) -> dict:
+        """
+        Computes the time domain features of all windows from running sums.
+
+        The moments of the IBIs and the successive differences are shared with the other domains, see \
+        `get_window_moments`. The sums of the heart rate and the `>50`/`>20` counts are updated while the window \
+        slides, so every IBI is added and removed once instead of being processed by every window containing it.
+        """
+        start = np.asarray(start, dtype=np.int64)
+        stop = np.asarray(stop, dtype=np.int64)
+        if len(start) == 0:
+            return {}
+        # the running sums only need the IBIs the windows span
+        offset = start[0]
+        nn_intervals = np.asarray(data, dtype=np.float64)[offset:stop[-1]]
+        start, stop = start - offset, stop - offset
+
+        hr = np.divide(60000, nn_intervals)
+        diff_nni = np.diff(nn_intervals)
+        # successive differences of the window [start, stop)
+        diff_start = start
+        diff_stop = np.maximum(stop - 1, start)
+
+        length_int = moments.length
+        _, mean_hr, var_hr, _, _, _ = _rolling_moments(hr, start, stop)
+        var_hr[moments.minimum == moments.maximum] = 0
+
+        counts = np.zeros((len(nn_intervals), 2), dtype=np.int64)
+        np.cumsum(np.abs(diff_nni)[:, None] > [50, 20], axis=0, out=counts[1:])
+        nni_50, nni_20 = (counts[diff_stop] - counts[diff_start]).T
+
+        out = {}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rmssd = np.sqrt(moments.diff_var + moments.diff_mean ** 2)
+            sdnn = np.sqrt(moments.var * length_int / (length_int - 1))
+
+            out['hrv_mean_nni'] = moments.mean
+            out['hrv_median_nni'] = moments.percentiles[list(MOMENT_PERCENTILES).index(50)]
+            out['hrv_range_nni'] = moments.maximum - moments.minimum
+            out['hrv_sdsd'] = np.sqrt(moments.diff_var)
+            out['hrv_rmssd'] = rmssd
+            out['hrv_nni_50'] = nni_50
+            out['hrv_pnni_50'] = 100 * nni_50 / length_int
+            out['hrv_nni_20'] = nni_20
+            out['hrv_pnni_20'] = 100 * nni_20 / length_int
+            out['hrv_cvsd'] = rmssd / moments.mean
+            out['hrv_sdnn'] = sdnn
+            out['hrv_cvnni'] = sdnn / moments.mean
+            out['hrv_mean_hr'] = mean_hr
+            out['hrv_min_hr'] = np.divide(60000, moments.maximum)
+            out['hrv_max_hr'] = np.divide(60000, moments.minimum)
+            out['hrv_std_hr'] = np.sqrt(var_hr)
+
+        return out
@@ -3,12 +3,12 @@ from math import factorial, log
 
 import numpy as np
 from numba import jit
-# from sklearn.neighbors import KDTree
 from scipy.signal import periodogram, welch
 
 from .utils import _embed
 
-all = ['perm_entropy', 'spectral_entropy', 'svd_entropy', 'lziv_complexity']
+all = ['perm_entropy', 'sliding_perm_entropy', 'spectral_entropy', 'svd_entropy',
+       'sliding_svd_entropy', 'app_entropy', 'sample_entropy', 'lziv_complexity']
 
 
 def perm_entropy(x, order=3, delay=1, normalize=False):
@@ -97,6 +97,99 @@ def perm_entropy(x, order=3, delay=1, normalize=False):
     return pe
 
 
+def sliding_perm_entropy(x, start, stop, order=3, delay=1, normalize=False):
+    """Permutation Entropy of many (overlapping) windows of the same signal.
+
+    Parameters
+    ----------
+    x : list or np.array
+        One-dimensional time series of shape (n_times)
+    start : np.array
+        Start position (inclusive) of each window, must be non-decreasing.
+    stop : np.array
+        Stop position (exclusive) of each window, must be non-decreasing.
+    order : int
+        Order of permutation entropy. Default is 3.
+    delay : int
+        Time delay (lag). Default is 1.
+    normalize : bool
+        If True, divide by log2(order!) to normalize the entropy between 0
+        and 1. Otherwise, return the permutation entropy in bit.
+
+    Returns
+    -------
+    pe : np.array
+        Permutation Entropy of each window, i.e.
+        ``perm_entropy(x[start[i]:stop[i]], order, delay, normalize)``.
+        NaN for windows that are too short to be embedded.
+
+    Notes
+    -----
+    The ordinal pattern of every embedded vector is computed only once for
+    the whole signal. A histogram of the patterns is then updated while the
+    windows advance, so that the total cost is linear in the signal length
+    instead of proportional to the sum of all window lengths.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from flirt.lib.entropy import sliding_perm_entropy
+    >>> x = [4, 7, 9, 10, 6, 11, 3]
+    >>> print(sliding_perm_entropy(x, np.array([0, 1]), np.array([7, 7]), order=2))
+    [0.91829583 0.97095059]
+    """
+    x = np.array(x)
+    start = np.asarray(start, dtype=np.int64)
+    stop = np.asarray(stop, dtype=np.int64)
+    if order * delay > len(x):
+        return np.full(len(start), np.nan)
+
+    hashmult = np.power(order, range(order))
+    sorted_idx = _embed(x, order=order, delay=delay).argsort(kind='quicksort')
+    hashval = (np.multiply(sorted_idx, hashmult)).sum(1)
+    # Dense pattern ids in the same (sorted) order as np.unique in perm_entropy
+    patterns, codes = np.unique(hashval, return_inverse=True)
+
+    # The embedded vectors of a window are those starting in
+    # [start, stop - (order - 1) * delay)
+    vector_stop = np.maximum(stop - (order - 1) * delay, start)
+    pe = _sliding_histogram_entropy(codes.astype(np.int64), len(patterns),
+                                    start, vector_stop)
+    if normalize:
+        pe /= np.log2(factorial(order))
+    return pe
+
+
+@jit(nopython=True, cache=True)
+def _sliding_histogram_entropy(codes, num_codes, start, stop):
+    """Shannon entropy (bit) of the codes within each sliding window.
+    """
+    counts = np.zeros(num_codes, dtype=np.int64)
+    out = np.full(len(start), np.nan)
+    lo = 0
+    hi = 0
+    for w in range(len(start)):
+        while lo < start[w] and lo < hi:
+            counts[codes[lo]] -= 1
+            lo += 1
+        if hi < start[w]:
+            lo = hi = start[w]
+        while hi < stop[w]:
+            counts[codes[hi]] += 1
+            hi += 1
+
+        total = hi - lo
+        if total == 0:
+            continue
+        pe = 0.
+        for c in range(num_codes):
+            if counts[c] > 0:
+                p = counts[c] / total
+                pe -= p * np.log2(p)
+        out[w] = pe
+    return out
+
+
 def spectral_entropy(x, sf, method='fft', nperseg=None, normalize=False):
     """Spectral Entropy.
 
@@ -256,232 +349,290 @@ def svd_entropy(x, order=3, delay=1, normalize=False):
     return svd_e
 
 
-# def _app_samp_entropy(x, order, metric='chebyshev', approximate=True):
-#     """Utility function for `app_entropy`` and `sample_entropy`.
-#     """
-#     _all_metrics = KDTree.valid_metrics
-#     if metric not in _all_metrics:
-#         raise ValueError('The given metric (%s) is not valid. The valid '
-#                          'metric names are: %s' % (metric, _all_metrics))
-#     phi = np.zeros(2)
-#     r = 0.2 * np.std(x, ddof=0)
-#
-#     # compute phi(order, r)
-#     _emb_data1 = _embed(x, order, 1)
-#     if approximate:
-#         emb_data1 = _emb_data1
-#     else:
-#         emb_data1 = _emb_data1[:-1]
-#     count1 = KDTree(emb_data1, metric=metric).query_radius(emb_data1, r,
-#                                                            count_only=True
-#                                                            ).astype(np.float64)
-#     # compute phi(order + 1, r)
-#     emb_data2 = _embed(x, order + 1, 1)
-#     count2 = KDTree(emb_data2, metric=metric).query_radius(emb_data2, r,
-#                                                            count_only=True
-#                                                            ).astype(np.float64)
-#     if approximate:
-#         phi[0] = np.mean(np.log(count1 / emb_data1.shape[0]))
-#         phi[1] = np.mean(np.log(count2 / emb_data2.shape[0]))
-#     else:
-#         phi[0] = np.mean((count1 - 1) / (emb_data1.shape[0] - 1))
-#         phi[1] = np.mean((count2 - 1) / (emb_data2.shape[0] - 1))
-#     return phi
-
-
-# @jit('f8(f8[:], i4, f8)', nopython=True)
-# def _numba_sampen(x, order, r):
-#     """
-#     Fast evaluation of the sample entropy using Numba.
-#     """
-#     n = x.size
-#     n1 = n - 1
-#     order += 1
-#     order_dbld = 2 * order
-#
-#     # Define threshold
-#     # r *= x.std()
-#
-#     # initialize the lists
-#     run = [0] * n
-#     run1 = run[:]
-#     r1 = [0] * (n * order_dbld)
-#     a = [0] * order
-#     b = a[:]
-#     p = a[:]
-#
-#     for i in range(n1):
-#         nj = n1 - i
-#
-#         for jj in range(nj):
-#             j = jj + i + 1
-#             if abs(x[j] - x[i]) < r:
-#                 run[jj] = run1[jj] + 1
-#                 m1 = order if order < run[jj] else run[jj]
-#                 for m in range(m1):
-#                     a[m] += 1
-#                     if j < n1:
-#                         b[m] += 1
-#             else:
-#                 run[jj] = 0
-#         for j in range(order_dbld):
-#             run1[j] = run[j]
-#             r1[i + n * j] = run[j]
-#         if nj > order_dbld - 1:
-#             for j in range(order_dbld, nj):
-#                 run1[j] = run[j]
-#
-#     m = order - 1
-#
-#     while m > 0:
-#         b[m] = b[m - 1]
-#         m -= 1
-#
-#     b[0] = n * n1 / 2
-#     a = np.array([float(aa) for aa in a])
-#     b = np.array([float(bb) for bb in b])
-#     p = np.true_divide(a, b)
-#     return -log(p[-1])
-
-
-# def app_entropy(x, order=2, metric='chebyshev'):
-#     """Approximate Entropy.
-#
-#     Parameters
-#     ----------
-#     x : list or np.array
-#         One-dimensional time series of shape (n_times).
-#     order : int
-#         Embedding dimension. Default is 2.
-#     metric : str
-#         Name of the distance metric function used with
-#         :py:class:`sklearn.neighbors.KDTree`. Default is to use the
-#         `Chebyshev <https://en.wikipedia.org/wiki/Chebyshev_distance>`_
-#         distance.
-#
-#     Returns
-#     -------
-#     ae : float
-#         Approximate Entropy.
-#
-#     Notes
-#     -----
-#     Approximate entropy is a technique used to quantify the amount of
-#     regularity and the unpredictability of fluctuations over time-series data.
-#     Smaller values indicates that the data is more regular and predictable.
-#
-#     The tolerance value (:math:`r`) is set to :math:`0.2 * \\text{std}(x)`.
-#
-#     Code adapted from the `mne-features <https://mne.tools/mne-features/>`_
-#     package by Jean-Baptiste Schiratti and Alexandre Gramfort.
-#
-#     References
-#     ----------
-#     Richman, J. S. et al. (2000). Physiological time-series analysis
-#     using approximate entropy and sample entropy. American Journal of
-#     Physiology-Heart and Circulatory Physiology, 278(6), H2039-H2049.
-#
-#     https://scikit-learn.org/stable/modules/generated/sklearn.neighbors.DistanceMetric.html
-#
-#     Examples
-#     --------
-#     >>> from entropy import app_entropy
-#     >>> import numpy as np
-#     >>> np.random.seed(1234567)
-#     >>> x = np.random.rand(3000)
-#     >>> print(app_entropy(x, order=2))
-#     2.076046899582793
-#     """
-#     phi = _app_samp_entropy(x, order=order, metric=metric, approximate=True)
-#     return np.subtract(phi[0], phi[1])
-
-
-# def sample_entropy(x, order=2, metric='chebyshev'):
-#     """Sample Entropy.
-#
-#     Parameters
-#     ----------
-#     x : list or np.array
-#         One-dimensional time series of shape (n_times).
-#     order : int
-#         Embedding dimension. Default is 2.
-#     metric : str
-#         Name of the distance metric function used with
-#         :py:class:`sklearn.neighbors.KDTree`. Default is to use the
-#         `Chebyshev <https://en.wikipedia.org/wiki/Chebyshev_distance>`_
-#         distance.
-#
-#     Returns
-#     -------
-#     se : float
-#         Sample Entropy.
-#
-#     Notes
-#     -----
-#     Sample entropy is a modification of approximate entropy, used for assessing
-#     the complexity of physiological time-series signals. It has two advantages
-#     over approximate entropy: data length independence and a relatively
-#     trouble-free implementation. Large values indicate high complexity whereas
-#     smaller values characterize more self-similar and regular signals.
-#
-#     The sample entropy of a signal :math:`x` is defined as:
-#
-#     .. math:: H(x, m, r) = -\\log\\frac{C(m + 1, r)}{C(m, r)}
-#
-#     where :math:`m` is the embedding dimension (= order), :math:`r` is
-#     the radius of the neighbourhood (default = :math:`0.2 * \\text{std}(x)`),
-#     :math:`C(m + 1, r)` is the number of embedded vectors of length
-#     :math:`m + 1` having a
-#     `Chebyshev distance <https://en.wikipedia.org/wiki/Chebyshev_distance>`_
-#     inferior to :math:`r` and :math:`C(m, r)` is the number of embedded
-#     vectors of length :math:`m` having a Chebyshev distance inferior to
-#     :math:`r`.
-#
-#     Note that if ``metric == 'chebyshev'`` and ``len(x) < 5000`` points,
-#     then the sample entropy is computed using a fast custom Numba script.
-#     For other distance metric or longer time-series, the sample entropy is
-#     computed using a code from the
-#     `mne-features <https://mne.tools/mne-features/>`_ package by Jean-Baptiste
-#     Schiratti and Alexandre Gramfort (requires sklearn).
-#
-#     References
-#     ----------
-#     Richman, J. S. et al. (2000). Physiological time-series analysis
-#     using approximate entropy and sample entropy. American Journal of
-#     Physiology-Heart and Circulatory Physiology, 278(6), H2039-H2049.
-#
-#     https://scikit-learn.org/stable/modules/generated/sklearn.neighbors.DistanceMetric.html
-#
-#     Examples
-#     --------
-#     Sample entropy with order 2.
-#
-#     >>> from entropy import sample_entropy
-#     >>> import numpy as np
-#     >>> np.random.seed(1234567)
-#     >>> x = np.random.rand(3000)
-#     >>> print(sample_entropy(x, order=2))
-#     2.192416747827227
-#
-#     Sample entropy with order 3 using the Euclidean distance.
-#
-#     >>> from entropy import sample_entropy
-#     >>> import numpy as np
-#     >>> np.random.seed(1234567)
-#     >>> x = np.random.rand(3000)
-#     >>> print(sample_entropy(x, order=3, metric='euclidean'))
-#     2.724354910127154
-#     """
-#     x = np.asarray(x, dtype=np.float64)
-#     if metric == 'chebyshev' and x.size < 5000:
-#         return _numba_sampen(x, order=order, r=(0.2 * x.std(ddof=0)))
-#     else:
-#         phi = _app_samp_entropy(x, order=order, metric=metric,
-#                                 approximate=False)
-#         return -np.log(np.divide(phi[1], phi[0]))
-
-
-@jit('u8(unicode_type)', nopython=True)
+def sliding_svd_entropy(x, start, stop, order=3, delay=1, normalize=False):
+    """Singular Value Decomposition entropy of many (overlapping) windows of
+    the same signal.
+
+    Parameters
+    ----------
+    x : list or np.array
+        One-dimensional time series of shape (n_times)
+    start : np.array
+        Start position (inclusive) of each window, must be non-decreasing.
+    stop : np.array
+        Stop position (exclusive) of each window, must be non-decreasing.
+    order : int
+        Order of SVD entropy (= length of the embedding dimension).
+        Default is 3.
+    delay : int
+        Time delay (lag). Default is 1.
+    normalize : bool
+        If True, divide by log2(order) to normalize the entropy between 0
+        and 1. Otherwise, return the SVD entropy in bit.
+
+    Returns
+    -------
+    svd_e : np.array
+        SVD Entropy of each window, i.e.
+        ``svd_entropy(x[start[i]:stop[i]], order, delay, normalize)``.
+        NaN for windows that are too short to be embedded.
+
+    Notes
+    -----
+    The singular values of the embedded matrix :math:`Y` are the square roots
+    of the eigenvalues of the small :math:`order \\times order` matrix
+    :math:`Y^TY`, whose entries are lagged cross-products of the signal. These
+    are kept as running sums while the windows advance, so that only the
+    small symmetric eigenproblems remain, which are solved for all windows in
+    one batch. Singular values that vanish numerically contribute zero to the
+    entropy.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from flirt.lib.entropy import sliding_svd_entropy
+    >>> x = [4, 7, 9, 10, 6, 11, 3]
+    >>> print(sliding_svd_entropy(x, np.array([0]), np.array([7]), order=2))
+    [0.76189095]
+    """
+    x = np.array(x, dtype=np.float64)
+    start = np.asarray(start, dtype=np.int64)
+    stop = np.asarray(stop, dtype=np.int64)
+    if order * delay > len(x):
+        return np.full(len(start), np.nan)
+
+    # The embedded vectors of a window are those starting in
+    # [start, stop - (order - 1) * delay)
+    vector_stop = np.maximum(stop - (order - 1) * delay, start)
+    gram = _sliding_lagged_gram(x, start, vector_stop, order, delay)
+
+    # Descending singular values, as returned by np.linalg.svd
+    W = np.sqrt(np.clip(np.linalg.eigvalsh(gram)[:, ::-1], 0, None))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        W /= W.sum(axis=1, keepdims=True)
+        svd_e = -np.where(W > 0, np.multiply(W, np.log2(W)), 0).sum(axis=1)
+    svd_e[~np.isfinite(W).all(axis=1) | (vector_stop <= start)] = np.nan
+    if normalize:
+        svd_e /= np.log2(order)
+    return svd_e
+
+
+@jit(nopython=True, cache=True)
+def _sliding_lagged_gram(x, start, stop, order, delay):
+    """Matrix Y^T Y of the embedded vectors [start, stop) of each window.
+
+    The running sums are restarted whenever a window does not overlap with
+    the window they were started from, which bounds the rounding error.
+    """
+    gram = np.zeros((len(start), order, order))
+    acc = np.zeros((order, order))
+    lo = 0
+    hi = 0
+    anchor_stop = -1
+    for w in range(len(start)):
+        if start[w] >= anchor_stop:
+            acc[:, :] = 0.
+            lo = hi = start[w]
+            anchor_stop = stop[w]
+        while hi < stop[w]:
+            for a in range(order):
+                for b in range(a, order):
+                    acc[a, b] += x[hi + a * delay] * x[hi + b * delay]
+            hi += 1
+        while lo < start[w]:
+            for a in range(order):
+                for b in range(a, order):
+                    acc[a, b] -= x[lo + a * delay] * x[lo + b * delay]
+            lo += 1
+
+        for a in range(order):
+            for b in range(a, order):
+                gram[w, a, b] = acc[a, b]
+                gram[w, b, a] = acc[a, b]
+    return gram
+
+
+def app_entropy(x, order=2, metric='chebyshev'):
+    """Approximate Entropy.
+
+    Parameters
+    ----------
+    x : list or np.array
+        One-dimensional time series of shape (n_times).
+    order : int
+        Embedding dimension. Default is 2.
+    metric : str
+        Name of the distance metric. Only the
+        `Chebyshev <https://en.wikipedia.org/wiki/Chebyshev_distance>`_
+        distance is supported.
+
+    Returns
+    -------
+    ae : float
+        Approximate Entropy.
+
+    Notes
+    -----
+    Approximate entropy is a technique used to quantify the amount of
+    regularity and the unpredictability of fluctuations over time-series data.
+    Smaller values indicates that the data is more regular and predictable.
+
+    The tolerance value (:math:`r`) is set to :math:`0.2 * \\text{std}(x)`.
+
+    The embedded vectors within a distance :math:`r` of each other are found
+    by a sorted neighbour search (see `_count_matches`) in a Numba kernel,
+    instead of the KDTree of the `mne-features <https://mne.tools/mne-features/>`_
+    package by Jean-Baptiste Schiratti and Alexandre Gramfort the code was
+    adapted from.
+
+    References
+    ----------
+    Richman, J. S. et al. (2000). Physiological time-series analysis
+    using approximate entropy and sample entropy. American Journal of
+    Physiology-Heart and Circulatory Physiology, 278(6), H2039-H2049.
+
+    Examples
+    --------
+    >>> from entropy import app_entropy
+    >>> import numpy as np
+    >>> np.random.seed(1234567)
+    >>> x = np.random.rand(3000)
+    >>> print(app_entropy(x, order=2))
+    2.076046899582793
+    """
+    x = _check_app_samp_entropy(x, order, metric)
+    n = x.size
+    count1, _, count2 = _count_matches(x, order, 0.2 * np.std(x), False)
+    # every vector is a neighbour of itself
+    phi1 = np.mean(np.log((count1 + 1) / (n - order + 1)))
+    phi2 = np.mean(np.log((count2 + 1) / (n - order)))
+    return np.subtract(phi1, phi2)
+
+
+def sample_entropy(x, order=2, metric='chebyshev'):
+    """Sample Entropy.
+
+    Parameters
+    ----------
+    x : list or np.array
+        One-dimensional time series of shape (n_times).
+    order : int
+        Embedding dimension. Default is 2.
+    metric : str
+        Name of the distance metric. Only the
+        `Chebyshev <https://en.wikipedia.org/wiki/Chebyshev_distance>`_
+        distance is supported.
+
+    Returns
+    -------
+    se : float
+        Sample Entropy.
+
+    Notes
+    -----
+    Sample entropy is a modification of approximate entropy, used for assessing
+    the complexity of physiological time-series signals. It has two advantages
+    over approximate entropy: data length independence and a relatively
+    trouble-free implementation. Large values indicate high complexity whereas
+    smaller values characterize more self-similar and regular signals.
+
+    The sample entropy of a signal :math:`x` is defined as:
+
+    .. math:: H(x, m, r) = -\\log\\frac{C(m + 1, r)}{C(m, r)}
+
+    where :math:`m` is the embedding dimension (= order), :math:`r` is
+    the radius of the neighbourhood (default = :math:`0.2 * \\text{std}(x)`),
+    :math:`C(m + 1, r)` is the number of embedded vectors of length
+    :math:`m + 1` having a
+    `Chebyshev distance <https://en.wikipedia.org/wiki/Chebyshev_distance>`_
+    inferior to :math:`r` and :math:`C(m, r)` is the number of embedded
+    vectors of length :math:`m` having a Chebyshev distance inferior to
+    :math:`r`. Only the first :math:`n - m` vectors of length :math:`m` are
+    considered, i.e. those that can be extended to length :math:`m + 1`.
+
+    References
+    ----------
+    Richman, J. S. et al. (2000). Physiological time-series analysis
+    using approximate entropy and sample entropy. American Journal of
+    Physiology-Heart and Circulatory Physiology, 278(6), H2039-H2049.
+
+    Examples
+    --------
+    Sample entropy with order 2.
+
+    >>> from entropy import sample_entropy
+    >>> import numpy as np
+    >>> np.random.seed(1234567)
+    >>> x = np.random.rand(3000)
+    >>> print(sample_entropy(x, order=2))
+    2.192416747827227
+    """
+    x = _check_app_samp_entropy(x, order, metric)
+    _, count1, count2 = _count_matches(x, order, 0.2 * np.std(x), True)
+    # each pair of vectors is counted for both of its vectors
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -np.log(np.divide(np.sum(count2), np.sum(count1)))
+
+
+def _check_app_samp_entropy(x, order, metric):
+    if metric != 'chebyshev':
+        raise ValueError('The given metric (%s) is not valid. The only valid '
+                         'metric name is: chebyshev' % metric)
+    x = np.asarray(x, dtype=np.float64)
+    if x.size <= order:
+        raise ValueError('x must be longer than order.')
+    return x
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _count_matches(x, order, r, strict):
+    """Number of other embedded vectors within the distance `r` (`< r` if
+    `strict`, `<= r` otherwise) of each vector of length `order`, of each of
+    the first `n - order` vectors of length `order` among themselves, and of
+    each vector of length `order + 1`.
+
+    The vectors are sorted by their first value. For each vector only the
+    following vectors in this order whose first value is within `r` are
+    candidates, and the comparison of a candidate stops at the first value
+    that is too far. This costs O(n log n) plus the number of candidates,
+    instead of comparing all O(n ** 2) pairs.
+    """
+    n = x.size
+    count1 = np.zeros(n - order + 1, dtype=np.int64)
+    count1_extendable = np.zeros(n - order, dtype=np.int64)
+    count2 = np.zeros(n - order, dtype=np.int64)
+    sorted_start = np.argsort(x[:n - order + 1], kind='mergesort')
+
+    for a in range(len(sorted_start)):
+        i = sorted_start[a]
+        for b in range(a + 1, len(sorted_start)):
+            j = sorted_start[b]
+            d = x[j] - x[i]
+            if d > r or (strict and d == r):
+                break
+
+            match = True
+            for k in range(1, order):
+                d = abs(x[i + k] - x[j + k])
+                if d > r or (strict and d == r):
+                    match = False
+                    break
+            if not match:
+                continue
+            count1[i] += 1
+            count1[j] += 1
+
+            if i < n - order and j < n - order:
+                count1_extendable[i] += 1
+                count1_extendable[j] += 1
+                d = abs(x[i + order] - x[j + order])
+                if not (d > r or (strict and d == r)):
+                    count2[i] += 1
+                    count2[j] += 1
+    return count1, count1_extendable, count2
+
+
+@jit('u8(unicode_type)', nopython=True, cache=True)
 def _lz_complexity(binary_string):
     """Internal Numba implementation of the Lempel-Ziv (LZ) complexity.
 
@@ -6,7 +6,8 @@ from numba import jit
 
 from .utils import _linear_regression, _log_n
 
-all = ['petrosian_fd', 'katz_fd', 'higuchi_fd', 'detrended_fluctuation']
+all = ['petrosian_fd', 'katz_fd', 'higuchi_fd', 'detrended_fluctuation', 'sliding_petrosian_fd', 'sliding_katz_fd',
+       'sliding_higuchi_fd', 'sliding_detrended_fluctuation', 'sliding_dfa_alpha']
 
 
 def petrosian_fd(x):
@@ -103,7 +104,7 @@ def katz_fd(x):
     return np.divide(ln, np.add(ln, np.log10(np.divide(d, ll))))
 
 
-@jit('float64(float64[:], int32)')
+@jit('float64(float64[:], int32)', cache=True)
 def _higuchi_fd(x, kmax):
     """Utility function for `higuchi_fd`.
     """
@@ -167,7 +168,7 @@ def higuchi_fd(x, kmax=10):
     return _higuchi_fd(x, kmax)
 
 
-@jit('f8(f8[:])', nopython=True)
+@jit('f8(f8[:])', nopython=True, cache=True)
 def _dfa(x):
     """
     Utility function for detrended fluctuation analysis
@@ -268,3 +269,256 @@ def detrended_fluctuation(x):
     """
     x = np.asarray(x, dtype=np.float64)
     return _dfa(x)
+
+
+def sliding_petrosian_fd(x, start, stop):
+    """Petrosian fractal dimension of many windows of the same signal.
+
+    Parameters
+    ----------
+    x : list or np.array
+        One dimensional time series.
+    start, stop : np.array
+        Start (inclusive) and stop (exclusive) position of each window.
+
+    Returns
+    -------
+    pfd : np.array
+        Petrosian fractal dimension of each window (see `petrosian_fd`),
+        NaN for windows shorter than 2 samples.
+    """
+    x, start, stop = _check_windows(x, start, stop)
+    return _sliding_petrosian_fd(x, start, stop)
+
+
+def sliding_katz_fd(x, start, stop):
+    """Katz fractal dimension of many windows of the same signal.
+
+    Parameters
+    ----------
+    x : list or np.array
+        One dimensional time series.
+    start, stop : np.array
+        Start (inclusive) and stop (exclusive) position of each window.
+
+    Returns
+    -------
+    kfd : np.array
+        Katz fractal dimension of each window (see `katz_fd`), NaN for
+        windows shorter than 2 samples and constant windows.
+    """
+    x, start, stop = _check_windows(x, start, stop)
+    return _sliding_katz_fd(x, start, stop)
+
+
+def sliding_higuchi_fd(x, start, stop, kmax=10):
+    """Higuchi fractal dimension of many windows of the same signal.
+
+    Parameters
+    ----------
+    x : list or np.array
+        One dimensional time series.
+    start, stop : np.array
+        Start (inclusive) and stop (exclusive) position of each window.
+    kmax : int
+        Maximum delay/offset (in number of samples).
+
+    Returns
+    -------
+    hfd : np.array
+        Higuchi fractal dimension of each window (see `higuchi_fd`), NaN for
+        windows shorter than `2 * kmax` samples, for which the curve length
+        at the largest delay is undefined, and for constant windows.
+    """
+    x, start, stop = _check_windows(x, start, stop)
+    return _sliding_higuchi_fd(x, start, stop, int(kmax))
+
+
+def sliding_detrended_fluctuation(x, start, stop):
+    """Detrended fluctuation analysis (DFA) of many windows of the same signal.
+
+    Parameters
+    ----------
+    x : list or np.array
+        One dimensional time series.
+    start, stop : np.array
+        Start (inclusive) and stop (exclusive) position of each window.
+
+    Returns
+    -------
+    alpha : np.array
+        DFA exponent of each window with the subseries sizes of
+        `detrended_fluctuation`, NaN if fewer than two subseries sizes
+        have a nonzero fluctuation.
+    """
+    x, start, stop = _check_windows(x, start, stop)
+    return _sliding_dfa(x, start, stop, 4, 0., 1)
+
+
+def sliding_dfa_alpha(x, start, stop, min_n, max_n, min_boxes=4):
+    """DFA exponent of many windows of the same signal over all subseries
+    sizes from `min_n` to `max_n`, e.g. the short-term (4 to 16 beats,
+    alpha 1) and long-term (16 to 64 beats, alpha 2) scaling exponents of
+    heart rate variability.
+
+    Parameters
+    ----------
+    x : list or np.array
+        One dimensional time series.
+    start, stop : np.array
+        Start (inclusive) and stop (exclusive) position of each window.
+    min_n, max_n : int
+        Smallest and largest subseries size (inclusive).
+    min_boxes : int
+        Subseries sizes that do not fit at least `min_boxes` times into a
+        window are not used for this window. Default is 4.
+
+    Returns
+    -------
+    alpha : np.array
+        DFA exponent of each window, NaN if fewer than two subseries sizes
+        can be used.
+    """
+    x, start, stop = _check_windows(x, start, stop)
+    return _sliding_dfa(x, start, stop, int(min_n), float(max_n), int(min_boxes))
+
+
+def _check_windows(x, start, stop):
+    return (np.asarray(x, dtype=np.float64), np.asarray(start, dtype=np.int64),
+            np.asarray(stop, dtype=np.int64))
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _sliding_petrosian_fd(x, start, stop):
+    out = np.full(len(start), np.nan)
+    for w in range(len(start)):
+        n = stop[w] - start[w]
+        if n < 2:
+            continue
+        # Number of sign changes in the first derivative of the signal, as in `petrosian_fd`
+        n_delta = 0
+        for i in range(start[w], stop[w] - 3):
+            if (x[i + 2] - x[i + 1]) * (x[i + 1] - x[i]) < 0:
+                n_delta += 1
+        out[w] = np.log10(n) / (np.log10(n) + np.log10(n / (n + 0.4 * n_delta)))
+    return out
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _sliding_katz_fd(x, start, stop):
+    out = np.full(len(start), np.nan)
+    for w in range(len(start)):
+        n = stop[w] - start[w]
+        if n < 2:
+            continue
+        ll = 0.
+        d = 0.
+        for i in range(start[w] + 1, stop[w]):
+            ll += abs(x[i] - x[i - 1])
+            d = max(d, abs(x[i] - x[start[w]]))
+        if ll > 0:
+            ln = np.log10(ll / (ll / (n - 1)))
+            out[w] = ln / (ln + np.log10(d / ll))
+    return out
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _sliding_higuchi_fd(x, start, stop, kmax):
+    out = np.full(len(start), np.nan)
+    x_reg = np.empty(kmax)
+    y_reg = np.empty(kmax)
+    for w in range(len(start)):
+        n_times = stop[w] - start[w]
+        if n_times < 2 * kmax:
+            continue
+        window = x[start[w]:stop[w]]
+        valid = True
+        for k in range(1, kmax + 1):
+            # curve length at delay k, averaged over the k offsets, as in `_higuchi_fd`
+            m_lm = 0.
+            for m in range(k):
+                ll = 0.
+                n_max = (n_times - m - 1) // k
+                for j in range(1, n_max):
+                    ll += abs(window[m + j * k] - window[m + (j - 1) * k])
+                m_lm += ll / k * (n_times - 1) / (k * n_max)
+            if m_lm <= 0:
+                valid = False
+                break
+            x_reg[k - 1] = np.log(1. / k)
+            y_reg[k - 1] = np.log(m_lm / k)
+        if valid:
+            out[w] = _slope(x_reg, y_reg, kmax)
+    return out
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _sliding_dfa(x, start, stop, min_n, max_n, min_boxes):
+    """DFA exponents of the windows over the subseries sizes `min_n` to
+    `max_n`. A `max_n` of 0 selects the sizes of `detrended_fluctuation`,
+    i.e. `_log_n(4, 0.1 * n, 1.2)`.
+    """
+    out = np.full(len(start), np.nan)
+    for w in range(len(start)):
+        n_times = stop[w] - start[w]
+        if n_times < 2:
+            continue
+        if max_n > 0:
+            nvals = np.arange(min_n, int(max_n) + 1)
+        else:
+            nvals = _log_n(min_n, 0.1 * n_times, 1.2)
+
+        window = x[start[w]:stop[w]]
+        walk = np.cumsum(window - window.mean())
+        log_n = np.empty(len(nvals))
+        log_f = np.empty(len(nvals))
+        count = 0
+        for n in nvals:
+            num_boxes = n_times // n
+            if n < 2 or num_boxes < min_boxes:
+                continue
+            fluctuation = _dfa_fluctuation(walk, n, num_boxes)
+            if fluctuation > 0:
+                log_n[count] = np.log(n)
+                log_f[count] = np.log(fluctuation)
+                count += 1
+        if count > 1:
+            out[w] = _slope(log_n, log_f, count)
+    return out
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _dfa_fluctuation(walk, n, num_boxes):
+    """Root mean square of the linearly detrended walk over `num_boxes`
+    non-overlapping subseries of size `n`.
+    """
+    # the regressor 0, ..., n - 1 is the same for every box
+    sx = n * (n - 1) / 2
+    sx2 = (n - 1) * n * (2 * n - 1) / 6
+    den = n * sx2 - sx ** 2
+    total = 0.
+    for b in range(num_boxes):
+        sy = 0.
+        sxy = 0.
+        for i in range(n):
+            sy += walk[b * n + i]
+            sxy += i * walk[b * n + i]
+        slope = (n * sxy - sx * sy) / den
+        intercept = sy / n - slope * sx / n
+        for i in range(n):
+            residual = walk[b * n + i] - (intercept + slope * i)
+            total += residual * residual / n
+    return np.sqrt(total / num_boxes)
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _slope(x, y, n):
+    """Least-squares slope of the first `n` points.
+    """
+    sx = sx2 = sy = sxy = 0.
+    for j in range(n):
+        sx += x[j]
+        sx2 += x[j] ** 2
+        sy += y[j]
+        sxy += x[j] * y[j]
+    return (n * sxy - sx * sy) / (n * sx2 - sx ** 2)
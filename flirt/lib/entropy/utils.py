@@ -36,7 +36,7 @@ def _embed(x, order=3, delay=1):
     return Y.T
 
 
-@jit('UniTuple(float64, 2)(float64[:], float64[:])', nopython=True)
+@jit('UniTuple(float64, 2)(float64[:], float64[:])', nopython=True, cache=True)
 def _linear_regression(x, y):
     """Fast linear regression using Numba.
 
@@ -69,7 +69,7 @@ def _linear_regression(x, y):
     return slope, intercept
 
 
-@jit('i8[:](f8, f8, f8)', nopython=True)
+@jit('i8[:](f8, f8, f8)', nopython=True, cache=True)
 def _log_n(min_n, max_n, factor):
     """
     Creates a list of integer values by successively multiplying a minimum
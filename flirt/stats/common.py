@@ -1,10 +1,12 @@
 import warnings
+from typing import List
 
 import numpy as np
 from scipy.signal import find_peaks
 from scipy.stats import skew, kurtosis, iqr
 
-from .entropy import get_entropies
+from .entropy import ENTROPIES, OPTIONAL_ENTROPIES, get_entropies
+from .fractal import FRACTALS, get_fractals
 
 FUNCTIONS = {
     'mean': np.mean,
@@ -28,27 +30,96 @@ FUNCTIONS = {
     'pct_95': lambda x: np.percentile(x, 95),
 }
 
+# registry of all feature names computed by get_stats
+FEATURES = list(FUNCTIONS.keys()) + list(FRACTALS.keys()) + list(ENTROPIES.keys()) + list(OPTIONAL_ENTROPIES.keys())
 
-def get_stats(data, key_suffix: str = None, entropies: bool = True):
+# features of the registry that are only computed if they are explicitly selected
+OPTIONAL_FEATURES = list(FRACTALS.keys()) + list(OPTIONAL_ENTROPIES.keys())
+
+
+def get_feature_names(entropies: bool = True, features: List[str] = None) -> List[str]:
+    names = FEATURES if entropies else list(FUNCTIONS.keys()) + list(FRACTALS.keys())
+    return [name for name in names if (name in features if features is not None else name not in OPTIONAL_FEATURES)]
+
+
+def get_stats(data, key_suffix: str = None, entropies: bool = True, features: List[str] = None):
     data = np.asarray(data)
+    keys = list(FUNCTIONS.keys()) if features is None else [k for k in FUNCTIONS.keys() if k in features]
 
     data_nans = np.isnan(data)
     if np.any(data_nans):
         warnings.warn(f'input data contains {np.count_nonzero(data_nans)} NaNs which will be removed')
-    data = data[~np.isnan(data)]
+    data = data[~data_nans]
 
-    results = {}
     if len(data) > 0:
-        for key, value in FUNCTIONS.items():
-            results[key] = value(data)
+        results = __get_functions(data, keys)
     else:
-        for key in FUNCTIONS.keys():
-            results[key] = np.nan
+        results = {key: np.nan for key in keys}
+
+    # Update with the optional fractal dimensions
+    results.update(get_fractals(data, features=features))
 
     # Update with entropies
     if entropies:
-        results.update(get_entropies(data))
+        results.update(get_entropies(data, features=features))
 
     if key_suffix is not None:
         results = {key_suffix+'_'+k: v for k, v in results.items()}
     return results
+
+
+def __get_functions(x: np.ndarray, keys: List[str]) -> dict:
+    """
+    Evaluates the FUNCTIONS given by `keys` on a non-empty window.
+
+    Intermediates shared by several features (mean, squares, deviations from the mean, order statistics) are \
+    computed once, the results are identical to evaluating each entry of FUNCTIONS on its own.
+    """
+
+    values = {}
+    mean = np.mean(x)
+    values['mean'] = mean
+    values['sum'] = np.sum(x)
+
+    if 'min' in keys or 'max' in keys or 'ptp' in keys:
+        values['min'] = np.min(x)
+        values['max'] = np.max(x)
+        values['ptp'] = values['max'] - values['min']
+
+    if 'energy' in keys or 'rms' in keys:
+        values['energy'] = np.sum(x ** 2)
+        values['rms'] = np.sqrt(values['energy'] / len(x))
+
+    if 'std' in keys or 'skewness' in keys or 'kurtosis' in keys:
+        # central moments as computed by np.std and scipy.stats.skew/kurtosis
+        deviations = x - mean
+        squared = deviations ** 2
+        m2 = np.mean(squared)
+        values['std'] = np.sqrt(m2)
+        with np.errstate(all='ignore'):
+            zero = m2 <= (np.finfo(m2.dtype).resolution * mean) ** 2
+            values['skewness'] = np.nan if zero else np.mean(squared * deviations) / m2 ** 1.5
+            values['kurtosis'] = np.nan if zero else np.mean(squared ** 2) / m2 ** 2.0 - 3
+
+    if 'peaks' in keys:
+        values['peaks'] = FUNCTIONS['peaks'](x)
+
+    if 'lineintegral' in keys:
+        values['lineintegral'] = np.abs(np.diff(x)).sum()
+
+    values['n_above_mean'] = np.sum(x > mean)
+    values['n_below_mean'] = np.sum(x < mean)
+
+    if 'n_sign_changes' in keys:
+        signs = np.sign(x)
+        values['n_sign_changes'] = np.sum(signs[1:] != signs[:-1])
+
+    if 'iqr' in keys or 'iqr_5_95' in keys or 'pct_5' in keys or 'pct_95' in keys:
+        # a single partition of the data for all order statistics
+        pct_5, pct_25, pct_75, pct_95 = np.percentile(x, [5, 25, 75, 95])
+        values['iqr'] = np.subtract(pct_75, pct_25)
+        values['iqr_5_95'] = np.subtract(pct_95, pct_5)
+        values['pct_5'] = pct_5
+        values['pct_95'] = pct_95
+
+    return {key: values[key] for key in keys}
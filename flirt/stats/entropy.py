@@ -1,27 +1,64 @@
+from typing import List
+
 import numpy as np
 from scipy.stats import entropy
 
-from ..lib.entropy import perm_entropy, svd_entropy
+from ..lib.entropy import app_entropy, perm_entropy, sample_entropy, sliding_perm_entropy, svd_entropy, \
+    sliding_svd_entropy
 
 ENTROPIES = {
     'entropy': lambda x, order, delay: entropy(x),
     'perm_entropy': lambda x, order, delay: perm_entropy(x, order=order, delay=delay),
     # 'spectral_entropy': lambda x, order, delay: spectral_entropy(x),
     'svd_entropy': lambda x, order, delay: svd_entropy(x, order=order, delay=delay),
+}
+
+# entropies that are only computed if they are explicitly selected
+OPTIONAL_ENTROPIES = {
+    'app_entropy': lambda x, order, delay: app_entropy(x, order=order),
+    'sample_entropy': lambda x, order, delay: sample_entropy(x, order=order),
+}
 
-    # very compute intensive!
-    # 'app_entropy': lambda x, order, delay: app_entropy(x, order=order),
-    # 'sample_entropy': lambda x, order, delay: sample_entropy(x, order=order),
+# entropies that can be updated incrementally over sliding windows, all others are evaluated per window
+SLIDING_ENTROPIES = {
+    'perm_entropy': lambda x, start, stop, order, delay: sliding_perm_entropy(x, start, stop, order=order,
+                                                                              delay=delay),
+    'svd_entropy': lambda x, start, stop, order, delay: sliding_svd_entropy(x, start, stop, order=order,
+                                                                            delay=delay),
 }
 
 
-def get_entropies(data, emb_dim: int = 2, tau: int = 3):
+def get_entropies(data, emb_dim: int = 2, tau: int = 3, features: List[str] = None):
+    entropies = __select_entropies(features)
     results = {}
     if len(data) > emb_dim * tau:
-        for key, value in ENTROPIES.items():
+        for key, value in entropies.items():
             results[key] = value(data, emb_dim, tau)
     else:
-        for key in ENTROPIES.keys():
+        for key in entropies.keys():
             results[key] = np.nan
 
     return results
+
+
+def get_sliding_entropies(data, start: np.ndarray, stop: np.ndarray, emb_dim: int = 2, tau: int = 3,
+                          features: List[str] = None):
+    entropies = __select_entropies(features)
+    results = {key: np.full(len(start), np.nan) for key in entropies.keys()}
+
+    valid = np.flatnonzero((stop - start) > emb_dim * tau)
+    if len(valid) > 0:
+        for key, value in entropies.items():
+            if key in SLIDING_ENTROPIES:
+                results[key][valid] = SLIDING_ENTROPIES[key](data, start[valid], stop[valid], emb_dim, tau)
+            else:
+                for w in valid:
+                    results[key][w] = value(data[start[w]:stop[w]], emb_dim, tau)
+
+    return results
+
+
+def __select_entropies(features: List[str] = None) -> dict:
+    if features is None:
+        return ENTROPIES
+    return {k: v for k, v in {**ENTROPIES, **OPTIONAL_ENTROPIES}.items() if k in features}
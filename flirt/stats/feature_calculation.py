@@ -1,16 +1,19 @@
 import multiprocessing
-from datetime import timedelta
+from typing import List
 
 import pandas as pd
 from joblib import Parallel, delayed
-from tqdm.autonotebook import trange
-from ..util import processing
+from tqdm.autonotebook import tqdm
+from ..util import processing, selection, windowing
 
-from .common import get_stats
+from . import sliding
+from .common import FEATURES, OPTIONAL_FEATURES
+from .entropy import ENTROPIES, OPTIONAL_ENTROPIES
 
 
 def get_stat_features(data: pd.DataFrame, window_length: int = 60, window_step_size: int = 1, data_frequency: int = 32,
-                      entropies: bool = True, num_cores: int = 0):
+                      entropies: bool = True, num_cores: int = 0, chunk_size: int = 0,
+                      method: str = 'window', features: List[str] = None, exclude: List[str] = None):
     """
     Computes several statistical and entropy-based time series features for each column in the provided DataFrame.
 
@@ -21,9 +24,22 @@ def get_stat_features(data: pd.DataFrame, window_length: int = 60, window_step_s
     window_length : int
         the epoch width (aka window size) in seconds to consider
     entropies : bool
-        whether to calculate entropy features
+        whether to calculate entropy features, entropies listed in `features` are not allowed if disabled
     num_cores : int, optional
         number of cores to use for parallel processing, by default use all available
+    chunk_size : int, optional
+        number of consecutive windows processed per task, by default chosen based on the number of windows and cores
+    method : str, optional
+        'window' evaluates every window independently, 'rolling' updates the moment-based features, min/max/ptp, \
+        lineintegral, n_sign_changes and the percentiles incrementally while the window slides, 'strided' \
+        evaluates all windows of regularly sampled signals as vectorized NumPy reductions, 'numba' evaluates every \
+        window in a compiled kernel and processes the chunks in threads instead of processes, by default 'window'
+    features : List[str], optional
+        names of the features to compute for each column (e.g. ['mean', 'std', 'pct_95']), by default all \
+        except the optional fractal dimensions ('petrosian_fd', 'katz_fd', 'higuchi_fd', 'dfa') and entropies \
+        ('app_entropy', 'sample_entropy')
+    exclude : List[str], optional
+        names of features not to compute (e.g. ['peaks', 'perm_entropy']), by default none
 
     Returns
     -------
@@ -48,39 +64,55 @@ def get_stat_features(data: pd.DataFrame, window_length: int = 60, window_step_s
     if not num_cores >= 1:
         num_cores = multiprocessing.cpu_count()
 
+    if method not in sliding.METHODS:
+        raise ValueError("invalid method: " + method)
+
+    if not entropies:
+        for name in [features] if isinstance(features, str) else features or []:
+            if name in ENTROPIES or name in OPTIONAL_ENTROPIES:
+                raise ValueError("invalid feature: " + name + " (entropies are disabled)")
+
+    features = selection.select_features(FEATURES, features, exclude, OPTIONAL_FEATURES)
+
     input_data = data.copy()
-    # advance by window_step_size * data_frequency
-    inputs = trange(0, len(input_data) - 1, window_step_size * data_frequency, desc="Stat features")
 
-    def process(memmap_data):
-        with Parallel(n_jobs=num_cores, max_nbytes=None) as parallel:
-            return parallel(
-                delayed(__ts_features)(memmap_data, epoch_width=window_length, i=k, entropies=entropies)
-                for k in inputs)
-    results = processing.memmap_auto(input_data, process)
+    # ensure we have a DatetimeIndex, needed for calculation
+    if not isinstance(input_data.index, pd.DatetimeIndex):
+        input_data.index = pd.DatetimeIndex(input_data.index)
+    if not input_data.index.is_monotonic_increasing:
+        input_data.sort_index(inplace=True)
+
+    # advance by window_step_size * data_frequency
+    windows = windowing.get_sample_windows(input_data.index, window_length, window_step_size, data_frequency)
+    inputs = tqdm(windowing.get_chunks(windows, num_cores, chunk_size), desc="Stat features")
+
+    def process(memmap_data, backend=None):
+        with Parallel(n_jobs=num_cores, max_nbytes=None, backend=backend) as parallel:
+            return parallel(delayed(__ts_features)(memmap_data, windows=chunk, entropies=entropies, method=method,
+                                                   features=features)
+                            for chunk in inputs)
+    if method == 'numba':
+        # the kernels release the GIL, threads share the data and the compiled code without memory mapping
+        results = process(input_data, backend='threading')
+    else:
+        results = processing.memmap_auto(input_data, process)
 
-    results = pd.DataFrame(list(filter(None, results)))
-    results.set_index('datetime', inplace=True)
+    results = pd.concat(results) if results else pd.DataFrame()
     results.sort_index(inplace=True)
 
     return results
 
 
-def __ts_features(data: pd.DataFrame, epoch_width: int, i: int, entropies: bool = True):
-    if pd.Timedelta(data.index[i + 1] - data.index[i]).total_seconds() <= epoch_width:
-        min_timestamp = data.index[i]
-        max_timestamp = min_timestamp + timedelta(seconds=epoch_width)
-        results = {
-            'datetime': max_timestamp,
-        }
-
-        relevant_data = data.loc[(data.index >= min_timestamp) & (data.index < max_timestamp)]
+def __ts_features(data: pd.DataFrame, windows: windowing.Windows, entropies: bool = True,
+                  method: str = 'window', features: List[str] = None) -> pd.DataFrame:
+    offset = windows.start[0]
+    relevant_data = data.iloc[offset:windows.stop[-1]]
 
-        for column in relevant_data.columns:
-            column_results = get_stats(relevant_data[column], column, entropies=entropies)
-            results.update(column_results)
+    results = {}
+    for column in relevant_data.columns:
+        column_results = sliding.get_sliding_stats(relevant_data[column], windows.start - offset,
+                                                   windows.stop - offset, column, entropies=entropies, method=method,
+                                                   features=features)
+        results.update(column_results)
 
-        return results
-
-    else:
-        return None
+    return pd.DataFrame(results, index=windows.datetime.rename('datetime'))
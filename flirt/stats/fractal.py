@@ -0,0 +1,33 @@
+from typing import List
+
+import numpy as np
+
+from ..lib.entropy import sliding_detrended_fluctuation, sliding_higuchi_fd, sliding_katz_fd, sliding_petrosian_fd
+
+# fractal dimensions and the DFA exponent, evaluated for many windows of the same signal in one compiled loop,
+# all of them are only computed if they are explicitly selected
+FRACTALS = {
+    'petrosian_fd': lambda x, start, stop: sliding_petrosian_fd(x, start, stop),
+    'katz_fd': lambda x, start, stop: sliding_katz_fd(x, start, stop),
+    'higuchi_fd': lambda x, start, stop: sliding_higuchi_fd(x, start, stop, kmax=10),
+    'dfa': lambda x, start, stop: sliding_detrended_fluctuation(x, start, stop),
+}
+
+
+def get_fractals(data, features: List[str] = None):
+    fractals = __select_fractals(features)
+    data = np.asarray(data, dtype=np.float64)
+    start, stop = np.array([0]), np.array([len(data)])
+    return {key: value(data, start, stop)[0] for key, value in fractals.items()}
+
+
+def get_sliding_fractals(data, start: np.ndarray, stop: np.ndarray, features: List[str] = None):
+    fractals = __select_fractals(features)
+    data = np.asarray(data, dtype=np.float64)
+    return {key: value(data, start, stop) for key, value in fractals.items()}
+
+
+def __select_fractals(features: List[str] = None) -> dict:
+    if features is None:
+        return {}
+    return {k: v for k, v in FRACTALS.items() if k in features}
@@ -0,0 +1,287 @@
+import numpy as np
+from numba import jit
+
+# order of the feature columns returned by window_stats
+KERNEL_FUNCTIONS = ['mean', 'std', 'min', 'max', 'ptp', 'sum', 'energy', 'skewness', 'kurtosis', 'peaks', 'rms',
+                    'lineintegral', 'n_above_mean', 'n_below_mean', 'n_sign_changes', 'iqr', 'iqr_5_95', 'pct_5',
+                    'pct_95']
+KERNEL_ENTROPIES = ['entropy', 'perm_entropy', 'svd_entropy']
+KERNEL_FEATURES = KERNEL_FUNCTIONS + KERNEL_ENTROPIES
+
+_NUM_FUNCTIONS = len(KERNEL_FUNCTIONS)
+_NUM_FEATURES = len(KERNEL_FEATURES)
+_PEAKS = KERNEL_FUNCTIONS.index('peaks')
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def window_stats(x, start, stop, selected, emb_dim, tau):
+    """
+    Computes the features of `get_stats` for the windows `[start, stop)` of a finite signal.
+
+    The kernel releases the GIL, so that several threads can process different windows of the same array \
+    concurrently.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        one-dimensional float64 input signal without NaNs
+    start : np.ndarray
+        start position (inclusive) of each window
+    stop : np.ndarray
+        stop position (exclusive) of each window
+    selected : np.ndarray
+        boolean mask over `KERNEL_FEATURES`, the peaks and the entropies are only computed if selected, \
+        all other features are cheap and always computed
+    emb_dim : int
+        embedding dimension of the entropy features
+    tau : int
+        time delay of the entropy features
+
+    Returns
+    -------
+    np.ndarray
+        (windows x features) array, the columns are ordered as `KERNEL_FEATURES`
+    """
+    out = np.full((len(start), _NUM_FEATURES), np.nan)
+    for w in range(len(start)):
+        window = x[start[w]:stop[w]]
+        if len(window) > 0:
+            _functions(window, out[w], selected[_PEAKS])
+        if len(window) > emb_dim * tau:
+            if selected[_NUM_FUNCTIONS]:
+                out[w, _NUM_FUNCTIONS] = _entropy(window)
+            if selected[_NUM_FUNCTIONS + 1]:
+                out[w, _NUM_FUNCTIONS + 1] = _perm_entropy(window, emb_dim, tau)
+            if selected[_NUM_FUNCTIONS + 2]:
+                out[w, _NUM_FUNCTIONS + 2] = _svd_entropy(window, emb_dim, tau)
+    return out
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _functions(x, out, peaks):
+    n = len(x)
+    # summed as np.sum, so that samples equal to the mean are counted as by get_stats
+    total = _sum(x)
+    energy = 0.
+    minimum = x[0]
+    maximum = x[0]
+    for v in x:
+        energy += v * v
+        if v < minimum:
+            minimum = v
+        if v > maximum:
+            maximum = v
+    mean = total / n
+
+    m2 = m3 = m4 = 0.
+    above = below = 0
+    for v in x:
+        d = v - mean
+        d2 = d * d
+        m2 += d2
+        m3 += d2 * d
+        m4 += d2 * d2
+        if v > mean:
+            above += 1
+        elif v < mean:
+            below += 1
+    m2 /= n
+    m3 /= n
+    m4 /= n
+
+    lineintegral = 0.
+    sign_changes = 0
+    for i in range(n - 1):
+        lineintegral += abs(x[i + 1] - x[i])
+        if np.sign(x[i + 1]) != np.sign(x[i]):
+            sign_changes += 1
+
+    sorted_x = np.sort(x)
+    pct_5 = _percentile(sorted_x, 5.)
+    pct_25 = _percentile(sorted_x, 25.)
+    pct_75 = _percentile(sorted_x, 75.)
+    pct_95 = _percentile(sorted_x, 95.)
+
+    out[0] = mean
+    out[1] = np.sqrt(m2)
+    out[2] = minimum
+    out[3] = maximum
+    out[4] = maximum - minimum
+    out[5] = total
+    out[6] = energy
+    # same degeneracy rule as scipy.stats.skew/kurtosis
+    if m2 > (1e-15 * mean) ** 2:
+        out[7] = m3 / m2 ** 1.5
+        out[8] = m4 / m2 ** 2 - 3
+    if peaks:
+        out[_PEAKS] = _count_peaks(x, 0.9)
+    out[10] = np.sqrt(energy / n)
+    out[11] = lineintegral
+    out[12] = above
+    out[13] = below
+    out[14] = sign_changes
+    out[15] = pct_75 - pct_25
+    out[16] = pct_95 - pct_5
+    out[17] = pct_5
+    out[18] = pct_95
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _sum(x):
+    # numpy reduces contiguous arrays in buffers of 8192 elements, each of them by pairwise summation
+    total = 0.
+    for lo in range(0, len(x), 8192):
+        total += _pairwise_sum(x, lo, min(8192, len(x) - lo))
+    return total
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _pairwise_sum(x, lo, n):
+    # port of numpy's pairwise_sum: blocks of up to 128 elements are summed with 8 accumulators
+    if n < 8:
+        total = 0.
+        for i in range(lo, lo + n):
+            total += x[i]
+        return total
+    elif n <= 128:
+        r = np.empty(8)
+        for j in range(8):
+            r[j] = x[lo + j]
+        i = 8
+        while i < n - (n % 8):
+            for j in range(8):
+                r[j] += x[lo + i + j]
+            i += 8
+        total = ((r[0] + r[1]) + (r[2] + r[3])) + ((r[4] + r[5]) + (r[6] + r[7]))
+        while i < n:
+            total += x[lo + i]
+            i += 1
+        return total
+    half = n // 2
+    half -= half % 8
+    return _pairwise_sum(x, lo, half) + _pairwise_sum(x, lo + half, n - half)
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _percentile(sorted_x, q):
+    # linear interpolation between the closest ranks, as np.percentile
+    position = q / 100 * (len(sorted_x) - 1)
+    k = int(np.floor(position))
+    t = position - k
+    if k + 1 >= len(sorted_x):
+        return sorted_x[k]
+    a = sorted_x[k]
+    b = sorted_x[k + 1]
+    if t >= 0.5:
+        return b - (b - a) * (1 - t)
+    return a + (b - a) * t
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _count_peaks(x, min_prominence):
+    """
+    Number of peaks with a prominence of at least `min_prominence`, as `scipy.signal.find_peaks`.
+    """
+    count = 0
+    i = 1
+    i_max = len(x) - 1
+    while i < i_max:
+        if x[i - 1] < x[i]:
+            i_ahead = i + 1
+            while i_ahead < i_max and x[i_ahead] == x[i]:
+                i_ahead += 1
+            if x[i_ahead] < x[i]:
+                # the peak of a plateau is its midpoint
+                peak = (i + i_ahead - 1) // 2
+                left_min = x[peak]
+                j = peak
+                while j >= 0 and x[j] <= x[peak]:
+                    if x[j] < left_min:
+                        left_min = x[j]
+                    j -= 1
+                right_min = x[peak]
+                j = peak
+                while j <= len(x) - 1 and x[j] <= x[peak]:
+                    if x[j] < right_min:
+                        right_min = x[j]
+                    j += 1
+                if x[peak] - max(left_min, right_min) >= min_prominence:
+                    count += 1
+                i = i_ahead
+        i += 1
+    return count
+
+
+@jit(nopython=True, nogil=True, error_model='numpy', cache=True)
+def _entropy(x):
+    # Shannon entropy (nat) of x normalized to a distribution, as scipy.stats.entropy
+    total = 0.
+    for v in x:
+        total += v
+    s = 0.
+    for v in x:
+        p = v / total
+        if p > 0:
+            s -= p * np.log(p)
+        elif p < 0:
+            s = -np.inf
+        elif p != 0:
+            s += p
+    return s
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _perm_entropy(x, order, delay):
+    # permutation entropy (bit), as flirt.lib.entropy.perm_entropy
+    num_vectors = len(x) - (order - 1) * delay
+    counts = np.zeros(order ** order, dtype=np.int64)
+    values = np.empty(order)
+    idx = np.empty(order, dtype=np.int64)
+    for i in range(num_vectors):
+        for j in range(order):
+            values[j] = x[i + j * delay]
+            idx[j] = j
+        # stable insertion sort of the positions, which is what argsort does for such short rows
+        for j in range(1, order):
+            k = j
+            while k > 0 and values[idx[k - 1]] > values[idx[k]]:
+                idx[k - 1], idx[k] = idx[k], idx[k - 1]
+                k -= 1
+        hashval = 0
+        mult = 1
+        for j in range(order):
+            hashval += idx[j] * mult
+            mult *= order
+        counts[hashval] += 1
+
+    s = 0.
+    for c in counts:
+        if c > 0:
+            p = c / num_vectors
+            s += p * np.log2(p)
+    return -s
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _svd_entropy(x, order, delay):
+    # SVD entropy (bit) from the eigenvalues of the lagged Gram matrix, as flirt.lib.entropy.sliding_svd_entropy
+    num_vectors = len(x) - (order - 1) * delay
+    gram = np.zeros((order, order))
+    for i in range(num_vectors):
+        for a in range(order):
+            for b in range(a, order):
+                gram[a, b] += x[i + a * delay] * x[i + b * delay]
+    for a in range(order):
+        for b in range(a):
+            gram[a, b] = gram[b, a]
+
+    singular_values = np.sqrt(np.maximum(np.linalg.eigvalsh(gram), 0.))
+    total = singular_values.sum()
+    if not total > 0:
+        return np.nan
+    s = 0.
+    for v in singular_values[::-1]:
+        if v > 0:
+            p = v / total
+            s += p * np.log2(p)
+    return -s
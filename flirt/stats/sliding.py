@@ -0,0 +1,479 @@
+from typing import List
+
+import numpy as np
+from numba import jit
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import find_peaks
+from scipy.stats import skew, kurtosis, iqr
+
+from .common import FUNCTIONS, get_feature_names, get_stats
+from .entropy import get_sliding_entropies
+from .fractal import FRACTALS, get_sliding_fractals
+from .kernels import KERNEL_FEATURES, window_stats
+
+METHODS = ['window', 'rolling', 'strided', 'numba']
+
+# features maintained incrementally by the 'rolling' method, all others are evaluated per window
+ROLLING_FUNCTIONS = ['mean', 'std', 'min', 'max', 'ptp', 'sum', 'energy', 'skewness', 'kurtosis', 'rms',
+                     'lineintegral', 'n_sign_changes', 'iqr', 'iqr_5_95', 'pct_5', 'pct_95']
+
+# percentiles maintained by the sliding order statistics of the 'rolling' method
+ROLLING_PERCENTILES = np.array([5., 25., 75., 95.])
+
+# the FUNCTIONS of get_stats as reductions over the last axis of a (windows x samples) array
+STRIDED_FUNCTIONS = {
+    'mean': lambda x: np.mean(x, axis=1),
+    'std': lambda x: np.std(x, axis=1),
+    'min': lambda x: np.min(x, axis=1),
+    'max': lambda x: np.max(x, axis=1),
+    'ptp': lambda x: np.ptp(x, axis=1),
+    'sum': lambda x: np.sum(x, axis=1),
+    'energy': lambda x: np.sum(x ** 2, axis=1),
+    'skewness': lambda x: skew(x, axis=1),
+    'kurtosis': lambda x: kurtosis(x, axis=1),
+    'peaks': lambda x: np.array([len(find_peaks(row, prominence=0.9)[0]) for row in x]),
+    'rms': lambda x: np.sqrt(np.sum(x ** 2, axis=1) / x.shape[1]),
+    'lineintegral': lambda x: np.abs(np.diff(x, axis=1)).sum(axis=1),
+    'n_above_mean': lambda x: np.sum(x > np.mean(x, axis=1, keepdims=True), axis=1),
+    'n_below_mean': lambda x: np.sum(x < np.mean(x, axis=1, keepdims=True), axis=1),
+    'n_sign_changes': lambda x: np.sum(np.diff(np.sign(x), axis=1) != 0, axis=1),
+    'iqr': lambda x: iqr(x, axis=1),
+    'iqr_5_95': lambda x: iqr(x, axis=1, rng=(5, 95)),
+    'pct_5': lambda x: np.percentile(x, 5, axis=1),
+    'pct_95': lambda x: np.percentile(x, 95, axis=1),
+}
+
+# maximum number of samples (windows x window length) the 'strided' method reduces at once
+STRIDED_BATCH_SIZE = 2 ** 21
+
+
+def get_sliding_stats(data, start: np.ndarray, stop: np.ndarray, key_suffix: str = None, entropies: bool = True,
+                      method: str = 'window', features: List[str] = None) -> dict:
+    """
+    Computes the features of `get_stats` for many windows of the same signal at once.
+
+    Parameters
+    ----------
+    data : np.array
+        one-dimensional input signal
+    start : np.ndarray
+        start position (inclusive) of each window, must be non-decreasing
+    stop : np.ndarray
+        stop position (exclusive) of each window, must be non-decreasing
+    key_suffix : str, optional
+        prefix of the returned feature names
+    entropies : bool
+        whether to calculate entropy features
+    method : str
+        'window' evaluates every window independently, 'rolling' updates the moment-based features \
+        (mean, std, sum, energy, rms, skewness, kurtosis), min/max/ptp, lineintegral, n_sign_changes and the \
+        percentile features (iqr, iqr_5_95, pct_5, pct_95) incrementally while the window slides, which costs \
+        O(N log N) in total instead of O(N * window length), 'strided' evaluates all windows of the regular \
+        window length as NumPy reductions over a strided view of the signal, 'numba' evaluates every window in a \
+        compiled kernel that releases the GIL and can thus be run from several threads
+    features : List[str], optional
+        names of the features to compute (see `FEATURES`), by default all
+
+    Returns
+    -------
+    dict
+        one array per feature, holding the value for each window
+    """
+
+    data = np.asarray(data)
+    start = np.asarray(start, dtype=np.int64)
+    stop = np.asarray(stop, dtype=np.int64)
+
+    if method == 'window':
+        results = __get_window_stats(data, start, stop, entropies, features)
+    elif method == 'rolling':
+        results = __get_rolling_stats(data.astype(np.float64, copy=False), start, stop, entropies, features)
+    elif method == 'strided':
+        results = __get_strided_stats(data.astype(np.float64, copy=False), start, stop, entropies, features)
+    elif method == 'numba':
+        results = __get_numba_stats(data.astype(np.float64, copy=False), start, stop, entropies, features)
+    else:
+        raise ValueError("invalid method: " + method)
+
+    if key_suffix is not None:
+        results = {key_suffix + '_' + k: v for k, v in results.items()}
+    return results
+
+
+def __get_window_stats(data: np.ndarray, start: np.ndarray, stop: np.ndarray, entropies: bool,
+                       features: List[str]) -> dict:
+    rows = [get_stats(data[i:j], entropies=entropies, features=features) for i, j in zip(start, stop)]
+    keys = get_feature_names(entropies, features)
+    return {key: np.array([row[key] for row in rows]) for key in keys}
+
+
+def __get_rolling_stats(data: np.ndarray, start: np.ndarray, stop: np.ndarray, entropies: bool,
+                        features: List[str]) -> dict:
+    keys = get_feature_names(entropies, features)
+    num_windows = len(start)
+    results = {key: np.full(num_windows, np.nan) for key in FUNCTIONS.keys()}
+
+    # windows with NaNs or infinite values are passed to get_stats as a whole, the remaining windows are
+    # computed from a finite copy so that such values do not propagate through the running sums
+    finite = np.isfinite(data)
+    non_finite = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum(~finite, out=non_finite[1:])
+    fallback = (non_finite[stop] - non_finite[start]) > 0
+    filled = np.where(finite, data, 0.0)
+
+    if len(data) > 0 and num_windows > 0:
+        count, mean, m2, m3, m4, energy = _rolling_moments(filled, start, stop)
+        minimum, maximum = _rolling_min_max(filled, start, stop)
+        percentiles = _rolling_percentiles(filled, start, stop, ROLLING_PERCENTILES)
+        results.update(get_moment_stats(count, mean, m2, m3, m4, energy, minimum, maximum, percentiles))
+        results.update(get_difference_stats(filled, start, stop))
+
+    results.update(get_sliding_fractals(filled, start, stop, features=features))
+    if entropies:
+        results.update(get_sliding_entropies(filled, start, stop, features=features))
+
+    other_keys = [key for key in keys if key in FUNCTIONS and key not in ROLLING_FUNCTIONS]
+    for w in range(num_windows):
+        window = data[start[w]:stop[w]]
+        if fallback[w]:
+            for key, value in get_stats(window, entropies=entropies, features=features).items():
+                results[key][w] = value
+        elif len(window) > 0:
+            for key in other_keys:
+                results[key][w] = FUNCTIONS[key](window)
+
+    return {key: results[key] for key in keys}
+
+
+def get_moment_stats(count: np.ndarray, mean: np.ndarray, m2: np.ndarray, m3: np.ndarray, m4: np.ndarray,
+                     energy: np.ndarray, minimum: np.ndarray, maximum: np.ndarray, percentiles: np.ndarray) -> dict:
+    """
+    Derives the features of `get_stats` that only depend on the moments, the extremes and the percentiles of each \
+    window.
+
+    Parameters
+    ----------
+    count, mean, m2, m3, m4, energy : np.ndarray
+        number of samples, mean, central moments (normalized by the number of samples) and sum of squares of each \
+        window
+    minimum, maximum : np.ndarray
+        the extremes of each window
+    percentiles : np.ndarray
+        the percentiles `ROLLING_PERCENTILES` of each window, one row per percentile
+
+    Returns
+    -------
+    dict
+        one array per feature, holding the value for each window
+    """
+
+    results = {}
+    pct_5, pct_25, pct_75, pct_95 = percentiles
+    with np.errstate(divide='ignore', invalid='ignore'):
+        results['mean'] = mean
+        results['std'] = np.sqrt(m2)
+        results['min'] = minimum
+        results['max'] = maximum
+        results['ptp'] = maximum - minimum
+        results['sum'] = count * mean
+        results['energy'] = energy
+        results['rms'] = np.sqrt(energy / count)
+
+        # same degeneracy rule as scipy.stats.skew/kurtosis, constant windows are detected exactly
+        zero = (minimum == maximum) | (m2 <= (np.finfo(np.float64).resolution * mean) ** 2)
+        results['skewness'] = np.where(zero, np.nan, m3 / m2 ** 1.5)
+        results['kurtosis'] = np.where(zero, np.nan, m4 / m2 ** 2 - 3)
+
+    results['iqr'] = pct_75 - pct_25
+    results['iqr_5_95'] = pct_95 - pct_5
+    results['pct_5'] = pct_5
+    results['pct_95'] = pct_95
+    return results
+
+
+def get_difference_stats(data: np.ndarray, start: np.ndarray, stop: np.ndarray) -> dict:
+    """
+    Computes lineintegral and n_sign_changes of many windows of a finite signal.
+    """
+
+    # both are sums over successive differences, i.e. differences of prefix sums
+    abs_diff = np.zeros(len(data))
+    np.cumsum(np.abs(np.diff(data)), out=abs_diff[1:])
+    sign_changes = np.zeros(len(data), dtype=np.int64)
+    np.cumsum(np.diff(np.sign(data)) != 0, out=sign_changes[1:])
+    last = np.maximum(stop - 1, start)
+    last = np.minimum(last, len(data) - 1)
+    first = np.minimum(start, len(data) - 1)
+    nonempty = stop > start
+    return {
+        'lineintegral': np.where(nonempty, abs_diff[last] - abs_diff[first], np.nan),
+        'n_sign_changes': np.where(nonempty, sign_changes[last] - sign_changes[first], np.nan),
+    }
+
+
+def __get_strided_stats(data: np.ndarray, start: np.ndarray, stop: np.ndarray, entropies: bool,
+                        features: List[str]) -> dict:
+    keys = get_feature_names(entropies, features)
+    num_windows = len(start)
+    results = {key: np.full(num_windows, np.nan) for key in keys}
+
+    finite = np.isfinite(data)
+    non_finite = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum(~finite, out=non_finite[1:])
+    results.update(get_sliding_fractals(np.where(finite, data, 0.0), start, stop, features=features))
+    if entropies:
+        results.update(get_sliding_entropies(np.where(finite, data, 0.0), start, stop, features=features))
+    lengths = stop - start
+
+    # only windows of the regular length are evaluated on the strided view, windows that are cut short by gaps
+    # or the end of the recording as well as windows containing NaNs are passed to get_stats
+    regular = np.zeros(num_windows, dtype=bool)
+    if num_windows > 0 and lengths.max() > 0:
+        window_length = np.bincount(lengths).argmax()
+        regular = (lengths == window_length) & (non_finite[stop] == non_finite[start]) & (window_length > 0)
+
+    positions = np.flatnonzero(regular)
+    if len(positions) > 0:
+        view = sliding_window_view(data, window_length)
+        batch_size = max(1, STRIDED_BATCH_SIZE // window_length)
+        for i in range(0, len(positions), batch_size):
+            batch = positions[i:i + batch_size]
+            batch_start = start[batch]
+            steps = np.diff(batch_start)
+            if len(batch) > 1 and steps[0] > 0 and np.all(steps == steps[0]):
+                # equidistant windows are a plain slice of the view, i.e. no copy of the data is made
+                windows = view[batch_start[0]:batch_start[-1] + 1:steps[0]]
+            else:
+                windows = view[batch_start]
+
+            for key, function in STRIDED_FUNCTIONS.items():
+                if key in results:
+                    results[key][batch] = function(windows)
+
+    for w in np.flatnonzero(~regular):
+        for key, value in get_stats(data[start[w]:stop[w]], entropies=entropies, features=features).items():
+            results[key][w] = value
+
+    return results
+
+
+def __get_numba_stats(data: np.ndarray, start: np.ndarray, stop: np.ndarray, entropies: bool,
+                      features: List[str]) -> dict:
+    keys = get_feature_names(entropies, features)
+    finite = np.isfinite(data)
+    selected = np.array([key in keys for key in KERNEL_FEATURES])
+    # the kernels share one zero-filled copy, which is only made if the signal has non-finite values
+    filled = data if finite.all() else np.where(finite, data, 0.0)
+    values = window_stats(filled, start, stop, selected, 2, 3)
+    fractals = get_sliding_fractals(filled, start, stop, features=keys)
+    results = {}
+    for key in keys:
+        if key in fractals:
+            results[key] = fractals[key]
+        elif key in KERNEL_FEATURES:
+            results[key] = values[:, KERNEL_FEATURES.index(key)]
+        else:
+            results[key] = np.full(len(start), np.nan)
+
+    # windows containing NaNs or infinite values as well as features without a kernel are passed to get_stats
+    non_finite = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum(~finite, out=non_finite[1:])
+    fallback = (non_finite[stop] - non_finite[start]) > 0
+    other_keys = [key for key in keys if key not in KERNEL_FEATURES and key not in FRACTALS]
+    for w in range(len(start)):
+        window = data[start[w]:stop[w]]
+        if fallback[w]:
+            for key, value in get_stats(window, entropies=entropies, features=features).items():
+                results[key][w] = value
+        elif len(window) > 0 and other_keys:
+            stats = get_stats(window, entropies=entropies, features=other_keys)
+            for key in other_keys:
+                results[key][w] = stats[key]
+
+    return results
+
+
+@jit(nopython=True, cache=True)
+def _rolling_moments(x, start, stop):
+    """
+    Central moments of sliding windows from running sums of the first four powers of `x - shift`.
+
+    The shift is re-anchored to the mean of the current window whenever the window no longer overlaps with the \
+    window the sums were started from, which bounds the cancellation error of the central moments.
+    """
+    num_windows = len(start)
+    out_count = np.zeros(num_windows)
+    out_mean = np.full(num_windows, np.nan)
+    out_m2 = np.full(num_windows, np.nan)
+    out_m3 = np.full(num_windows, np.nan)
+    out_m4 = np.full(num_windows, np.nan)
+    out_energy = np.full(num_windows, np.nan)
+
+    lo = 0
+    hi = 0
+    anchor_stop = -1
+    shift = 0.0
+    s1 = s2 = s3 = s4 = 0.0
+    for w in range(num_windows):
+        if start[w] >= anchor_stop:
+            # restart the sums from scratch, centered on the mean of the new window
+            lo = start[w]
+            hi = stop[w]
+            anchor_stop = stop[w]
+            shift = 0.0
+            for i in range(lo, hi):
+                shift += x[i]
+            if hi > lo:
+                shift /= hi - lo
+            s1 = s2 = s3 = s4 = 0.0
+            for i in range(lo, hi):
+                d = x[i] - shift
+                d2 = d * d
+                s1 += d
+                s2 += d2
+                s3 += d2 * d
+                s4 += d2 * d2
+        else:
+            while hi < stop[w]:
+                d = x[hi] - shift
+                d2 = d * d
+                s1 += d
+                s2 += d2
+                s3 += d2 * d
+                s4 += d2 * d2
+                hi += 1
+            while lo < start[w]:
+                d = x[lo] - shift
+                d2 = d * d
+                s1 -= d
+                s2 -= d2
+                s3 -= d2 * d
+                s4 -= d2 * d2
+                lo += 1
+
+        n = hi - lo
+        out_count[w] = n
+        if n == 0:
+            continue
+        mean_d = s1 / n
+        m2 = s2 / n - mean_d ** 2
+        out_mean[w] = shift + mean_d
+        out_m2[w] = m2 if m2 > 0 else 0.0
+        out_m3[w] = s3 / n - 3 * mean_d * s2 / n + 2 * mean_d ** 3
+        out_m4[w] = s4 / n - 4 * mean_d * s3 / n + 6 * mean_d ** 2 * s2 / n - 3 * mean_d ** 4
+        out_energy[w] = s2 + 2 * shift * s1 + n * shift ** 2
+    return out_count, out_mean, out_m2, out_m3, out_m4, out_energy
+
+
+@jit(nopython=True, cache=True)
+def _rolling_min_max(x, start, stop):
+    """
+    Sliding minimum and maximum using monotonic deques of sample positions.
+    """
+    num_windows = len(start)
+    out_min = np.full(num_windows, np.nan)
+    out_max = np.full(num_windows, np.nan)
+
+    # every position enters each deque at most once, so plain arrays with head/tail pointers suffice
+    min_queue = np.empty(len(x), dtype=np.int64)
+    max_queue = np.empty(len(x), dtype=np.int64)
+    min_head = min_tail = 0
+    max_head = max_tail = 0
+    hi = 0
+    for w in range(num_windows):
+        if hi < start[w]:
+            hi = start[w]
+        while hi < stop[w]:
+            v = x[hi]
+            while min_tail > min_head and x[min_queue[min_tail - 1]] >= v:
+                min_tail -= 1
+            min_queue[min_tail] = hi
+            min_tail += 1
+            while max_tail > max_head and x[max_queue[max_tail - 1]] <= v:
+                max_tail -= 1
+            max_queue[max_tail] = hi
+            max_tail += 1
+            hi += 1
+        while min_head < min_tail and min_queue[min_head] < start[w]:
+            min_head += 1
+        while max_head < max_tail and max_queue[max_head] < start[w]:
+            max_head += 1
+        if min_head < min_tail:
+            out_min[w] = x[min_queue[min_head]]
+            out_max[w] = x[max_queue[max_head]]
+    return out_min, out_max
+
+
+@jit(nopython=True, cache=True)
+def _rolling_percentiles(x, start, stop, percentiles):
+    """
+    Sliding percentiles (linear interpolation, as `np.percentile`) from a sliding order-statistics structure.
+
+    All samples are ranked once, a Fenwick tree over the ranks then holds the samples of the current window. \
+    Inserting or evicting a sample and looking up the k-th smallest sample each cost O(log N).
+    """
+    n = len(x)
+    num_windows = len(start)
+    out = np.full((len(percentiles), num_windows), np.nan)
+
+    order = np.argsort(x, kind='mergesort')
+    sorted_x = x[order]
+    rank = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        rank[order[i]] = i
+
+    tree = np.zeros(n + 1, dtype=np.int64)
+    top_bit = 1
+    while top_bit * 2 <= n:
+        top_bit *= 2
+
+    lo = 0
+    hi = 0
+    for w in range(num_windows):
+        # evict first, the window may have jumped past the samples that are currently held
+        while lo < start[w] and lo < hi:
+            i = rank[lo] + 1
+            while i <= n:
+                tree[i] -= 1
+                i += i & -i
+            lo += 1
+        if hi < start[w]:
+            lo = hi = start[w]
+        while hi < stop[w]:
+            i = rank[hi] + 1
+            while i <= n:
+                tree[i] += 1
+                i += i & -i
+            hi += 1
+
+        count = hi - lo
+        if count == 0:
+            continue
+        for p in range(len(percentiles)):
+            position = percentiles[p] / 100 * (count - 1)
+            k = int(np.floor(position))
+            fraction = position - k
+            lower = sorted_x[_fenwick_kth(tree, top_bit, n, k)]
+            if fraction > 0:
+                upper = sorted_x[_fenwick_kth(tree, top_bit, n, k + 1)]
+                out[p, w] = lower + fraction * (upper - lower)
+            else:
+                out[p, w] = lower
+    return out
+
+
+@jit(nopython=True, cache=True)
+def _fenwick_kth(tree, top_bit, n, k):
+    """
+    Position (0-based) of the k-th (0-based) element held in a Fenwick tree of counts.
+    """
+    position = 0
+    remaining = k + 1
+    bit = top_bit
+    while bit > 0:
+        next_position = position + bit
+        if next_position <= n and tree[next_position] < remaining:
+            position = next_position
+            remaining -= tree[next_position]
+        bit //= 2
+    return position
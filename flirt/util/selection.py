@@ -0,0 +1,37 @@
+from typing import List
+
+
+def select_features(registry: List[str], features: List[str] = None, exclude: List[str] = None,
+                    optional: List[str] = None) -> List[str]:
+    """
+    Resolves which features to compute from a registry of known feature names.
+
+    Parameters
+    ----------
+    registry : List[str]
+        all known feature names, in the order they are computed
+    features : List[str], optional
+        the features to compute, by default all features of the registry
+    exclude : List[str], optional
+        features not to compute, by default none
+    optional : List[str], optional
+        features of the registry that are only computed if they are listed in `features`, by default none
+
+    Returns
+    -------
+    List[str]
+        the selected feature names in registry order
+    """
+
+    if isinstance(features, str):
+        features = [features]
+    if isinstance(exclude, str):
+        exclude = [exclude]
+
+    for name in list(features or []) + list(exclude or []):
+        if name not in registry:
+            raise ValueError("invalid feature: " + name)
+
+    return [name for name in registry
+            if (name in features if features is not None else name not in (optional or []))
+            and (exclude is None or name not in exclude)]
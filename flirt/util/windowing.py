@@ -0,0 +1,140 @@
+from collections import namedtuple
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+Windows = namedtuple("Windows", ["start", "stop", "datetime"])
+
+
+def get_sample_windows(index: pd.DatetimeIndex, window_length: float, window_step_size: float,
+                       data_frequency: float) -> Windows:
+    """
+    Computes the windows of a regularly sampled signal, advancing by `window_step_size * data_frequency` samples.
+
+    A window starts at every n-th sample and covers all samples in `[start, start + window_length)`. Windows \
+    starting right before a gap that is larger than the window itself are dropped.
+
+    Parameters
+    ----------
+    index : pd.DatetimeIndex
+        the sorted index of the input signal
+    window_length : float
+        the window size in seconds
+    window_step_size : float
+        the time step to shift each window in seconds
+    data_frequency : float
+        the frequency of the input signal
+
+    Returns
+    -------
+    Windows
+        integer start (inclusive) and stop (exclusive) positions of each window plus its closing datetime
+    """
+
+    timestamps = __to_int64(index)
+    window_length_ns = int(window_length * 1e9)
+    step = max(1, int(round(window_step_size * data_frequency)))
+
+    first = np.arange(0, len(timestamps) - 1, step)
+    first = first[(timestamps[first + 1] - timestamps[first]) <= window_length_ns]
+
+    window_start = timestamps[first]
+    start = np.searchsorted(timestamps, window_start, side='left')
+    stop = np.searchsorted(timestamps, window_start + window_length_ns, side='left')
+
+    return Windows(start, stop, index[first] + pd.Timedelta(window_length_ns, unit='ns'))
+
+
+def get_time_windows(index: pd.DatetimeIndex, window_starts: pd.DatetimeIndex, window_length: float) -> Windows:
+    """
+    Computes the windows `[window_start, window_start + window_length)` for a given list of start datetimes.
+
+    Parameters
+    ----------
+    index : pd.DatetimeIndex
+        the sorted index of the input signal
+    window_starts : pd.DatetimeIndex
+        the start datetime of each window
+    window_length : float
+        the window size in seconds
+
+    Returns
+    -------
+    Windows
+        integer start (inclusive) and stop (exclusive) positions of each window plus its closing datetime
+    """
+
+    timestamps = __to_int64(index)
+    window_length_ns = int(window_length * 1e9)
+
+    window_start = __to_int64(window_starts)
+    start = np.searchsorted(timestamps, window_start, side='left')
+    stop = np.searchsorted(timestamps, window_start + window_length_ns, side='left')
+
+    return Windows(start, stop, window_starts + pd.Timedelta(window_length_ns, unit='ns'))
+
+
+def get_segments(index: pd.DatetimeIndex, data_frequency: float,
+                 values: np.ndarray = None) -> (np.ndarray, np.ndarray):
+    """
+    Splits a regularly sampled signal into contiguous segments at gaps of more than 1.5 sampling intervals and, if \
+    `values` are given, at non-finite values, which then belong to no segment.
+
+    Parameters
+    ----------
+    index : pd.DatetimeIndex
+        the sorted index of the input signal
+    data_frequency : float
+        the frequency of the input signal
+    values : np.ndarray, optional
+        the samples of the input signal, by default the signal is only split at gaps
+
+    Returns
+    -------
+    (np.ndarray, np.ndarray)
+        integer start (inclusive) and stop (exclusive) positions of each segment
+    """
+
+    timestamps = __to_int64(index)
+    if len(timestamps) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    finite = np.ones(len(timestamps), dtype=bool) if values is None else np.isfinite(values)
+    # a sample starts a segment if it follows a gap or a non-finite sample and ends one if such follows it
+    gap = np.r_[True, np.diff(timestamps) > 1.5e9 / data_frequency, True]
+    first = finite & (gap[:-1] | ~np.r_[False, finite[:-1]])
+    last = finite & (gap[1:] | ~np.r_[finite[1:], False])
+    return np.flatnonzero(first).astype(np.int64), np.flatnonzero(last).astype(np.int64) + 1
+
+
+def get_chunks(windows: Windows, num_cores: int, chunk_size: int = 0) -> List[Windows]:
+    """
+    Splits the windows into contiguous chunks, each of which is processed by a single task.
+
+    Parameters
+    ----------
+    windows : Windows
+        the windows to split
+    num_cores : int
+        number of cores used for parallel processing
+    chunk_size : int, optional
+        number of windows per chunk, by default a few chunks per core
+
+    Returns
+    -------
+    List[Windows]
+        the chunks in order
+    """
+
+    num_windows = len(windows.start)
+    if not chunk_size >= 1:
+        # a few chunks per core balance the load without flooding the scheduler with tiny tasks
+        chunk_size = max(1, int(np.ceil(num_windows / (4 * num_cores))))
+
+    return [Windows(*(x[i:i + chunk_size] for x in windows)) for i in range(0, num_windows, chunk_size)]
+
+
+def __to_int64(index: pd.DatetimeIndex) -> np.ndarray:
+    # nanoseconds since epoch (UTC), independent of the resolution and time zone of the index
+    return np.asarray(index.values.astype('datetime64[ns]')).view(np.int64)
@@ -1,12 +1,15 @@
 import unittest
+import warnings
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
 
 import flirt
 import flirt.reader.empatica
 import flirt.reader.holter
 import flirt.stats
+import flirt.util.windowing
 
 
 class EmpaticaEdaTestCase(unittest.TestCase):
@@ -18,6 +21,100 @@ class EmpaticaEdaTestCase(unittest.TestCase):
 
         self.assertEqual(2500, len(eda))
 
+    def test_signal_decomposition(self):
+        eda = flirt.reader.empatica.read_eda_file_into_df('wearable-data/empatica/EDA.csv')['eda'].iloc[:4000]
+        expected = flirt.get_eda_features(eda, num_cores=1, features=['mean', 'std'])
+        actual = flirt.get_eda_features(eda, num_cores=1, features=['mean', 'std'], decomposition='signal')
+
+        self.assertListEqual(list(expected.columns), list(actual.columns))
+        pd.testing.assert_index_equal(expected.index, actual.index)
+        # the components of the whole signal and of each window only differ close to the window borders
+        self.assertLess((expected['tonic_mean'] - actual['tonic_mean']).abs().median(), 1e-3)
+
+        with self.assertRaises(ValueError):
+            flirt.get_eda_features(eda, decomposition='blocks')
+
+    def test_failed_block(self):
+        eda = flirt.reader.empatica.read_eda_file_into_df('wearable-data/empatica/EDA.csv')['eda'].iloc[:1200].copy()
+        # three samples between two gaps form a block that cvxEDA cannot solve
+        eda.index = eda.index[:600].append(eda.index[600:603] + pd.Timedelta(seconds=2)) \
+            .append(eda.index[603:] + pd.Timedelta(seconds=4))
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            actual = flirt.get_eda_features(eda, num_cores=1, features=['mean'], decomposition='signal')
+
+        windows = flirt.util.windowing.get_sample_windows(eda.index, 60, 1, 4)
+        overlapping = (windows.start < 603) & (windows.stop > 600)
+        np.testing.assert_array_equal(overlapping, actual['tonic_mean'].isna().to_numpy())
+        self.assertFalse(any('NaNs which will be removed' in str(warning.message) for warning in caught))
+
+    def test_warm_start(self):
+        eda = flirt.reader.empatica.read_eda_file_into_df('wearable-data/empatica/EDA.csv')['eda'].iloc[:1200]
+        expected = flirt.get_eda_features(eda, num_cores=1, features=['mean', 'std', 'max'])
+        actual = flirt.get_eda_features(eda, num_cores=1, features=['mean', 'std', 'max'], warm_start=True)
+
+        # both solutions are only exact up to the tolerance of the solver
+        pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=0, atol=1e-4)
+
+    def test_banded_solver(self):
+        eda = flirt.reader.empatica.read_eda_file_into_df('wearable-data/empatica/EDA.csv')['eda'].iloc[:1200]
+        expected = flirt.get_eda_features(eda, num_cores=1, features=['mean', 'std', 'max'])
+        actual = flirt.get_eda_features(eda, num_cores=1, features=['mean', 'std', 'max'], solver='banded')
+        pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=0, atol=1e-4)
+
+        with self.assertRaises(ValueError):
+            flirt.get_eda_features(eda, solver='banded_qp')
+
+    def test_unusable_windows(self):
+        eda = flirt.reader.empatica.read_eda_file_into_df('wearable-data/empatica/EDA.csv')['eda'].iloc[:1200].copy()
+        eda.iloc[400:800] = 0  # sensor off the wrist
+        with self.assertWarnsRegex(UserWarning, '41 of 300 windows contain no usable EDA signal'):
+            actual = flirt.get_eda_features(eda, num_cores=1, features=['mean'], solver='banded')
+
+        self.assertEqual(300, len(actual))
+        # only the windows that lie entirely within the flat part are skipped
+        self.assertEqual(41, actual['tonic_mean'].isna().sum())
+        self.assertTrue(actual['tonic_mean'].iloc[:100].notna().all())
+
+    def test_solver_limits(self):
+        eda = flirt.reader.empatica.read_eda_file_into_df('wearable-data/empatica/EDA.csv')['eda'].iloc[:600]
+        with self.assertWarnsRegex(UserWarning, 'exceeded the solver limits, their components are NaN'):
+            actual, diagnostics = flirt.get_eda_features(eda, num_cores=1, features=['mean'], max_iterations=3,
+                                                         diagnostics=True)
+
+        pd.testing.assert_index_equal(actual.index, diagnostics.index)
+        self.assertListEqual(['solve_time', 'iterations', 'status'], list(diagnostics.columns))
+        self.assertTrue((diagnostics['status'].iloc[:-1] == 'limit').all())
+        self.assertTrue((diagnostics['iterations'].iloc[:-1] == 3).all())
+        self.assertTrue(actual.isna().all().all())
+
+        # the time limit is exceeded right after the first iteration
+        actual, diagnostics = flirt.get_eda_features(eda, num_cores=1, features=['mean'], solver='banded',
+                                                     time_limit=1e-9, fallback='spline', diagnostics=True)
+        self.assertTrue((diagnostics['status'].iloc[:-1] == 'limit').all())
+        self.assertTrue((diagnostics['iterations'].iloc[:-1] == 1).all())
+        self.assertTrue(actual['tonic_mean'].iloc[:-1].notna().all())
+
+        _, diagnostics = flirt.get_eda_features(eda, num_cores=1, features=['mean'], decomposition='signal',
+                                                time_limit=1e-9, diagnostics=True)
+        self.assertTrue((diagnostics['status'] == 'limit').all())
+
+        with self.assertRaises(ValueError):
+            flirt.get_eda_features(eda, fallback='nan')
+
+    def test_spline_method(self):
+        eda = flirt.reader.empatica.read_eda_file_into_df('wearable-data/empatica/EDA.csv')['eda'].iloc[:4000]
+        expected = flirt.get_eda_features(eda, num_cores=1, features=['mean', 'std'], decomposition='signal')
+        actual = flirt.get_eda_features(eda, num_cores=1, features=['mean', 'std'], method='spline')
+
+        self.assertListEqual(list(expected.columns), list(actual.columns))
+        pd.testing.assert_index_equal(expected.index, actual.index)
+        # the spline only approximates the tonic component of cvxEDA
+        self.assertGreater(expected['tonic_mean'].corr(actual['tonic_mean']), 0.95)
+
+        with self.assertRaises(ValueError):
+            flirt.get_eda_features(eda, method='filter')
+
 
 class EmpaticaAccTestCase(unittest.TestCase):
     def test_load_data(self):
@@ -28,6 +125,13 @@ class EmpaticaAccTestCase(unittest.TestCase):
 
         self.assertEqual(313, len(acc))
 
+    def test_rolling_method(self):
+        acc = flirt.reader.empatica.read_acc_file_into_df('wearable-data/empatica/ACC.csv').iloc[:3000]
+        expected = flirt.get_acc_features(acc, num_cores=1)
+        actual = flirt.get_acc_features(acc, num_cores=1, method='rolling')
+
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, rtol=1e-7)
+
 
 class EmpaticaTSFeatureTestCase(unittest.TestCase):
     def test_load_data(self):
@@ -38,6 +142,32 @@ class EmpaticaTSFeatureTestCase(unittest.TestCase):
 
         self.assertEqual(313, len(ts))
 
+    def test_chunk_size(self):
+        ts = flirt.reader.empatica.read_acc_file_into_df('wearable-data/empatica/ACC.csv').iloc[:3000]
+        expected = flirt.get_stat_features(ts, entropies=False, num_cores=1)
+        actual = flirt.get_stat_features(ts, entropies=False, num_cores=2, chunk_size=7)
+
+        pd.testing.assert_frame_equal(expected, actual)
+
+    def test_numba_method(self):
+        ts = flirt.reader.empatica.read_acc_file_into_df('wearable-data/empatica/ACC.csv').iloc[:3000]
+        expected = flirt.get_stat_features(ts, num_cores=1)
+        actual = flirt.get_stat_features(ts, num_cores=2, method='numba')
+
+        pd.testing.assert_frame_equal(expected, actual, check_dtype=False, rtol=1e-7)
+
+    def test_feature_selection(self):
+        ts = flirt.reader.empatica.read_acc_file_into_df('wearable-data/empatica/ACC.csv').iloc[:3000]
+        expected = flirt.get_stat_features(ts, num_cores=1)
+        actual = flirt.get_stat_features(ts, num_cores=1, features=['mean', 'peaks', 'perm_entropy', 'pct_95'],
+                                         exclude=['peaks'])
+
+        self.assertListEqual(['acc_x_mean', 'acc_x_pct_95', 'acc_x_perm_entropy'], list(actual.columns[:3]))
+        pd.testing.assert_frame_equal(expected[actual.columns], actual)
+        self.assertRaisesRegex(ValueError, 'invalid feature: foo', flirt.get_stat_features, ts, features=['foo'])
+        self.assertRaisesRegex(ValueError, 'invalid feature: app_entropy', flirt.get_stat_features, ts,
+                               entropies=False, features=['mean', 'app_entropy'])
+
 
 class EmpaticaIbiTestCase(unittest.TestCase):
     def test_load_data(self):
@@ -54,6 +184,15 @@ class EmpaticaIbiTestCase(unittest.TestCase):
 
         self.assertEqual(29, len(ibi))
 
+    def test_feature_selection(self):
+        ibi = flirt.reader.empatica.read_ibi_file_into_df('wearable-data/empatica/IBI.csv').iloc[:2000]
+        expected = flirt.get_hrv_features(ibi['ibi'], 180, 1, ['td', 'fd', 'stat'], 0.5, num_cores=1)
+        actual = flirt.get_hrv_features(ibi['ibi'], 180, 1, ['td', 'fd', 'stat'], 0.5, num_cores=1,
+                                        features=['rmssd', 'sdnn', 'mean'])
+
+        self.assertListEqual(['num_ibis', 'hrv_rmssd', 'hrv_sdnn', 'hrv_mean'], list(actual.columns))
+        pd.testing.assert_frame_equal(expected[actual.columns], actual)
+
     def test_illegal_domain(self):
         self.assertRaisesRegex(ValueError, 'invalid feature domain: foo', flirt.get_hrv_features, pd.Series(), 180, 1,
                                ['foo'], 0.5)
@@ -0,0 +1,157 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import flirt.reader.empatica
+from flirt.hrv.feature_calculation import StatFeatures
+from flirt.hrv.features.data_utils import FusedFeatures
+from flirt.hrv.features.fd_features import FdFeatures
+from flirt.hrv.features.lomb_scargle import batch_lomb_scargle, get_frequency_grid
+from flirt.hrv.features.nl_features import NonLinearFeatures
+from flirt.hrv.features.td_features import TdFeatures
+from flirt.util import windowing
+
+
+class TdFeaturesTestCase(unittest.TestCase):
+    def test_batch_matches_windows(self):
+        ibi = flirt.reader.empatica.read_ibi_file_into_df('wearable-data/empatica/IBI.csv')['ibi'].iloc[:3000]
+        window_starts = pd.date_range(ibi.index[0].floor('s'), ibi.index[-1], freq='5s')
+        windows = windowing.get_time_windows(ibi.index, window_starts, 180)
+        keep = (windows.stop - windows.start) > 0
+        values = ibi.to_numpy()
+
+        # including windows with a single and two IBIs
+        for start, stop in [(windows.start[keep], windows.stop[keep]), ([10, 20, 20], [11, 22, 25])]:
+            actual = TdFeatures().__generate_batch__(values, start, stop)
+            for w, (i, j) in enumerate(zip(start, stop)):
+                with np.errstate(all='ignore'):
+                    expected = TdFeatures().__generate__(values[i:j])
+                for key, value in expected.items():
+                    np.testing.assert_allclose(value, actual[key][w], rtol=1e-9, err_msg=key)
+
+
+class FusedFeaturesTestCase(unittest.TestCase):
+    def test_batch_matches_windows(self):
+        ibi = flirt.reader.empatica.read_ibi_file_into_df('wearable-data/empatica/IBI.csv')['ibi'].iloc[:3000]
+        window_starts = pd.date_range(ibi.index[0].floor('s'), ibi.index[-1], freq='5s')
+        windows = windowing.get_time_windows(ibi.index, window_starts, 180)
+        keep = (windows.stop - windows.start) > 0
+        start, stop = windows.start[keep], windows.stop[keep]
+        values = ibi.to_numpy()
+
+        domains = [TdFeatures(), NonLinearFeatures(), StatFeatures()]
+        actual = FusedFeatures(domains).__generate_batch__(values, start, stop)
+        for domain in domains:
+            separate = domain.__generate_batch__(values, start, stop)
+            for key, value in separate.items():
+                np.testing.assert_array_equal(value, actual[key], err_msg=key)
+
+        for w, (i, j) in enumerate(zip(start, stop)):
+            with np.errstate(all='ignore'):
+                expected = FusedFeatures(domains[1:]).__generate__(values[i:j])
+            for key, value in expected.items():
+                np.testing.assert_allclose(value, actual[key][w], rtol=1e-8, atol=1e-9, err_msg=key)
+
+
+class NonLinearFeaturesTestCase(unittest.TestCase):
+    def test_dfa_alphas(self):
+        ibi = flirt.reader.empatica.read_ibi_file_into_df('wearable-data/empatica/IBI.csv')['ibi'].iloc[:3000]
+        window_starts = pd.date_range(ibi.index[0].floor('s'), ibi.index[-1], freq='30s')
+        windows = windowing.get_time_windows(ibi.index, window_starts, 300)
+        values = ibi.to_numpy()
+
+        self.assertNotIn('dfa_alpha1', NonLinearFeatures().__get_features__())
+        features = NonLinearFeatures(features=['dfa_alpha1', 'dfa_alpha2'])
+        actual = features.__generate_batch__(values, windows.start, windows.stop)
+        self.assertListEqual(['hrv_' + name for name in features.__get_features__()], list(actual.keys()))
+        self.assertTrue(np.isfinite(actual['hrv_dfa_alpha2']).any())
+        for w, (i, j) in enumerate(zip(windows.start, windows.stop)):
+            with np.errstate(all='ignore'):
+                expected = features.__generate__(values[i:j])
+            for key, value in expected.items():
+                np.testing.assert_allclose(value, actual[key][w], rtol=1e-8, atol=1e-9, err_msg=key)
+
+        # alpha 1 is the DFA exponent over the box sizes of 4 to 16 beats
+        walk = np.cumsum(values[:200] - values[:200].mean())
+        fluctuations = []
+        for n in range(4, 17):
+            boxes = walk[:len(walk) // n * n].reshape(-1, n)
+            trends = [np.polyval(np.polyfit(np.arange(n), box, 1), np.arange(n)) for box in boxes]
+            fluctuations.append(np.sqrt(np.mean((boxes - trends) ** 2)))
+        expected = np.polyfit(np.log(np.arange(4, 17)), np.log(fluctuations), 1)[0]
+        actual = features.__generate__(values[:200])['hrv_dfa_alpha1']
+        self.assertAlmostEqual(expected, actual, places=10)
+
+
+class FdFeaturesTestCase(unittest.TestCase):
+    def test_batch_lomb_scargle(self):
+        from astropy.timeseries import LombScargle
+
+        rng = np.random.default_rng(5)
+        t = np.cumsum(rng.uniform(0.6, 1.0, 400))
+        y = 800 + 50 * np.sin(2 * np.pi * 0.1 * t) + rng.normal(0, 10, len(t))
+        start = np.array([0, 50, 100, 399])
+        stop = np.array([200, 250, 400, 400])
+        freq = get_frequency_grid(180, 0.003, 0.4)
+
+        exact = batch_lomb_scargle(t, y, start, stop, freq, method='exact')
+        sliding = batch_lomb_scargle(t, y, start, stop, freq, method='sliding')
+        approximate = batch_lomb_scargle(t, y, start, stop, freq, method='nfft', oversampling=10, order=6)
+        for w in range(3):
+            expected = LombScargle(t[start[w]:stop[w]], y[start[w]:stop[w]], normalization='psd') \
+                .power(freq, method='cython')
+            np.testing.assert_allclose(expected, exact[w], rtol=1e-8)
+            np.testing.assert_allclose(expected, sliding[w], rtol=1e-8)
+            np.testing.assert_allclose(expected, approximate[w], rtol=0, atol=1e-3 * expected.max())
+        self.assertTrue(np.isnan(exact[3]).all())
+        self.assertTrue(np.isnan(sliding[3]).all())
+        self.assertTrue(np.isnan(approximate[3]).all())
+
+    def test_batch_matches_windows(self):
+        ibi = flirt.reader.empatica.read_ibi_file_into_df('wearable-data/empatica/IBI.csv')['ibi'].iloc[:3000]
+        window_starts = pd.date_range(ibi.index[0].floor('s'), ibi.index[-1], freq='30s')
+        windows = windowing.get_time_windows(ibi.index, window_starts, 180)
+        keep = (windows.stop - windows.start) > 1
+        values = ibi.to_numpy()
+
+        features = FdFeatures(method='lomb_grid', window_length=180)
+        actual = features.__generate_batch__(values, windows.start[keep], windows.stop[keep])
+        self.assertListEqual(['hrv_' + name for name in features.__get_features__()], list(actual.keys()))
+        for w, (i, j) in enumerate(zip(windows.start[keep], windows.stop[keep])):
+            expected = features.__generate__(values[i:j])
+            for key, value in expected.items():
+                np.testing.assert_allclose(value, actual[key][w], rtol=1e-8, atol=1e-9, err_msg=key)
+
+
+class HrvFeaturesTestCase(unittest.TestCase):
+    def test_threshold(self):
+        ibi = flirt.reader.empatica.read_ibi_file_into_df('wearable-data/empatica/IBI.csv')['ibi'].iloc[:2000]
+        features = flirt.get_hrv_features(ibi, 60, 5, ['td'], 0.5)
+        self.assertIn('hrv_rmssd', features.columns)
+
+        # no window holds more IBIs than fit into it, only the counts are reported
+        counts = flirt.get_hrv_features(ibi, 60, 5, ['td'], 5.0)
+        self.assertListEqual(['num_ibis'], list(counts.columns))
+        np.testing.assert_array_equal(features['num_ibis'], counts['num_ibis'])
+
+    def test_optional_features(self):
+        ibi = flirt.reader.empatica.read_ibi_file_into_df('wearable-data/empatica/IBI.csv')['ibi'].iloc[:2000]
+        features = flirt.get_hrv_features(ibi, 120, 5, ['nl', 'stat'], 0.5,
+                                          features=['SD1', 'dfa_alpha1', 'mean', 'higuchi_fd'])
+        self.assertListEqual(['hrv_SD1', 'hrv_dfa_alpha1', 'hrv_mean', 'hrv_higuchi_fd'],
+                             [column for column in features.columns if column != 'num_ibis'])
+        self.assertNotIn('hrv_dfa_alpha1', flirt.get_hrv_features(ibi, 120, 5, ['nl'], 0.5).columns)
+
+    def test_multiple_window_lengths(self):
+        ibi = flirt.reader.empatica.read_ibi_file_into_df('wearable-data/empatica/IBI.csv')['ibi'].iloc[:2000]
+        features = flirt.get_hrv_features(ibi, [60, 120], 5, ['td', 'fd'], 0.5, fd_method='lomb_grid')
+
+        for length in [60, 120]:
+            expected = flirt.get_hrv_features(ibi, length, 5, ['td', 'fd'], 0.5, fd_method='lomb_grid')
+            actual = features[[column + '_' + str(length) for column in expected.columns]].loc[expected.index]
+            np.testing.assert_allclose(expected.to_numpy(float), actual.to_numpy(float), err_msg=str(length))
+
+
+if __name__ == '__main__':
+    unittest.main()
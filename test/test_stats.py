@@ -6,6 +6,10 @@ import flirt
 import flirt.reader.empatica
 import flirt.reader.holter
 import flirt.stats.common
+import flirt.stats.sliding
+from flirt.lib.entropy import app_entropy, detrended_fluctuation, higuchi_fd, katz_fd, perm_entropy, petrosian_fd, \
+    sample_entropy, sliding_detrended_fluctuation, sliding_higuchi_fd, sliding_katz_fd, sliding_perm_entropy, \
+    sliding_petrosian_fd, svd_entropy, sliding_svd_entropy
 
 
 class StatsTestCase(unittest.TestCase):
@@ -17,6 +21,103 @@ class StatsTestCase(unittest.TestCase):
 
         self.assertEqual(50, stats['mean'])
 
+    def test_shared_intermediates(self):
+        rng = np.random.default_rng(3)
+        for data in [rng.normal(5, 2, 1000), rng.integers(-3, 4, 200), np.full(50, 3.), np.array([1.])]:
+            stats = flirt.stats.common.get_stats(data, entropies=False)
+            for key, function in flirt.stats.common.FUNCTIONS.items():
+                np.testing.assert_array_equal(function(data), stats[key], err_msg=key)
+
+    def test_sliding_stats(self):
+        data = np.random.default_rng(42).normal(10, 2, 5000)
+        data[1000:1300] = 3  # constant segment
+        data[2500] = np.nan
+        start = np.arange(0, len(data) - 1, 16)
+        start = np.delete(start, range(100, 110))  # gap between windows
+        stop = np.minimum(start + 240, len(data))
+
+        expected = flirt.stats.sliding.get_sliding_stats(data, start, stop, 'x', method='window')
+        for method in ['rolling', 'strided', 'numba']:
+            actual = flirt.stats.sliding.get_sliding_stats(data, start, stop, 'x', method=method)
+
+            self.assertListEqual(list(expected.keys()), list(actual.keys()))
+            for key in expected.keys():
+                np.testing.assert_allclose(expected[key], actual[key], rtol=1e-7, atol=1e-9,
+                                           err_msg=method + ': ' + key)
+
+    def test_numba_stats_ties(self):
+        # samples equal to the mean are neither above nor below it, the kernel has to sum exactly as np.mean
+        data = np.random.default_rng(11).integers(50, 54, 20000) * 15.625
+        start = np.arange(0, 19000, 7)
+        stop = start + np.arange(len(start)) % 300 + 1
+
+        keys = ['mean', 'sum', 'n_above_mean', 'n_below_mean']
+        expected = flirt.stats.sliding.get_sliding_stats(data, start, stop, method='window', features=keys)
+        actual = flirt.stats.sliding.get_sliding_stats(data, start, stop, method='numba', features=keys)
+        for key in keys:
+            np.testing.assert_array_equal(expected[key], actual[key], err_msg=key)
+
+    def test_optional_entropies(self):
+        data = np.random.default_rng(5).normal(0, 1, 300)
+        self.assertNotIn('sample_entropy', flirt.stats.common.get_stats(data))
+
+        stats = flirt.stats.common.get_stats(data, features=['mean', 'app_entropy', 'sample_entropy'])
+        self.assertListEqual(['mean', 'app_entropy', 'sample_entropy'], list(stats.keys()))
+        self.assertAlmostEqual(app_entropy(data), stats['app_entropy'])
+
+    def test_app_sample_entropy(self):
+        np.random.seed(1234567)
+        data = np.random.rand(3000)
+        self.assertAlmostEqual(2.076046899582793, app_entropy(data, order=2), places=12)
+        self.assertAlmostEqual(2.192416747827227, sample_entropy(data, order=2), places=12)
+
+        # ties at the tolerance, compared with all pairs of embedded vectors
+        data = np.random.default_rng(3).integers(0, 6, 400) * 0.5
+        vectors = np.lib.stride_tricks.sliding_window_view(data, 3)
+        distances = np.max(np.abs(vectors[:, None, :] - vectors[None, :, :]), axis=2)
+        short_distances = np.max(np.abs(vectors[:, None, :2] - vectors[None, :, :2]), axis=2)
+        r = 0.2 * np.std(data)
+        n = len(data) - 2
+        expected = -np.log((np.sum(distances < r) - n) / (np.sum(short_distances < r) - n))
+        self.assertAlmostEqual(expected, sample_entropy(data, order=2), places=12)
+
+    def test_sliding_perm_entropy(self):
+        data = np.round(np.random.default_rng(7).normal(0, 1, 2000), 1)  # rounding creates ties
+        start = np.arange(0, 1900, 5)
+        stop = start + 100
+
+        actual = sliding_perm_entropy(data, start, stop, order=3, delay=2, normalize=True)
+        expected = [perm_entropy(data[i:j], order=3, delay=2, normalize=True) for i, j in zip(start, stop)]
+
+        np.testing.assert_allclose(expected, actual, rtol=1e-12)
+
+    def test_sliding_fractals(self):
+        data = np.cumsum(np.random.default_rng(9).normal(0, 1, 5000))
+        start = np.arange(0, 4500, 11)
+        stop = start + np.arange(len(start)) % 400 + 60
+
+        for single, batch in [(petrosian_fd, sliding_petrosian_fd), (katz_fd, sliding_katz_fd),
+                              (higuchi_fd, sliding_higuchi_fd), (detrended_fluctuation, sliding_detrended_fluctuation)]:
+            expected = [single(data[i:j]) for i, j in zip(start, stop)]
+            np.testing.assert_allclose(expected, batch(data, start, stop), rtol=1e-10, err_msg=single.__name__)
+
+        self.assertNotIn('dfa', flirt.stats.common.get_stats(data))
+        stats = flirt.stats.common.get_stats(data[:500], features=['katz_fd', 'dfa'])
+        self.assertListEqual(['katz_fd', 'dfa'], list(stats.keys()))
+        self.assertAlmostEqual(detrended_fluctuation(data[:500]), stats['dfa'])
+
+    def test_sliding_svd_entropy(self):
+        data = np.random.default_rng(7).normal(60, 3, 5000)
+        data[1000:1500] = 64  # constant segment
+        start = np.arange(0, 4500, 16)
+        stop = start + 480
+
+        actual = sliding_svd_entropy(data, start, stop, order=3, delay=2)
+        expected = [svd_entropy(data[i:j], order=3, delay=2) for i, j in zip(start, stop)]
+
+        # for the constant window the exact entropy is 0, the full SVD only returns it up to rounding noise
+        np.testing.assert_allclose(expected, actual, rtol=1e-9, atol=1e-6)
+
 
 class IbiCalcTestCase(unittest.TestCase):
     def test_ibi_calc(self):
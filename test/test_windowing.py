@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import flirt.reader.empatica
+from flirt.util import windowing
+
+
+class WindowingTestCase(unittest.TestCase):
+    def test_sample_windows_match_boolean_masks(self):
+        eda = flirt.reader.empatica.read_eda_file_into_df('wearable-data/empatica/EDA.csv')
+        # introduce a gap larger than the window
+        index = eda.index[:1000].append(eda.index[1000:] + pd.Timedelta(minutes=5))
+
+        windows = windowing.get_sample_windows(index, 60, 1, 4)
+
+        for start, stop, window_datetime in zip(*windows):
+            min_timestamp = window_datetime - pd.Timedelta(seconds=60)
+            mask = np.flatnonzero((index >= min_timestamp) & (index < window_datetime))
+            self.assertEqual((mask[0], mask[-1] + 1), (start, stop))
+        self.assertNotIn(index[999] + pd.Timedelta(seconds=60), windows.datetime)
+
+    def test_time_windows(self):
+        ibi = flirt.reader.empatica.read_ibi_file_into_df('wearable-data/empatica/IBI.csv')
+        window_starts = pd.date_range(ibi.index[0].floor('s'), periods=100, freq='30s')
+
+        windows = windowing.get_time_windows(ibi.index, window_starts, 180)
+
+        expected = [np.count_nonzero((ibi.index >= k) & (ibi.index < k + pd.Timedelta(seconds=180)))
+                    for k in window_starts]
+        self.assertListEqual(expected, list(windows.stop - windows.start))
+        self.assertTrue(window_starts.equals(windows.datetime - pd.Timedelta(seconds=180)))
+
+    def test_segments(self):
+        index = pd.date_range('2020-01-01', periods=10, freq='250ms')
+        index = index[:6].append(index[6:] + pd.Timedelta(seconds=1))
+        values = np.array([1., np.nan, 1., 1., 1., np.inf, 1., 1., 1., 1.])
+
+        start, stop = windowing.get_segments(index, 4)
+        self.assertListEqual([(0, 6), (6, 10)], list(zip(start, stop)))
+        start, stop = windowing.get_segments(index, 4, values)
+        self.assertListEqual([(0, 1), (2, 5), (6, 10)], list(zip(start, stop)))
+
+
+if __name__ == '__main__':
+    unittest.main()